@@ -1,40 +1,63 @@
 import os
 import stat
 from datetime import datetime
+from pyterminal import safe_print, abspath
+from records import Records
+from archivefs import isdir, isfile, listdir, stat_path
 
 
-def cmd_ls_l(path="."):
-    from pyterminal import safe_print
+def format_mtime(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
+
+
+def format_entry(row):
+    return f"{row['perms']} {row['size']:>10} {format_mtime(row['mtime'])} {row['name']}"
+
+
+def _entry(name, st):
+    return {
+        "perms": stat.filemode(st.st_mode),
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "name": name,
+    }
+
+
+def ls_l_records(args=None):
     """
-    Print detailed listing like `ls -l`:
-    Permissions, owner, size, modification time.
-    Can show a directory or a single file.
+    Detailed listing of a directory (or a single file) as records with
+    perms, size, mtime and name, for pipelines like `ls-l | sort -by size`.
     """
-    path = os.path.abspath(os.path.expanduser(path))
+    if isinstance(args, str):
+        args = [args]
+    path = abspath(args[0] if args else ".")
+    rows = []
 
     try:
         # If it's a directory, list all entries
-        if os.path.isdir(path):
-            entries = sorted(os.listdir(path))
-            for e in entries:
-                full_path = os.path.join(path, e)
-                st = os.stat(full_path)
-                perms = stat.filemode(st.st_mode)
-                size = st.st_size
-                mtime = datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d %H:%M")
-                safe_print(f"{perms} {size:>10} {mtime} {e}")
+        if isdir(path):
+            for e in sorted(listdir(path)):
+                rows.append(_entry(e, stat_path(os.path.join(path, e))))
 
         # If it's a single file, show only that
-        elif os.path.isfile(path):
-            st = os.stat(path)
-            perms = stat.filemode(st.st_mode)
-            size = st.st_size
-            mtime = datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d %H:%M")
-            fname = os.path.basename(path)
-            safe_print(f"{perms} {size:>10} {mtime} {fname}")
+        elif isfile(path):
+            rows.append(_entry(os.path.basename(path), stat_path(path)))
 
         else:
             safe_print(f"ls-l: cannot access '{path}': No such file or directory")
 
     except Exception as e:
         safe_print(f"ls-l error: {e}")
+
+    return Records(rows, ["perms", "size", "mtime", "name"],
+                   formatter=format_entry, display={"mtime": format_mtime})
+
+
+def cmd_ls_l(args="."):
+    """
+    Print detailed listing like `ls -l`:
+    Permissions, owner, size, modification time.
+    Can show a directory or a single file.
+    """
+    for line in ls_l_records(args).render():
+        safe_print(line)
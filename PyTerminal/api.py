@@ -0,0 +1,194 @@
+# api.py
+"""
+HTTP batch API for scripts driving the terminal without a WebSocket.
+
+    POST /api/v1/run
+    Authorization: Bearer $PYTERMINAL_API_TOKEN
+    {"commands": ["ls-l", "cat notes.txt | sort"],
+     "cwd": "/srv/project",        optional, directory to run the batch in
+     "parallel": false,            run the commands concurrently
+     "stop_on_error": false,       sequential batches only
+     "stream": false}              NDJSON, one object per result, chunked
+
+Each result is {"index", "command", "output", "status", "duration_ms"};
+status is 0 on success, 1 on error. Streamed results send large outputs as
+several {"index", "output"} objects before the closing result object.
+
+The WebSocket server serves it on API_HOST:API_PORT (default
+127.0.0.1:8770, plus the worker number), or run it on its own:
+    python api.py [--host 127.0.0.1] [--port 8770]
+Disabled unless PYTERMINAL_API_TOKEN is set.
+
+A batch runs in a working directory of its own (`cwd`, or the server's
+cwd when the batch starts): `cd` in a batch moves only that batch, and the
+server process never changes directory.
+"""
+
+import os
+import json
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MAX_COMMANDS = 100
+MAX_WORKERS = int(os.environ.get("PYTERMINAL_API_WORKERS", 4))
+# Streamed outputs are cut into pieces of this many characters
+STREAM_CHUNK = 64 * 1024
+# Local API: loopback unless configured otherwise
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", 8770))
+
+
+# ------------------------------
+# Running a batch
+# ------------------------------
+def run_one(index, line, workdir):
+    from main import run_line
+    from execpolicy import CURRENT_SESSION
+    CURRENT_SESSION.set(f"api-{threading.get_ident()}")
+    start = time.perf_counter()
+    output, ok = run_line(line, cwd=workdir)
+    return {
+        "index": index,
+        "command": line,
+        "output": output,
+        "status": 0 if ok else 1,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+def iter_results(commands, workdir, parallel=False, stop_on_error=False):
+    """Yield results as commands finish (completion order when parallel)."""
+    if not parallel:
+        for index, line in enumerate(commands):
+            result = run_one(index, line, workdir)
+            yield result
+            if stop_on_error and result["status"]:
+                return
+        return
+    with ThreadPoolExecutor(min(MAX_WORKERS, len(commands)) or 1) as pool:
+        # each command gets a copy of the caller's context, like asyncio.to_thread
+        futures = [pool.submit(contextvars.copy_context().run, run_one, i, line, workdir)
+                   for i, line in enumerate(commands)]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+
+class BatchError(ValueError):
+    pass
+
+
+def _changes_directory(line):
+    """True if any command of any pipeline in `line` is cd."""
+    from shellparse import ShellSyntaxError, plan_for
+    try:
+        plan = plan_for(line)
+    except ShellSyntaxError:
+        return False  # reported when the command runs
+    return any(command.name == "cd"
+               for pipeline in plan.pipelines for command in pipeline.commands)
+
+
+def parse_batch(body):
+    """Validate a request body; returns (commands, cwd, parallel, stop_on_error, stream)."""
+    if not isinstance(body, dict):
+        raise BatchError("expected a JSON object")
+    commands = body.get("commands")
+    if isinstance(commands, str):
+        commands = [commands]
+    if not isinstance(commands, list) or not all(isinstance(c, str) for c in commands):
+        raise BatchError("'commands' must be a list of strings")
+    if len(commands) > MAX_COMMANDS:
+        raise BatchError(f"at most {MAX_COMMANDS} commands per batch")
+    parallel = bool(body.get("parallel"))
+    cwd = body.get("cwd")
+    if cwd is not None:
+        if not isinstance(cwd, str):
+            raise BatchError("'cwd' must be a string")
+        cwd = os.path.abspath(os.path.expanduser(cwd))
+        if not os.path.isdir(cwd):
+            raise BatchError(f"no such directory: {cwd}")
+    if parallel and any(_changes_directory(c) for c in commands):
+        raise BatchError("cd changes the directory of every command; use 'cwd' instead")
+    return commands, cwd, parallel, bool(body.get("stop_on_error")), bool(body.get("stream"))
+
+
+def run_batch(commands, cwd=None, parallel=False, stop_on_error=False):
+    """
+    Yield results of a batch run in `cwd` (a path or a WorkingDirectory;
+    default: the server's cwd now). The process cwd is never changed.
+    """
+    from pyterminal import WorkingDirectory
+    workdir = cwd if isinstance(cwd, WorkingDirectory) else WorkingDirectory(cwd or os.getcwd())
+    yield from iter_results(commands, workdir, parallel, stop_on_error)
+
+
+def stream_lines(results):
+    """NDJSON lines for a streamed response; long outputs go out in pieces."""
+    for result in results:
+        output = result["output"]
+        if len(output) > STREAM_CHUNK:
+            for pos in range(0, len(output), STREAM_CHUNK):
+                yield json.dumps({"index": result["index"],
+                                  "output": output[pos:pos + STREAM_CHUNK]}) + "\n"
+            result = dict(result, output="", chunked=True)
+        yield json.dumps(result) + "\n"
+
+
+# ------------------------------
+# Flask routes
+# ------------------------------
+def install_api_routes(app):
+    """Add POST /api/v1/run to a Flask app (only when PYTERMINAL_API_TOKEN is set)."""
+    from flask import Response, request, jsonify, stream_with_context
+
+    token = os.environ.get("PYTERMINAL_API_TOKEN")
+    if not token:
+        return
+
+    @app.route("/api/v1/run", methods=["POST"])
+    def api_run():
+        import hmac
+        given = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(given.encode(), f"Bearer {token}".encode()):
+            return jsonify(error="unauthorized"), 401
+        try:
+            commands, cwd, parallel, stop_on_error, stream = parse_batch(request.get_json(silent=True))
+        except BatchError as e:
+            return jsonify(error=str(e)), 400
+
+        from pyterminal import WorkingDirectory
+        workdir = WorkingDirectory(cwd or os.getcwd())
+        results = run_batch(commands, workdir, parallel, stop_on_error)
+        if stream:
+            # no Content-Length: HTTP/1.1 sends this with chunked encoding
+            return Response(stream_with_context(stream_lines(results)),
+                            mimetype="application/x-ndjson")
+        ordered = sorted(results, key=lambda r: r["index"])
+        return jsonify(cwd=workdir.path, results=ordered,
+                       ok=all(r["status"] == 0 for r in ordered))
+
+
+def main(argv=None):
+    import argparse
+    import metrics
+    parser = argparse.ArgumentParser(description="PyTerminal HTTP batch API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    args = parser.parse_args(argv)
+    if not os.environ.get("PYTERMINAL_API_TOKEN"):
+        parser.error("set PYTERMINAL_API_TOKEN first")
+
+    from execpolicy import prewarm
+    prewarm()
+    server = metrics.start_metrics_server(args.host, args.port, setup=install_api_routes)
+    print(f"Batch API at http://{args.host}:{args.port}/api/v1/run")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
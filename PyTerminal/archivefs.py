@@ -0,0 +1,467 @@
+# archivefs.py
+"""
+Read-only mounts of tar and zip archives.
+
+    mount release.tar.gz /mnt/rel     index the archive once
+    ls /mnt/rel/src; cat /mnt/rel/README; grep TODO /mnt/rel/src/main.c
+    umount /mnt/rel
+
+Paths are looked up after pyterminal.abspath(): anything under a mount
+point is served from the archive, everything else from the disk. Member
+data is read in place, nothing is extracted:
+- zip: members are opened directly (the format is seekable)
+- tar: the index pass records each member's data offset; plain tars are
+  then read with a seek, gzip'd tars resume decompressing from the nearest
+  saved zlib state (one every CHECKPOINT_SPAN bytes of tar data)
+- tar.bz2/.xz/.zst: decompressors can't be checkpointed, so a read
+  decompresses from the start of the archive up to the member
+"""
+
+import io
+import os
+import errno
+import stat
+import zlib
+import bisect
+import threading
+from collections import OrderedDict
+from compressed import BLOCK_SIZE, _ChunkStream, detect, open_binary
+
+# Uncompressed tar bytes between two saved gzip decompressor states;
+# each state costs ~40 KB (mostly the 32 KB window)
+CHECKPOINT_SPAN = 4 << 20
+# Indexes kept for archives that were unmounted, keyed by path + signature
+INDEX_CACHE_SIZE = 8
+
+ZIP_SUFFIXES = (".zip", ".jar", ".whl", ".apk")
+
+_lock = threading.Lock()
+MOUNTS = {}     # mount point -> Archive
+_ORDER = []     # mount points, longest first
+_INDEXES = OrderedDict()
+_serial = 0
+
+
+# ------------------------------
+# Archive index
+# ------------------------------
+class Member:
+    __slots__ = ("name", "mode", "size", "mtime", "offset", "link")
+
+    def __init__(self, name, mode, size=0, mtime=0, offset=None, link=None):
+        self.name = name
+        self.mode = mode
+        self.size = size
+        self.mtime = mtime
+        self.offset = offset  # tar data offset, or the ZipInfo
+        self.link = link      # member path a tar link points to
+
+    @property
+    def isdir(self):
+        return stat.S_ISDIR(self.mode)
+
+
+def _clean(name):
+    return "/".join(p for p in name.replace("\\", "/").split("/") if p not in ("", "."))
+
+
+class Archive:
+    """Member index of one archive; subclasses know how to read member data."""
+
+    kind = "archive"
+
+    def __init__(self, path, mtime):
+        self.path = path
+        self.mtime = mtime
+        self.members = {"": Member("", stat.S_IFDIR | 0o555, mtime=mtime)}
+        self.children = {"": []}
+        self.serial = 0
+
+    def _add(self, name, mode, size=0, mtime=0, offset=None, link=None):
+        name = _clean(name)
+        if not name or ".." in name.split("/"):
+            return
+        parent = name.rpartition("/")[0]
+        if parent not in self.members:
+            self._add(parent, stat.S_IFDIR | 0o555, mtime=mtime)
+        if name not in self.members:
+            self.children.setdefault(parent, []).append(name.rpartition("/")[2])
+        if stat.S_ISDIR(mode):
+            self.children.setdefault(name, [])
+        self.members[name] = Member(name, mode, size, mtime, offset, link)
+
+    def resolve(self, inner):
+        """The Member at `inner`, following links inside the archive."""
+        member = self.members.get(_clean(inner))
+        for _ in range(16):
+            if member is None or member.link is None:
+                return member
+            member = self.members.get(member.link)
+        raise self._error(OSError, errno.ELOOP, inner)
+
+    def _error(self, cls, code, inner):
+        return cls(code, os.strerror(code), f"{self.path}:{inner}")
+
+    def listdir(self, inner):
+        member = self.resolve(inner)
+        if member is None:
+            raise self._error(FileNotFoundError, errno.ENOENT, inner)
+        if not member.isdir:
+            raise self._error(NotADirectoryError, errno.ENOTDIR, inner)
+        return list(self.children.get(member.name, ()))
+
+    def stat(self, inner):
+        member = self.resolve(inner)
+        if member is None:
+            raise self._error(FileNotFoundError, errno.ENOENT, inner)
+        size = 0 if member.isdir else member.size
+        return os.stat_result((member.mode, 0, 0, 1, 0, 0, size,
+                               member.mtime, member.mtime, member.mtime))
+
+    def open(self, inner):
+        """Binary, buffered stream of a member's data."""
+        member = self.resolve(inner)
+        if member is None:
+            raise self._error(FileNotFoundError, errno.ENOENT, inner)
+        if member.isdir:
+            raise self._error(IsADirectoryError, errno.EISDIR, inner)
+        return self._open(member)
+
+    def _open(self, member):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ZipArchive(Archive):
+    kind = "zip"
+
+    def __init__(self, path, mtime):
+        import time
+        import zipfile
+        super().__init__(path, mtime)
+        self.zf = zipfile.ZipFile(path)
+        for info in self.zf.infolist():
+            mode = info.external_attr >> 16
+            if info.is_dir():
+                mode = stat.S_IFDIR | (stat.S_IMODE(mode) or 0o555)
+            else:
+                mode = stat.S_IFREG | (stat.S_IMODE(mode) or 0o444)
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            self._add(info.filename, mode, info.file_size, mtime, info)
+
+    def _open(self, member):
+        # ZipFile serializes reads of the shared file handle itself
+        return self.zf.open(member.offset)
+
+    def close(self):
+        self.zf.close()
+
+
+class _GzipCheckpoints:
+    """
+    Random access into a gzip stream. While the index pass decompresses the
+    file once, a copy of the zlib state is kept every CHECKPOINT_SPAN output
+    bytes; a read starts from the nearest copy at or before its offset.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.points = []   # (output offset, input offset, zlib state)
+        self._keys = []
+
+    def _inflate(self, f, d, out, keep=False):
+        """Yield (output offset, bytes) from file position on, across gzip members."""
+        fresh = False
+        last = out
+        while True:
+            data = f.read(BLOCK_SIZE)
+            if not data:
+                return
+            more = True
+            while more:
+                try:
+                    # bounded output: a tiny block can inflate to gigabytes
+                    chunk = d.decompress(data, BLOCK_SIZE)
+                except zlib.error:
+                    if fresh:  # zero padding after the last member
+                        return
+                    raise
+                fresh = fresh and not chunk
+                if chunk:
+                    yield out, chunk
+                    out += len(chunk)
+                if d.eof:
+                    data = d.unused_data
+                    d = zlib.decompressobj(31)
+                    fresh = True
+                    more = bool(data)
+                else:
+                    data = d.unconsumed_tail
+                    more = bool(data) or len(chunk) == BLOCK_SIZE
+                    if keep and out - last >= CHECKPOINT_SPAN:
+                        # input consumed so far: what was read minus the tail
+                        self.points.append((out, f.tell() - len(data), d.copy()))
+                        self._keys.append(out)
+                        last = out
+
+    def scan(self):
+        """Decompressed chunks of the whole file, recording checkpoints."""
+        d = zlib.decompressobj(31)
+        self.points = [(0, 0, d.copy())]
+        self._keys = [0]
+        with open(self.path, "rb") as f:
+            for _, chunk in self._inflate(f, d, 0, keep=True):
+                yield chunk
+
+    def read(self, offset, size):
+        """Yield the `size` decompressed bytes starting at `offset`."""
+        out, pos, state = self.points[bisect.bisect_right(self._keys, offset) - 1]
+        end = offset + size
+        with open(self.path, "rb") as f:
+            f.seek(pos)
+            for at, chunk in self._inflate(f, state.copy(), out):
+                if at + len(chunk) <= offset:
+                    continue
+                yield chunk[max(0, offset - at):end - at]
+                if at + len(chunk) >= end:
+                    return
+
+
+class TarArchive(Archive):
+    kind = "tar"
+
+    def __init__(self, path, mtime):
+        import tarfile
+        super().__init__(path, mtime)
+        self.fmt = detect(path)
+        self.gzip = _GzipCheckpoints(path) if self.fmt == "gzip" else None
+        if self.fmt is None:
+            tf = tarfile.open(path, "r:")  # seeks over member data
+        elif self.gzip is not None:
+            raw = io.BufferedReader(_ChunkStream(self.gzip.scan()), BLOCK_SIZE)
+            tf = tarfile.open(fileobj=raw, mode="r|")
+        else:
+            tf = tarfile.open(fileobj=open_binary(path, self.fmt), mode="r|")
+        if self.fmt is not None:
+            self.kind = "tar." + {"gzip": "gz", "zstd": "zst"}.get(self.fmt, self.fmt)
+        with tf:
+            for ti in tf:
+                mode = stat.S_IMODE(ti.mode)
+                if ti.isdir():
+                    self._add(ti.name, stat.S_IFDIR | mode, mtime=ti.mtime)
+                elif ti.issym():
+                    target = os.path.normpath(os.path.join(os.path.dirname(ti.name), ti.linkname))
+                    self._add(ti.name, stat.S_IFLNK | 0o777, mtime=ti.mtime, link=_clean(target))
+                elif ti.islnk():
+                    self._add(ti.name, stat.S_IFREG | mode, mtime=ti.mtime, link=_clean(ti.linkname))
+                elif ti.isreg():
+                    self._add(ti.name, stat.S_IFREG | mode, ti.size, ti.mtime, ti.offset_data)
+
+    def _chunks(self, offset, size):
+        if self.gzip is not None:
+            yield from self.gzip.read(offset, size)
+            return
+        if self.fmt is None:
+            f = open(self.path, "rb", buffering=0)
+            f.seek(offset)
+        else:
+            f = open_binary(self.path, self.fmt)
+            while offset:  # no random access: decompress up to the member
+                skipped = len(f.read(min(offset, BLOCK_SIZE)))
+                if not skipped:
+                    break
+                offset -= skipped
+        with f:
+            while size > 0:
+                block = f.read(min(size, BLOCK_SIZE))
+                if not block:
+                    return
+                size -= len(block)
+                yield block
+
+    def _open(self, member):
+        return io.BufferedReader(_ChunkStream(self._chunks(member.offset, member.size)), BLOCK_SIZE)
+
+
+def open_archive(path):
+    """Index `path` (or reuse the index of an unchanged, earlier mount)."""
+    st = os.stat(path)
+    key = (path, st.st_ino, st.st_size, st.st_mtime_ns)
+    with _lock:
+        archive = _INDEXES.get(key)
+        if archive is not None:
+            _INDEXES.move_to_end(key)
+            return archive
+    import tarfile
+    import zipfile
+    if zipfile.is_zipfile(path):
+        archive = ZipArchive(path, st.st_mtime)
+    elif path.lower().endswith(ZIP_SUFFIXES):
+        raise ValueError(f"{path}: not a valid zip archive")
+    else:
+        try:
+            archive = TarArchive(path, st.st_mtime)
+        except (tarfile.TarError, zlib.error, EOFError) as e:
+            raise ValueError(f"{path}: not a readable tar or zip archive ({e})")
+    with _lock:
+        if key in _INDEXES:  # indexed by another thread meanwhile
+            archive.close()
+            return _INDEXES[key]
+        _INDEXES[key] = archive
+        while len(_INDEXES) > INDEX_CACHE_SIZE:
+            _, old = _INDEXES.popitem(last=False)
+            _release(old)
+    return archive
+
+
+def _release(archive):
+    """
+    Close `archive` once neither the mount table nor the index cache holds
+    it: an index evicted while mounted stays open until its last umount,
+    an unmounted one until it falls out of the cache. Call with _lock held.
+    """
+    if (not any(a is archive for a in MOUNTS.values())
+            and not any(a is archive for a in _INDEXES.values())):
+        archive.close()
+
+
+# ------------------------------
+# Mount table
+# ------------------------------
+def mount(archive_path, mount_point):
+    global _serial
+    from pyterminal import abspath
+    archive_path, mount_point = abspath(archive_path), abspath(mount_point)
+    if lookup(archive_path) is not None:
+        raise ValueError(f"{archive_path}: archives inside a mount can't be mounted")
+    if mount_point in MOUNTS or lookup(mount_point) is not None:
+        raise ValueError(f"{mount_point}: already a mount point or inside one")
+    archive = open_archive(archive_path)
+    with _lock:
+        _serial += 1
+        archive.serial = _serial
+        MOUNTS[mount_point] = archive
+        _ORDER[:] = sorted(MOUNTS, key=len, reverse=True)
+    return archive
+
+
+def umount(mount_point):
+    from pyterminal import abspath
+    mount_point = abspath(mount_point)
+    with _lock:
+        archive = MOUNTS.pop(mount_point, None)
+        if archive is None:
+            raise ValueError(f"{mount_point}: not mounted")
+        _ORDER[:] = sorted(MOUNTS, key=len, reverse=True)
+        _release(archive)
+
+
+def lookup(path):
+    """(Archive, path inside it) when `path` is under a mount, else None."""
+    if not MOUNTS:
+        return None
+    if not os.path.isabs(path):
+        from pyterminal import abspath
+        path = abspath(path)
+    for mount_point in _ORDER:
+        if path == mount_point:
+            return MOUNTS[mount_point], ""
+        if path.startswith(mount_point) and path[len(mount_point)] == os.sep:
+            return MOUNTS[mount_point], path[len(mount_point) + 1:]
+    return None
+
+
+# ------------------------------
+# os-like helpers that see mounts
+# ------------------------------
+def listdir(path):
+    found = lookup(path)
+    if found is not None:
+        return found[0].listdir(found[1])
+    names = os.listdir(path)
+    if MOUNTS:  # mount points show up in their parent directory
+        names.extend(os.path.basename(m) for m in _ORDER
+                     if os.path.dirname(m) == path and os.path.basename(m) not in names)
+    return names
+
+
+def stat_path(path):
+    found = lookup(path)
+    if found is not None:
+        return found[0].stat(found[1])
+    return os.stat(path)
+
+
+def isdir(path):
+    try:
+        return stat.S_ISDIR(stat_path(path).st_mode)
+    except OSError:
+        return False
+
+
+def isfile(path):
+    try:
+        return stat.S_ISREG(stat_path(path).st_mode)
+    except OSError:
+        return False
+
+
+def open_member(path):
+    """Binary stream of a file under a mount, or None if `path` isn't in one."""
+    found = lookup(path)
+    if found is None:
+        return None
+    return found[0].open(found[1])
+
+
+def signature(path):
+    """Cache validator for a mounted path: the archive file plus its mount."""
+    found = lookup(path)
+    if found is None:
+        return None
+    archive, inner = found
+    try:
+        member = archive.resolve(inner)
+        st = os.stat(archive.path)
+    except OSError:
+        return None
+    if member is None:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns, archive.serial, inner)
+
+
+# ------------------------------
+# Commands
+# ------------------------------
+def cmd_mount(args):
+    """mount [<archive> <dir>]  - without arguments, list mounts"""
+    from pyterminal import safe_print, abspath
+    if not args:
+        for mount_point, archive in sorted(MOUNTS.items()):
+            files = sum(1 for m in archive.members.values() if not m.isdir)
+            safe_print(f"{archive.path} on {mount_point} type {archive.kind} (ro, {files} files)")
+        return
+    if len(args) != 2:
+        safe_print("Usage: mount <archive.tar[.gz|.bz2|.xz|.zst]|archive.zip> <dir>")
+        return False
+    try:
+        archive = mount(args[0], args[1])
+    except (OSError, ValueError) as e:
+        safe_print(f"mount: {e}")
+        return False
+    safe_print(f"Mounted {archive.path} ({archive.kind}, {len(archive.members) - 1} entries) "
+               f"read-only on {abspath(args[1])}")
+
+
+def cmd_umount(args):
+    from pyterminal import safe_print
+    if len(args) != 1:
+        safe_print("Usage: umount <dir>")
+        return False
+    try:
+        umount(args[0])
+    except ValueError as e:
+        safe_print(f"umount: {e}")
+        return False
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# benchmarks.py
+"""
+Micro-benchmarks for the command and pipeline hot paths.
+
+Builds synthetic fixtures (large text files, directories with up to 100k
+entries, fake process tables) in a temp dir, times each path across input
+sizes, records peak memory with tracemalloc and compares against a stored
+baseline.
+
+Usage:
+    python benchmarks.py                          # run everything, print table
+    python benchmarks.py --quick                  # smaller sizes
+    python benchmarks.py -k sort -k uniq          # only matching benchmarks
+    python benchmarks.py --save bench_baseline.json
+    python benchmarks.py --compare bench_baseline.json --threshold 1.25
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+
+SIZES = [1_000, 10_000, 100_000]
+QUICK_SIZES = [1_000, 10_000]
+
+
+# ------------------------------
+# Fixtures
+# ------------------------------
+class Fixtures:
+    """Lazily generated, cached synthetic inputs under one temp dir."""
+
+    def __init__(self, root):
+        self.root = root
+        self._cache = {}
+
+    def _cached(self, key, build):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def lines(self, n):
+        def build():
+            rnd = random.Random(n)
+            words = [f"word{i:05d}" for i in range(max(10, n // 10))]
+            return [f"{rnd.choice(words)} {rnd.choice(words)}" for _ in range(n)]
+        return self._cached(("lines", n), build)
+
+    def sorted_lines(self, n):
+        return self._cached(("sorted", n), lambda: sorted(self.lines(n)))
+
+    def text_file(self, n):
+        def build():
+            path = os.path.join(self.root, f"lines_{n}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(self.lines(n)) + "\n")
+            return path
+        return self._cached(("file", n), build)
+
+    def directory(self, n):
+        def build():
+            path = os.path.join(self.root, f"dir_{n}")
+            os.makedirs(path)
+            for i in range(n):
+                ext = ("log", "txt", "gz", "py")[i % 4]
+                open(os.path.join(path, f"f{i:06d}.{ext}"), "w").close()
+            return path
+        return self._cached(("dir", n), build)
+
+    def process_table(self, n):
+        def build():
+            rnd = random.Random(n)
+            names = ["python", "bash", "sshd", "nginx", "postgres", "node", "java"]
+            return [FakeProcess(pid, f"{rnd.choice(names)}-{pid}",
+                                rnd.random() * 100, rnd.random() * 10)
+                    for pid in range(1, n + 1)]
+        return self._cached(("procs", n), build)
+
+
+class FakeProcess:
+    """Just enough of psutil.Process for process_mgmt."""
+
+    def __init__(self, pid, name, cpu, mem):
+        self.info = {"pid": pid, "name": name, "cpu_percent": cpu, "memory_percent": mem}
+
+    def cpu_percent(self, interval=None):
+        return self.info["cpu_percent"]
+
+
+@contextmanager
+def chdir(path):
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+
+@contextmanager
+def quiet():
+    with redirect_stdout(io.StringIO()):
+        yield
+
+
+# ------------------------------
+# Benchmarks: name -> setup(fixtures, size) returning a zero-arg callable
+# ------------------------------
+def bench_handle_command(fx, n):
+    import main
+    path = fx.text_file(n)
+    return lambda: main.handle_command(f"cat {path}")
+
+
+def bench_run_pipeline(fx, n):
+    from shell_features import run_pipeline
+    path = fx.text_file(n)
+    return lambda: run_pipeline([f"cat {path}", "sort", "uniq"])
+
+
+def bench_builtin_sort(fx, n):
+    from shell_features import builtin_sort
+    lines = fx.lines(n)
+    return lambda: builtin_sort([], lines)
+
+
+def bench_builtin_uniq(fx, n):
+    from shell_features import builtin_uniq
+    lines = fx.sorted_lines(n)
+    return lambda: builtin_uniq([], lines)
+
+
+def bench_expand_globs(fx, n):
+    from shell_features import expand_globs
+    path = fx.directory(n)
+    tokens = ["ls", os.path.join(path, "*.log"), os.path.join(path, "f00001?.txt")]
+    return lambda: expand_globs(tokens)
+
+
+def bench_parse_line(fx, n):
+    from shellparse import parse
+    line = "ps-list | where 'name~py' mem>1 | sort -by mem -r | select name,pid,mem > top.txt && cat top.txt"
+    return lambda: parse(line)
+
+
+def bench_spawn(fx, n):
+    import execpolicy
+    execpolicy.prewarm()
+    return lambda: execpolicy.run(["true"])
+
+
+def bench_run_shell(fx, n):
+    import execpolicy
+    execpolicy.prewarm()
+    return lambda: execpolicy.run_shell("true")
+
+
+def bench_cmd_ls_l(fx, n):
+    from advanced_ls import cmd_ls_l
+    path = fx.directory(n)
+    return lambda: cmd_ls_l(path)
+
+
+def bench_autocomplete(fx, n):
+    import ws_handler
+    path = fx.directory(n)
+
+    def run():
+        with chdir(path):
+            ws_handler.autocomplete("f0999", None)
+    return run
+
+
+def bench_filter_process(fx, n):
+    import process_mgmt
+    table = fx.process_table(n)
+
+    def run():
+        real = process_mgmt.psutil.process_iter
+        process_mgmt.psutil.process_iter = lambda attrs=None: iter(table)
+        try:
+            process_mgmt.filter_process("nginx")
+        finally:
+            process_mgmt.psutil.process_iter = real
+    return run
+
+
+BENCHMARKS = {
+    "handle_command.cat": bench_handle_command,
+    "run_pipeline.cat_sort_uniq": bench_run_pipeline,
+    "builtin_sort": bench_builtin_sort,
+    "builtin_uniq": bench_builtin_uniq,
+    "expand_globs": bench_expand_globs,
+    "shellparse.parse": bench_parse_line,
+    "execpolicy.run": bench_spawn,
+    "execpolicy.run_shell": bench_run_shell,
+    "cmd_ls_l": bench_cmd_ls_l,
+    "ws_handler.autocomplete": bench_autocomplete,
+    "process_mgmt.filter_process": bench_filter_process,
+}
+
+
+# ------------------------------
+# Runner
+# ------------------------------
+def time_call(func, repeat):
+    """Return (min, median) wall time over `repeat` runs after one warmup."""
+    with quiet():
+        func()
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    times.sort()
+    return times[0], times[len(times) // 2]
+
+
+def peak_memory(func):
+    """Peak traced allocation of one run, in KiB (timed separately: tracing is slow)."""
+    tracemalloc.start()
+    try:
+        with quiet():
+            func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def run_all(sizes, repeat, patterns=None):
+    results = {}
+    root = tempfile.mkdtemp(prefix="pyterminal-bench-")
+    fx = Fixtures(root)
+    try:
+        for name, setup in BENCHMARKS.items():
+            if patterns and not any(p in name for p in patterns):
+                continue
+            for n in sizes:
+                key = f"{name}@{n}"
+                try:
+                    func = setup(fx, n)
+                    best, median = time_call(func, repeat)
+                    peak = peak_memory(func)
+                except ImportError as e:
+                    print(f"{key:42} skipped ({e})")
+                    break
+                results[key] = {"min_s": best, "median_s": median, "peak_kib": peak}
+                print(f"{key:42} min {best * 1000:9.2f} ms  median {median * 1000:9.2f} ms  "
+                      f"peak {peak:10.1f} KiB")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print changes against `baseline`; return the keys that regressed."""
+    regressions = []
+    print(f"\n{'benchmark':42} {'time':>9} {'memory':>9}")
+    for key, cur in results.items():
+        base = baseline.get(key)
+        if not base:
+            print(f"{key:42} {'new':>9}")
+            continue
+        t_ratio = cur["min_s"] / base["min_s"] if base["min_s"] else 1.0
+        m_ratio = cur["peak_kib"] / base["peak_kib"] if base["peak_kib"] else 1.0
+        flag = ""
+        if t_ratio > threshold or m_ratio > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:42} {t_ratio:8.2f}x {m_ratio:8.2f}x{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PyTerminal hot-path benchmarks")
+    parser.add_argument("-k", dest="patterns", action="append",
+                        help="only run benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--quick", action="store_true", help=f"sizes {QUICK_SIZES}")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")])
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--save", metavar="FILE", help="write results as a baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a baseline")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="ratio over baseline that counts as a regression")
+    opts = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sizes = opts.sizes or (QUICK_SIZES if opts.quick else SIZES)
+    results = run_all(sizes, opts.repeat, opts.patterns)
+
+    if opts.save:
+        with open(opts.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {opts.save}")
+
+    if opts.compare:
+        with open(opts.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, opts.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
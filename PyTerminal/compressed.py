@@ -0,0 +1,181 @@
+# compressed.py
+
+import io
+import os
+import re
+import bz2
+import gzip
+import lzma
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+
+# Read/decompress in large blocks: fewer syscalls and decompressor calls
+BLOCK_SIZE = 1 << 20
+# bz2 files at least this big that contain several streams (pbzip2, lbzip2)
+# are decompressed stream by stream on a thread pool; bz2 releases the GIL
+PARALLEL_MIN_SIZE = 8 << 20
+PARALLEL_WORKERS = min(8, os.cpu_count() or 1)
+
+MAGIC = [
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+]
+
+# Start of a bz2 stream: "BZh" + block size digit + first block magic (pi)
+_BZ2_STREAM = re.compile(rb"BZh[1-9]1AY&SY")
+
+
+def detect(path):
+    """Compression format of `path` from its magic bytes, or None."""
+    with open(path, "rb") as f:
+        head = f.read(6)
+    for magic, fmt in MAGIC:
+        if head.startswith(magic):
+            return fmt
+    return None
+
+
+# ------------------------------
+# Decompressing binary streams
+# ------------------------------
+def _open_zstd(path):
+    try:
+        from compression import zstd  # Python 3.14+
+        return zstd.open(path, "rb")
+    except ImportError:
+        pass
+    try:
+        import zstandard
+    except ImportError:
+        raise OSError(f"{path}: zstd support needs zstandard. Install with: pip install zstandard")
+    f = open(path, "rb")
+    reader = zstandard.ZstdDecompressor().stream_reader(f, read_size=BLOCK_SIZE,
+                                                        read_across_frames=True,
+                                                        closefd=True)
+    return reader
+
+
+class _ChunkStream(io.RawIOBase):
+    """Read-only raw stream over an iterator of bytes chunks."""
+
+    def __init__(self, chunks, close=None):
+        self._chunks = chunks
+        self._buf = b""
+        self._close = close
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buf:
+            try:
+                self._buf = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buf))
+        b[:n] = self._buf[:n]
+        self._buf = self._buf[n:]
+        return n
+
+    def close(self):
+        if not self.closed and self._close:
+            self._close()
+        super().close()
+
+
+def _bz2_streams(path):
+    """Byte ranges of the bz2 streams in `path` (one range if not split)."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        starts = [mo.start() for mo in _BZ2_STREAM.finditer(m)]
+        size = len(m)
+    if not starts or starts[0] != 0:
+        return [(0, size)]
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def _parallel_bz2(path, ranges):
+    """
+    Decompress bz2 streams concurrently, yielding output in file order with
+    at most 2 * PARALLEL_WORKERS streams in flight. A false stream start
+    (the magic inside compressed data) makes a piece fail to decompress;
+    from the first failing piece on, the rest is decompressed sequentially.
+    """
+    f = open(path, "rb")
+    pool = ThreadPoolExecutor(PARALLEL_WORKERS)
+
+    def work(start, end):
+        return bz2.decompress(os.pread(f.fileno(), end - start, start))
+
+    def chunks():
+        pending = []
+        i = 0
+        while i < len(ranges) or pending:
+            while i < len(ranges) and len(pending) < 2 * PARALLEL_WORKERS:
+                start, end = ranges[i]
+                pending.append((start, end, pool.submit(work, start, end)))
+                i += 1
+            start, end, fut = pending.pop(0)
+            try:
+                yield fut.result()
+            except (OSError, ValueError, EOFError):
+                # not a real stream boundary: redo this piece joined with the rest
+                for _, _, other in pending:
+                    other.cancel()
+                pending.clear()
+                yield from _sequential(start)
+                return
+
+    def _sequential(offset):
+        f.seek(offset)
+        with bz2.open(f, "rb") as z:
+            while True:
+                block = z.read(BLOCK_SIZE)
+                if not block:
+                    return
+                yield block
+
+    def close():
+        pool.shutdown(wait=False, cancel_futures=True)
+        f.close()
+
+    return _ChunkStream(chunks(), close)
+
+
+def open_binary(path, fmt=False):
+    """Binary file object yielding decompressed bytes for compressed files."""
+    if fmt is False:
+        fmt = detect(path)
+    if fmt == "gzip":
+        return gzip.open(path, "rb")  # handles multi-member files
+    if fmt == "bz2":
+        if (os.path.getsize(path) >= PARALLEL_MIN_SIZE and PARALLEL_WORKERS > 1
+                and hasattr(os, "pread")):
+            ranges = _bz2_streams(path)
+            if len(ranges) > 1:
+                return _parallel_bz2(path, ranges)
+        return bz2.open(path, "rb")
+    if fmt == "xz":
+        return lzma.open(path, "rb")
+    if fmt == "zstd":
+        return _open_zstd(path)
+    return open(path, "rb", buffering=BLOCK_SIZE)
+
+
+def open_text(path, encoding="utf-8", errors="strict"):
+    """
+    Open `path` for reading text, transparently decompressing gzip, bz2,
+    xz and zstd files detected by their magic bytes. Paths under an archive
+    mount (see archivefs.py) are read from the archive.
+    """
+    from archivefs import open_member
+    member = open_member(path)
+    if member is not None:
+        return io.TextIOWrapper(member, encoding=encoding, errors=errors)
+    fmt = detect(path)
+    if fmt is None:
+        return open(path, "r", encoding=encoding, errors=errors, buffering=BLOCK_SIZE)
+    # the large buffer makes each decompressor call produce a full block
+    raw = io.BufferedReader(open_binary(path, fmt), BLOCK_SIZE)
+    return io.TextIOWrapper(raw, encoding=encoding, errors=errors)
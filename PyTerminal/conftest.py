@@ -0,0 +1,5 @@
+# conftest.py
+# Modules import each other as top-level names (import metrics, from main
+# import ...); pytest puts this directory on sys.path because of this file.
+
+collect_ignore = ["venv"]
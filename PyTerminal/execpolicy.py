@@ -0,0 +1,389 @@
+# execpolicy.py
+
+import os
+import time
+import signal
+import itertools
+import threading
+import contextvars
+import subprocess
+import spawner
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+
+def _env_number(name, default=None, cast=float):
+    value = os.environ.get(name)
+    return cast(value) if value else default
+
+
+# ------------------------------
+# Execution policy for every child the terminal spawns
+# ------------------------------
+class ExecPolicy:
+    """
+    Limits applied to external commands. Configured from the environment:
+        PYTERMINAL_TIMEOUT        wall-clock seconds (default 60)
+        PYTERMINAL_CPU_SECONDS    CPU seconds (RLIMIT_CPU)
+        PYTERMINAL_MAX_MEMORY_MB  address space in MiB (RLIMIT_AS)
+        PYTERMINAL_MAX_FILES      open files (RLIMIT_NOFILE)
+        PYTERMINAL_MAX_PROCS      processes for the user (RLIMIT_NPROC)
+        PYTERMINAL_CGROUP         cgroup v2 directory to create per-command groups in
+    """
+
+    def __init__(self, timeout=60.0, cpu_seconds=None, memory_mb=None,
+                 max_files=None, max_procs=None, cgroup=None):
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_files = max_files
+        self.max_procs = max_procs
+        self.cgroup = cgroup
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            timeout=_env_number("PYTERMINAL_TIMEOUT", 60.0),
+            cpu_seconds=_env_number("PYTERMINAL_CPU_SECONDS", cast=int),
+            memory_mb=_env_number("PYTERMINAL_MAX_MEMORY_MB", cast=int),
+            max_files=_env_number("PYTERMINAL_MAX_FILES", cast=int),
+            max_procs=_env_number("PYTERMINAL_MAX_PROCS", cast=int),
+            cgroup=os.environ.get("PYTERMINAL_CGROUP") or None,
+        )
+
+    def rlimits(self):
+        if resource is None:
+            return []
+        limits = []
+        if self.cpu_seconds:
+            # soft limit sends SIGXCPU, hard limit one second later SIGKILL
+            limits.append((resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 1)))
+        if self.memory_mb:
+            n = self.memory_mb * 1024 * 1024
+            limits.append((resource.RLIMIT_AS, (n, n)))
+        if self.max_files:
+            limits.append((resource.RLIMIT_NOFILE, (self.max_files, self.max_files)))
+        if self.max_procs and hasattr(resource, "RLIMIT_NPROC"):
+            limits.append((resource.RLIMIT_NPROC, (self.max_procs, self.max_procs)))
+        return limits
+
+    def preexec(self, cgroup=None):
+        return spawner._preexec(self.rlimits(), cgroup)
+
+
+POLICY = ExecPolicy.from_env()
+
+
+# ------------------------------
+# Optional cgroup v2 placement
+# ------------------------------
+_cgroup_ids = itertools.count()
+
+
+def _cgroup_create(policy):
+    """
+    A fresh child cgroup with the policy's limits; returns its path or None.
+    The child joins it itself before exec (spawner._preexec), so it is
+    confined from its first instruction instead of from whenever the parent
+    got round to moving it.
+    """
+    if not policy.cgroup:
+        return None
+    path = os.path.join(policy.cgroup, f"pyterminal-{os.getpid()}-{next(_cgroup_ids)}")
+    try:
+        os.mkdir(path)
+        if policy.memory_mb:
+            with open(os.path.join(path, "memory.max"), "w") as f:
+                f.write(str(policy.memory_mb * 1024 * 1024))
+        if policy.max_procs:
+            with open(os.path.join(path, "pids.max"), "w") as f:
+                f.write(str(policy.max_procs))
+        return path
+    except OSError:
+        _cgroup_remove(path)
+        return None
+
+
+def _cgroup_oom_killed(path):
+    try:
+        with open(os.path.join(path, "memory.events")) as f:
+            events = dict(line.split() for line in f if line.strip())
+        return int(events.get("oom_kill", 0)) > 0
+    except (OSError, ValueError):
+        return False
+
+
+def _cgroup_remove(path):
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
+
+
+# ------------------------------
+# Kill-on-disconnect: children grouped by session
+# ------------------------------
+# ws_handler sets this before running a command; asyncio.to_thread copies it
+CURRENT_SESSION = contextvars.ContextVar("pyterminal_session", default=None)
+
+_running = {}  # session id -> set of Popen
+_running_lock = threading.Lock()
+
+
+def _track(proc, add):
+    session = CURRENT_SESSION.get()
+    with _running_lock:
+        procs = _running.setdefault(session, set())
+        if add:
+            procs.add(proc)
+        else:
+            procs.discard(proc)
+            if not procs:
+                _running.pop(session, None)
+
+
+def _kill_group(proc):
+    try:
+        if os.name == "nt":
+            proc.kill()
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)  # child leads its own session
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+
+
+def kill_session(session_id):
+    """Kill the process groups of every command still running for a session."""
+    with _running_lock:
+        procs = list(_running.pop(session_id, ()))
+    for proc in procs:
+        _kill_group(proc)
+    return len(procs)
+
+
+# ------------------------------
+# Run a command under the policy
+# ------------------------------
+class ExecResult:
+    def __init__(self, returncode, stdout, stderr, violation=None):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.violation = violation  # human-readable limit error, or None
+
+    def output(self):
+        """stdout on success, stderr otherwise, plus any limit violation."""
+        text = self.stdout if self.returncode == 0 else self.stderr
+        if self.violation:
+            text = (text.rstrip("\n") + "\n" if text else "") + self.violation
+        return text
+
+
+# ------------------------------
+# Waiting for a child and its CPU time
+# ------------------------------
+def _wait4(proc, deadline=None):
+    """
+    Reap a Popen child with os.wait4, polling until `deadline` (monotonic)
+    like Popen.wait does. Sets proc.returncode, so Popen never waits for it
+    again, and returns the CPU time (user + system seconds) it used.
+    """
+    delay = 0.0005
+    while True:
+        try:
+            pid, status, usage = os.wait4(proc.pid, 0 if deadline is None else os.WNOHANG)
+        except ChildProcessError:  # reaped elsewhere: nothing to report
+            proc.returncode = 0
+            return None
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return usage.ru_utime + usage.ru_stime
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise subprocess.TimeoutExpired(proc.args, None)
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.05)
+
+
+def _collect(proc, input, deadline):
+    """Feed `input` and read both pipes to EOF on threads, as Popen.communicate does."""
+    out, err = [], []
+
+    def read(stream, chunks):
+        with stream:
+            chunks.append(stream.read())
+
+    def write():
+        try:
+            with proc.stdin:
+                proc.stdin.write(input)
+        except (BrokenPipeError, OSError):
+            pass  # the child stopped reading
+
+    threads = [threading.Thread(target=read, args=(proc.stdout, out), daemon=True),
+               threading.Thread(target=read, args=(proc.stderr, err), daemon=True)]
+    if input is not None:
+        threads.append(threading.Thread(target=write, daemon=True))
+    for t in threads:
+        t.start()
+
+    def join(deadline=None):
+        for t in threads:
+            t.join(None if deadline is None else max(0, deadline - time.monotonic()))
+            if t.is_alive():
+                return None
+        return "".join(out), "".join(err)
+    return join
+
+
+def _communicate(proc, input, timeout):
+    """
+    (stdout, stderr, cpu_time, timed_out) of a child. On timeout its group
+    is killed and what it wrote until then is returned. Children started by
+    the spawn helper report their CPU time themselves; a local Popen child
+    is reaped here with os.wait4 after its pipes are drained.
+    """
+    if not isinstance(proc, subprocess.Popen) or not hasattr(os, "wait4"):
+        try:
+            out, err = proc.communicate(input=input, timeout=timeout)
+            return out, err, getattr(proc, "cpu_time", None), False
+        except subprocess.TimeoutExpired:
+            _kill_group(proc)
+            out, err = proc.communicate()
+            return out, err, getattr(proc, "cpu_time", None), True
+    deadline = None if timeout is None else time.monotonic() + timeout
+    join = _collect(proc, input, deadline)
+    output = join(deadline)
+    if output is not None:
+        try:
+            return output[0], output[1], _wait4(proc, deadline), False
+        except subprocess.TimeoutExpired:
+            pass
+    _kill_group(proc)
+    output = join()
+    return output[0], output[1], _wait4(proc), True
+
+
+def _signal_of(returncode):
+    """Signal that ended the child: killed directly (-signal) or reported by /bin/sh as 128 + signal."""
+    if returncode is None:
+        return None
+    if returncode < 0:
+        return -returncode
+    if 128 < returncode < 128 + 65:
+        return returncode - 128
+    return None
+
+
+def _explain(policy, returncode, stderr, cgroup, cpu_time=None):
+    """
+    The limit a failed child ran into, if any. SIGKILL alone could be the
+    OOM killer, a kill from outside or the CPU hard limit: it only counts as
+    a CPU violation when the child's measured CPU time reached the limit.
+    """
+    if cgroup and _cgroup_oom_killed(cgroup):
+        return f"Error: memory limit of {policy.memory_mb} MiB exceeded (killed by cgroup)"
+    sig = _signal_of(returncode)
+    if policy.cpu_seconds and sig is not None:
+        if (sig == getattr(signal, "SIGXCPU", 24)
+                or (sig == getattr(signal, "SIGKILL", 9) and cpu_time is not None
+                    and cpu_time >= policy.cpu_seconds)):
+            return f"Error: CPU time limit of {policy.cpu_seconds}s exceeded"
+    if returncode == 0 or not stderr:
+        return None
+    err = stderr.lower()
+    if policy.memory_mb and ("cannot allocate memory" in err or "memoryerror" in err
+                             or "out of memory" in err):
+        return f"Error: memory limit of {policy.memory_mb} MiB exceeded"
+    if policy.max_files and "too many open files" in err:
+        return f"Error: open file limit of {policy.max_files} exceeded"
+    if policy.max_procs and "resource temporarily unavailable" in err:
+        return f"Error: process limit of {policy.max_procs} exceeded"
+    return None
+
+
+def _cwd(cwd):
+    if cwd is None:
+        from pyterminal import getcwd
+        cwd = getcwd()
+    return cwd
+
+
+def run(args, shell=False, input=None, policy=None, cwd=None):
+    """
+    Run one child under `policy` (default: POLICY from the environment):
+    own process group, rlimits, optional cgroup, wall-clock timeout, and
+    killed with its whole group if the session disconnects. `cwd` defaults
+    to the working directory of the calling context.
+    Returns an ExecResult.
+    """
+    policy = policy or POLICY
+    cwd = _cwd(cwd)
+    cgroup = _cgroup_create(policy)
+    try:
+        # forked by the spawn helper when it runs, otherwise by this process
+        proc = spawner.spawn(args, shell=shell, stdin=input is not None,
+                             rlimits=policy.rlimits(), cwd=cwd, cgroup=cgroup)
+        if proc is None:
+            proc = subprocess.Popen(
+                args,
+                shell=shell,
+                cwd=cwd,
+                stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                start_new_session=os.name != "nt",
+                preexec_fn=policy.preexec(cgroup),
+            )
+    except BaseException:
+        if cgroup:
+            _cgroup_remove(cgroup)
+        raise
+    _track(proc, True)
+    try:
+        out, err, cpu_time, timed_out = _communicate(proc, input, policy.timeout)
+        if timed_out:
+            return ExecResult(proc.returncode, out, err,
+                              f"Error: wall-clock limit of {policy.timeout:g}s exceeded (killed)")
+        return ExecResult(proc.returncode, out, err,
+                          _explain(policy, proc.returncode, err, cgroup, cpu_time))
+    finally:
+        _track(proc, False)
+        if cgroup:
+            _cgroup_remove(cgroup)
+
+
+def run_shell(command, policy=None, cwd=None):
+    """
+    Run `command` with /bin/sh under `policy`, on a warm coprocess from
+    spawner.SHELL_POOL instead of a fresh shell. Falls back to run() where
+    the pool can't apply the policy (per-command cgroups) or on Windows.
+    """
+    policy = policy or POLICY
+    cwd = _cwd(cwd)
+    if policy.cgroup or os.name == "nt" or spawner.SHELL_POOL.size <= 0:
+        return run(command, shell=True, policy=policy, cwd=cwd)
+    shell = spawner.SHELL_POOL.acquire(policy.rlimits())
+    _track(shell.proc, True)
+    try:
+        try:
+            returncode, out, err = shell.run(command, cwd, policy.timeout)
+        except subprocess.TimeoutExpired:
+            _kill_group(shell.proc)
+            return ExecResult(-signal.SIGKILL, "", "",
+                              f"Error: wall-clock limit of {policy.timeout:g}s exceeded (killed)")
+        return ExecResult(returncode, out, err,
+                          _explain(policy, returncode, err, None, shell.cpu_time))
+    finally:
+        _track(shell.proc, False)
+        spawner.SHELL_POOL.release(shell)
+
+
+def prewarm(shells=1):
+    """Start the spawn helper and a warm shell; call early, before threads start."""
+    if spawner.start() and os.name != "nt" and not POLICY.cgroup:
+        spawner.SHELL_POOL.warm(shells, POLICY.rlimits())
@@ -0,0 +1,320 @@
+# follow.py
+
+import os
+import sys
+import errno
+import struct
+import asyncio
+import codecs
+from pyterminal import safe_print, abspath
+
+READ_BLOCK = 64 * 1024
+POLL_INTERVAL = 0.5
+# Even with inotify, re-check now and then (e.g. files on network mounts)
+SAFETY_INTERVAL = 5.0
+TAIL_LINES = 10
+# Messages waiting per follower; one that falls this far behind is dropped
+QUEUE_SIZE = int(os.environ.get("PYTERMINAL_FOLLOW_QUEUE", 256))
+
+
+# ------------------------------
+# Reading the end of a file
+# ------------------------------
+def read_tail(fd, end, n):
+    """Last `n` lines of the first `end` bytes of an open file, as text."""
+    if n <= 0 or end <= 0:
+        return ""
+    pos, data = end, b""
+    while pos > 0 and data.count(b"\n") <= n:
+        size = min(READ_BLOCK, pos)
+        pos -= size
+        data = os.pread(fd, size, pos) + data
+    lines = data.decode("utf-8", errors="replace").splitlines(keepends=True)
+    return "".join(lines[-n:])
+
+
+def cmd_tail(args):
+    """
+    tail [-n N] <file>   - print the last N lines (default 10)
+    tail -f / follow streams new lines in the web terminal until Ctrl+C.
+    """
+    n = TAIL_LINES
+    files = []
+    it = iter(args)
+    for a in it:
+        if a == "-n":
+            try:
+                n = int(next(it, ""))
+            except ValueError:
+                safe_print("tail: -n expects a number")
+                return False
+        elif a in ("-f", "-F"):
+            safe_print("tail: -f only works in the web terminal, showing the last lines")
+        else:
+            files.append(a)
+    if not files:
+        safe_print("tail: missing file operand")
+        return False
+    ok = True
+    for p in files:
+        try:
+            fd = os.open(abspath(p), os.O_RDONLY)
+            try:
+                text = read_tail(fd, os.fstat(fd).st_size, n)
+            finally:
+                os.close(fd)
+            if text:
+                safe_print(text.rstrip("\n"))
+        except Exception as e:
+            safe_print(f"tail: {e}")
+            ok = False
+    return ok
+
+
+def cmd_follow(args):
+    return cmd_tail(["-f"] + list(args))
+
+
+# ------------------------------
+# Change notification: inotify with polling fallback
+# ------------------------------
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Watches one directory and wakes up on events for one file name in it."""
+
+    def __init__(self, path):
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+        directory, self.name = os.path.split(path)
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            err = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(err, "inotify_add_watch failed")
+        self.name = os.fsencode(self.name)
+        self.event = asyncio.Event()
+        asyncio.get_running_loop().add_reader(self.fd, self._on_readable)
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        pos = 0
+        while pos + _EVENT.size <= len(data):
+            _wd, _mask, _cookie, length = _EVENT.unpack_from(data, pos)
+            name = data[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b"\0")
+            pos += _EVENT.size + length
+            if name == self.name:
+                self.event.set()
+
+    async def wait(self, timeout):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.event.clear()
+
+    def close(self):
+        asyncio.get_running_loop().remove_reader(self.fd)
+        os.close(self.fd)
+
+
+class _Poller:
+    async def wait(self, timeout):
+        await asyncio.sleep(min(timeout, POLL_INTERVAL))
+
+    def close(self):
+        pass
+
+
+def _watcher(path):
+    if sys.platform.startswith("linux"):
+        try:
+            return _Inotify(path), SAFETY_INTERVAL
+        except (OSError, AttributeError):
+            pass
+    return _Poller(), POLL_INTERVAL
+
+
+# ------------------------------
+# One shared reader per file, fanned out to every session following it
+# ------------------------------
+class FileFollower:
+    def __init__(self, path):
+        self.path = path
+        self.subscribers = set()   # asyncio.Queue per follower
+        self.fd = None
+        self.inode = None
+        self.offset = 0
+        self._reset_text()
+        self.task = None
+
+    def _reset_text(self):
+        """Forget any half-read line and multi-byte sequence (new file or truncated)."""
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.partial = ""
+
+    def _open(self):
+        """(Re)open the path; returns True if it exists."""
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        if self.fd is not None:
+            os.close(self.fd)
+        self.fd = fd
+        st = os.fstat(fd)
+        self.inode = (st.st_dev, st.st_ino)
+        return True
+
+    def _publish(self, data):
+        text = self.partial + self.decoder.decode(data)
+        # only complete lines go out; the rest waits for its newline
+        cut = text.rfind("\n") + 1
+        self.partial = text[cut:]
+        if cut:
+            self._deliver(text[:cut])
+
+    def _deliver(self, text):
+        for q in list(self.subscribers):
+            try:
+                q.put_nowait(text)
+            except asyncio.QueueFull:
+                # a client that can't keep up: drop it rather than buffer
+                # the file in memory on its behalf
+                self.subscribers.discard(q)
+                while not q.empty():
+                    q.get_nowait()
+                q.put_nowait(f"follow: {self.path}: output is arriving faster than it "
+                             "can be sent, stopped following\n")
+                q.put_nowait(None)
+
+    async def _drain(self):
+        """
+        Read everything appended since the last offset, one READ_BLOCK at a
+        time on a worker thread: a file growing by gigabytes (or a slow
+        disk) never holds up the event loop, which runs between blocks.
+        """
+        while True:
+            data = await asyncio.to_thread(os.pread, self.fd, READ_BLOCK, self.offset)
+            if not data:
+                return
+            self.offset += len(data)
+            self._publish(data)
+
+    async def check(self):
+        if self.fd is None:
+            if not self._open():
+                return
+            self.offset = 0
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if st is not None and (st.st_dev, st.st_ino) != self.inode:
+            # rotated by rename: finish the old file, continue with the new one
+            await self._drain()
+            rest = self.partial + self.decoder.decode(b"", final=True)
+            if rest:  # last line of the old file, never terminated
+                self._deliver(rest + "\n")
+            self._reset_text()
+            self._open()
+            self.offset = 0
+            self._notice(f"follow: {self.path} was replaced, following the new file")
+        elif os.fstat(self.fd).st_size < self.offset:
+            self.offset = 0
+            self._reset_text()
+            self._notice(f"follow: {self.path} was truncated")
+        await self._drain()
+
+    def _notice(self, message):
+        self._deliver(message + "\n")
+
+    async def run(self):
+        watcher, timeout = _watcher(self.path)
+        try:
+            while self.subscribers:
+                await self.check()
+                await watcher.wait(timeout)
+        finally:
+            watcher.close()
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+    def subscribe(self, lines):
+        """
+        Join; returns (initial tail text, queue of appended text). None on
+        the queue means the follower was dropped for falling behind.
+        """
+        if self.fd is None and not self._open():
+            raise FileNotFoundError(errno.ENOENT, "No such file or directory", self.path)
+        if self.task is None:
+            self.offset = os.fstat(self.fd).st_size
+        tail = read_tail(self.fd, self.offset, lines)
+        q = asyncio.Queue(max(2, QUEUE_SIZE))
+        self.subscribers.add(q)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return tail, q
+
+    def unsubscribe(self, q):
+        self.subscribers.discard(q)
+
+
+_followers = {}  # real path -> FileFollower
+
+
+def subscribe(path, lines=TAIL_LINES):
+    """Follow `path` from the event loop; readers are shared per real path."""
+    real = os.path.realpath(abspath(path))
+    follower = _followers.get(real)
+    if follower is None or (follower.task is not None and follower.task.done()):
+        follower = _followers[real] = FileFollower(real)
+    tail, q = follower.subscribe(lines)
+    return follower, tail, q
+
+
+def unsubscribe(follower, q):
+    follower.unsubscribe(q)
+    if not follower.subscribers:
+        _followers.pop(follower.path, None)  # its reader loop exits on its own
+
+
+def parse_follow(line):
+    """
+    'follow [-n N] <file>' or 'tail -f [-n N] <file>' -> (file, lines),
+    None if `line` is not a follow command. Raises ValueError on bad usage.
+    """
+    import shlex
+    tokens = shlex.split(line)
+    if not tokens:
+        return None
+    if tokens[0] == "follow":
+        args = tokens[1:]
+    elif tokens[0] == "tail" and ("-f" in tokens or "-F" in tokens):
+        args = [t for t in tokens[1:] if t not in ("-f", "-F")]
+    else:
+        return None
+    n = TAIL_LINES
+    if len(args) >= 2 and args[0] == "-n":
+        n = int(args[1])
+        args = args[2:]
+    if len(args) != 1:
+        raise ValueError("usage: follow [-n N] <file>")
+    return args[0], n
@@ -0,0 +1,274 @@
+# globber.py
+
+import os
+import re
+import heapq
+import fnmatch
+from functools import lru_cache
+
+# Default limit on how many directories `**` descends (unset: no limit)
+MAX_DEPTH = int(os.environ["PYTERMINAL_GLOB_MAX_DEPTH"]) if os.environ.get("PYTERMINAL_GLOB_MAX_DEPTH") else None
+
+# Commands that take patterns themselves and must see them unexpanded
+RAW_PATTERN_COMMANDS = {"glob"}
+
+_MAGIC = re.compile(r"[*?[]")
+_BRACE = re.compile(r"\{[^{}]*,[^{}]*\}")
+
+
+def has_magic(text):
+    """True if `text` holds glob characters or a {a,b} brace list."""
+    return bool(_MAGIC.search(text) or _BRACE.search(text))
+
+
+# ------------------------------
+# Brace expansion: a{b,c{d,e}}f -> abf acdf acef
+# ------------------------------
+def _split_top(body):
+    """Split the inside of a brace group on commas not nested in braces."""
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(body):
+        if c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(body[start:i])
+            start = i + 1
+    parts.append(body[start:])
+    return parts
+
+
+def expand_braces(pattern):
+    """Alternatives of `pattern`, left to right; groups without a comma stay literal."""
+    depth, open_at = 0, None
+    for i, c in enumerate(pattern):
+        if c == "{":
+            if depth == 0:
+                open_at = i
+            depth += 1
+        elif c == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                parts = _split_top(pattern[open_at + 1:i])
+                if len(parts) > 1:
+                    head, tail = pattern[:open_at], pattern[i + 1:]
+                    result = []
+                    for part in parts:
+                        result.extend(expand_braces(head + part + tail))
+                    return result
+    return [pattern]
+
+
+# ------------------------------
+# Compiled patterns
+# ------------------------------
+class Pattern:
+    """
+    One brace-free pattern split into path segments. Each segment is either
+    a literal name, the recursive `**`, or a compiled regex for `*`, `?`
+    and [...] classes. Like the shell, wildcards skip names starting with
+    a dot unless the segment itself starts with one.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.root = "/" if text.startswith("/") else ""
+        self.dirs_only = text.endswith("/")
+        self.segments = []
+        for seg in text.strip("/").split("/"):
+            if not seg or seg == ".":
+                continue
+            if seg == "**":
+                if not self.segments or self.segments[-1] != "**":
+                    self.segments.append("**")
+            elif _MAGIC.search(seg):
+                self.segments.append((re.compile(fnmatch.translate(seg)).match,
+                                      seg.startswith(".")))
+            else:
+                self.segments.append(seg)
+        if self.segments and self.segments[-1] == "**" and not self.dirs_only:
+            # a trailing ** matches files too, not only directories
+            self.segments.append((re.compile(fnmatch.translate("*")).match, False))
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern):
+    """Brace-expand and compile `pattern` once; returns a tuple of Pattern."""
+    seen, result = set(), []
+    for alt in expand_braces(pattern):
+        if alt not in seen:
+            seen.add(alt)
+            result.append(Pattern(alt))
+    return tuple(result)
+
+
+# ------------------------------
+# Walking the tree
+# ------------------------------
+def _key(path):
+    return path.split("/")
+
+
+class Walker:
+    """
+    Matches patterns against the file system. Every directory is read with
+    a single scandir and the listing is kept for the lifetime of the walker,
+    so all tokens of one command share it. Relative patterns are matched
+    under `root` (the current working directory) and yielded relative.
+    """
+
+    def __init__(self, max_depth=MAX_DEPTH, root=None):
+        if root is None:
+            from pyterminal import getcwd
+            root = getcwd()
+        self.max_depth = max_depth
+        self.root = root
+        self._listings = {}  # directory -> sorted [(name, is_dir)]
+
+    def _fs(self, path):
+        return os.path.join(self.root, path) if path else self.root
+
+    def listdir(self, directory):
+        listing = self._listings.get(directory)
+        if listing is None:
+            listing = []
+            try:
+                with os.scandir(self._fs(directory)) as it:
+                    for entry in it:
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        listing.append((entry.name, is_dir))
+            except OSError:
+                pass
+            listing.sort()
+            self._listings[directory] = listing
+        return listing
+
+    def _is_dir(self, path):
+        if path in ("", "/"):
+            return True
+        parent, name = os.path.split(path)
+        if parent in self._listings:
+            return any(n == name and d for n, d in self._listings[parent])
+        return os.path.isdir(self._fs(path))
+
+    def _walk(self, pattern, base, i, depth):
+        """Matches of pattern.segments[i:] under `base`, in sorted order."""
+        segments = pattern.segments
+        if i == len(segments):
+            if base and (not pattern.dirs_only or self._is_dir(base)):
+                yield base.rstrip("/") + "/" if pattern.dirs_only else base
+            return
+        seg = segments[i]
+        join = (lambda name: base.rstrip("/") + "/" + name) if base else (lambda name: name)
+
+        if seg == "**":
+            # zero directories, merged with every (non-hidden) subdirectory;
+            # subdirectories come sorted, so only these two streams interleave
+            here = self._walk(pattern, base, i + 1, depth)
+            if self.max_depth is not None and depth >= self.max_depth:
+                yield from here
+                return
+            deeper = (path
+                      for name, is_dir in self.listdir(base)
+                      if is_dir and not name.startswith(".")
+                      for path in self._walk(pattern, join(name), i, depth + 1))
+            last = None
+            for path in heapq.merge(here, deeper, key=_key):
+                if path != last:
+                    yield path
+                    last = path
+            return
+
+        last_segment = i == len(segments) - 1
+        if isinstance(seg, str):
+            path = join(seg)
+            if last_segment and not pattern.dirs_only:
+                if os.path.lexists(self._fs(path)):
+                    yield path
+            elif self._is_dir(path):
+                yield from self._walk(pattern, path, i + 1, depth)
+            return
+
+        match, dotted = seg
+        for name, is_dir in self.listdir(base):
+            if name.startswith(".") and not dotted:
+                continue
+            if not match(name):
+                continue
+            if last_segment and not pattern.dirs_only:
+                yield join(name)
+            elif is_dir:
+                yield from self._walk(pattern, join(name), i + 1, depth)
+
+    def iglob(self, pattern):
+        """Yield the matches of one pattern (braces included) in sorted order."""
+        streams = [self._walk(p, p.root, 0, 0) for p in compile_pattern(pattern)]
+        if len(streams) == 1:
+            yield from streams[0]
+            return
+        last = None
+        for path in heapq.merge(*streams, key=_key):
+            if path != last:
+                yield path
+                last = path
+
+    def glob(self, pattern):
+        return list(self.iglob(pattern))
+
+
+def iglob(pattern, max_depth=MAX_DEPTH):
+    return Walker(max_depth).iglob(pattern)
+
+
+# ------------------------------
+# Shell word expansion
+# ------------------------------
+def expand_globs(tokens, walker=None):
+    """
+    Replace every token holding glob characters or braces with its sorted
+    matches. Tokens that match nothing are kept as typed. One Walker is
+    shared by all tokens, so each directory is scanned once.
+    """
+    walker = walker or Walker()
+    expanded_tokens = []
+    for t in tokens:
+        if has_magic(t):
+            matches = walker.glob(t)
+            expanded_tokens.extend(matches or [t])
+        else:
+            expanded_tokens.append(t)
+    return expanded_tokens
+
+
+def cmd_glob(args):
+    """glob [--max-depth N] <pattern>...  - list matches, e.g. glob 'logs/**/*.{log,gz}'"""
+    from pyterminal import safe_print
+    max_depth = MAX_DEPTH
+    patterns = []
+    it = iter(args)
+    for a in it:
+        if a == "--max-depth" or a.startswith("--max-depth="):
+            value = a.split("=", 1)[1] if "=" in a else next(it, "")
+            try:
+                max_depth = int(value)
+            except ValueError:
+                safe_print("glob: --max-depth expects a number")
+                return False
+        else:
+            patterns.append(a)
+    if not patterns:
+        safe_print("Usage: glob [--max-depth N] <pattern>...")
+        return False
+    walker = Walker(max_depth)
+    found = False
+    for pattern in patterns:
+        for path in walker.iglob(pattern):
+            safe_print(path)
+            found = True
+    if not found:
+        safe_print("glob: no matches")
+    return found
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# loadgen.py
+"""
+WebSocket load generator and latency soak harness for ws_handler.
+
+Starts N simulated clients that speak the terminal protocol (plain
+commands, __TAB__, __UP__, __CTRL_C__, write and edit sessions) with a
+weighted operation mix and random think times, then writes a JSON report
+with p50/p99/p999 round-trip latency, throughput, errors, server RSS and
+executor usage (scraped from the server's /metrics). Only local servers
+are accepted.
+
+Usage:
+    python loadgen.py --clients 200 --duration 300 --report soak.json
+    python loadgen.py --spawn --clients 50 --duration 60      # start a server too
+    python loadgen.py --mix command=80,tab=10,up=10 --think 0.05-0.5
+    python loadgen.py --compare old.json new.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from urllib.parse import urlparse
+
+import websockets
+
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+PROMPT_SUFFIXES = ("$ ", "(write) > ", "(edit) > ")
+
+DEFAULT_MIX = {"command": 60, "tab": 15, "up": 10, "ctrl_c": 5, "write": 5, "edit": 5}
+
+# {dir} is replaced with the fixture directory created for the run
+DEFAULT_COMMANDS = [
+    "pwd",
+    "echo hello world",
+    "ls {dir}",
+    "ls-l {dir}",
+    "cat {dir}/sample.txt",
+    "cat {dir}/sample.txt | sort | uniq",
+    "help",
+]
+
+
+# ------------------------------
+# Stats
+# ------------------------------
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(samples):
+    values = sorted(samples)
+    ms = lambda v: None if v is None else round(v * 1000, 3)
+    return {
+        "count": len(values),
+        "p50_ms": ms(percentile(values, 50)),
+        "p99_ms": ms(percentile(values, 99)),
+        "p999_ms": ms(percentile(values, 99.9)),
+        "max_ms": ms(values[-1] if values else None),
+    }
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = {}   # op -> [seconds]
+        self.errors = {}      # op -> count
+        self.server = []      # [{"t", "rss_kib", "threads", "inflight", "queue_depth"}]
+
+    def record(self, op, seconds):
+        self.latencies.setdefault(op, []).append(seconds)
+
+    def error(self, op):
+        self.errors[op] = self.errors.get(op, 0) + 1
+
+
+# ------------------------------
+# Simulated client
+# ------------------------------
+async def recv_until_prompt(ws, timeout):
+    while True:
+        msg = await asyncio.wait_for(ws.recv(), timeout)
+        if isinstance(msg, str) and msg.endswith(PROMPT_SUFFIXES):
+            return
+
+
+async def timed(stats, op, coro):
+    start = time.perf_counter()
+    try:
+        await coro
+    except (asyncio.TimeoutError, websockets.exceptions.ConnectionClosed):
+        stats.error(op)
+        raise
+    stats.record(op, time.perf_counter() - start)
+
+
+async def op_command(ws, ctx):
+    await ws.send(random.choice(ctx["commands"]))
+    await recv_until_prompt(ws, ctx["timeout"])
+    ctx["history"] = True
+
+
+async def op_tab(ws, ctx):
+    await ws.send("__TAB__" + random.choice(["l", "ec", "ca", "hi", "ps"]))
+    await asyncio.wait_for(ws.recv(), ctx["timeout"])
+
+
+async def op_up(ws, ctx):
+    if not ctx["history"]:  # the server stays silent on an empty history
+        return await op_command(ws, ctx)
+    await ws.send("__UP__")
+    await asyncio.wait_for(ws.recv(), ctx["timeout"])
+
+
+async def op_ctrl_c(ws, ctx):
+    await ws.send("__CTRL_C__")
+    await recv_until_prompt(ws, ctx["timeout"])
+
+
+async def op_write(ws, ctx):
+    path = os.path.join(ctx["dir"], f"write_{ctx['client']}.txt")
+    await ws.send(f"write {path}")
+    await recv_until_prompt(ws, ctx["timeout"])
+    for i in range(random.randint(1, 20)):
+        await ws.send(f"line {i} from client {ctx['client']}")
+        await recv_until_prompt(ws, ctx["timeout"])
+    await ws.send(".")
+    await recv_until_prompt(ws, ctx["timeout"])
+
+
+async def op_edit(ws, ctx):
+    await ws.send(f"edit {ctx['dir']}/sample.txt")
+    await recv_until_prompt(ws, ctx["timeout"])
+    await ws.send(":p")
+    await recv_until_prompt(ws, ctx["timeout"])
+    await ws.send(":q")
+    await recv_until_prompt(ws, ctx["timeout"])
+
+
+OPS = {
+    "command": op_command,
+    "tab": op_tab,
+    "up": op_up,
+    "ctrl_c": op_ctrl_c,
+    "write": op_write,
+    "edit": op_edit,
+}
+
+
+async def client(n, url, mix, opts, stats, deadline):
+    ctx = {
+        "client": n,
+        "dir": opts.fixture_dir,
+        "commands": opts.commands,
+        "timeout": opts.timeout,
+        "history": False,
+    }
+    names, weights = list(mix), list(mix.values())
+    # a timeout or a dropped connection is counted, then the client
+    # reconnects: a late reply would otherwise be read as the next one's
+    while time.monotonic() < deadline:
+        try:
+            async with websockets.connect(url, max_size=None) as ws:
+                await recv_until_prompt(ws, opts.timeout)  # initial prompt
+                ctx["history"] = False
+                while time.monotonic() < deadline:
+                    op = random.choices(names, weights)[0]
+                    await timed(stats, op, OPS[op](ws, ctx))
+                    await asyncio.sleep(random.uniform(*opts.think))
+        except asyncio.TimeoutError:
+            stats.error("timeout")
+        except (OSError, websockets.exceptions.ConnectionClosed):
+            stats.error("connection")
+            await asyncio.sleep(min(1.0, max(0, deadline - time.monotonic())))
+
+
+# ------------------------------
+# Server sampling (local /proc and /metrics)
+# ------------------------------
+def read_proc_status(pid):
+    """Return (rss_kib, threads) for a local pid, or (None, None)."""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]), int(fields["Threads"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+EXECUTOR_GAUGES = {
+    "pyterminal_executor_inflight": "inflight",
+    "pyterminal_executor_queue_depth": "queue_depth",
+}
+
+
+def read_executor_gauges(url, timeout=2.0):
+    """Executor gauges from the server's /metrics, {} when it can't be read."""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            text = resp.read().decode("utf-8", "replace")
+    except (OSError, ValueError):
+        return {}
+    values = {}
+    for line in text.splitlines():
+        name, _, value = line.partition(" ")
+        if name in EXECUTOR_GAUGES:
+            try:
+                values[EXECUTOR_GAUGES[name]] = float(value)
+            except ValueError:
+                pass
+    return values
+
+
+async def sample_server(pid, metrics_url, stats, interval, deadline):
+    start = time.monotonic()
+    while time.monotonic() < deadline:
+        sample = {"t": round(time.monotonic() - start, 2)}
+        if pid:
+            sample["rss_kib"], sample["threads"] = read_proc_status(pid)
+        if metrics_url:
+            sample.update(await asyncio.to_thread(read_executor_gauges, metrics_url))
+        if any(v is not None for k, v in sample.items() if k != "t"):
+            stats.server.append(sample)
+        await asyncio.sleep(interval)
+
+
+def server_summary(samples):
+    if not samples:
+        return None
+    summary = {"samples": samples}
+    rss = [s["rss_kib"] for s in samples if s.get("rss_kib") is not None]
+    if rss:
+        summary.update(rss_kib_start=rss[0], rss_kib_max=max(rss), rss_kib_end=rss[-1],
+                       threads_max=max(s["threads"] for s in samples if s.get("threads") is not None))
+    queued = [s["queue_depth"] for s in samples if "queue_depth" in s]
+    if queued:
+        # asyncio.to_thread uses the default executor: min(32, cpu_count + 4) workers
+        pool_size = min(32, (os.cpu_count() or 1) + 4)
+        inflight = [s.get("inflight", 0) for s in samples]
+        summary.update(
+            executor_workers=pool_size,
+            executor_inflight_max=max(inflight),
+            executor_queue_depth_max=max(queued),
+            executor_saturation_max=round(min(1.0, max(inflight) / pool_size), 3),
+            executor_saturated_samples=sum(1 for q in queued if q > 0),
+        )
+    return summary
+
+
+# ------------------------------
+# Run
+# ------------------------------
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in OPS:
+            raise argparse.ArgumentTypeError(f"unknown op '{name}' (known: {', '.join(OPS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def parse_think(text):
+    lo, _, hi = text.partition("-")
+    return float(lo), float(hi or lo)
+
+
+def check_local(url):
+    host = urlparse(url).hostname
+    if host not in LOCAL_HOSTS:
+        sys.exit(f"loadgen: refusing to target non-local host '{host}'")
+
+
+def spawn_server(port):
+    env = dict(os.environ, PORT=str(port))
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.Popen([sys.executable, "ws_handler.py"], cwd=here, env=env,
+                            stdout=subprocess.DEVNULL)
+    time.sleep(1.0)
+    return proc
+
+
+async def run(opts):
+    stats = Stats()
+    deadline = time.monotonic() + opts.ramp + opts.duration
+    tasks = []
+    if opts.server_pid or opts.metrics_url:
+        tasks.append(asyncio.create_task(
+            sample_server(opts.server_pid, opts.metrics_url, stats, opts.sample_interval, deadline)))
+    started = time.monotonic()
+    for n in range(opts.clients):
+        tasks.append(asyncio.create_task(client(n, opts.url, opts.mix, opts, stats, deadline)))
+        if opts.ramp:
+            await asyncio.sleep(opts.ramp / opts.clients)
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+
+    all_samples = [s for values in stats.latencies.values() for s in values]
+    return {
+        "config": {
+            "url": opts.url,
+            "clients": opts.clients,
+            "duration_s": opts.duration,
+            "ramp_s": opts.ramp,
+            "think_s": list(opts.think),
+            "mix": opts.mix,
+            "commands": opts.commands,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "throughput_ops_s": round(len(all_samples) / elapsed, 2) if elapsed else 0,
+        "latency": summarize(all_samples),
+        "latency_by_op": {op: summarize(v) for op, v in sorted(stats.latencies.items())},
+        "errors": stats.errors,
+        "server": server_summary(stats.server),
+    }
+
+
+def compare_reports(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'metric':28} {'old':>12} {'new':>12}")
+    rows = [("throughput_ops_s", old.get("throughput_ops_s"), new.get("throughput_ops_s"))]
+    for key in ("p50_ms", "p99_ms", "p999_ms"):
+        rows.append((key, old["latency"].get(key), new["latency"].get(key)))
+    for key in ("rss_kib_max", "executor_queue_depth_max"):
+        if key in (old.get("server") or {}) and key in (new.get("server") or {}):
+            rows.append((key, old["server"][key], new["server"][key]))
+    rows.append(("errors", sum(old["errors"].values()), sum(new["errors"].values())))
+    for name, a, b in rows:
+        print(f"{name:28} {str(a):>12} {str(b):>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WebSocket load generator (local only)")
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("-c", "--clients", type=int, default=50)
+    parser.add_argument("-d", "--duration", type=float, default=60, help="soak seconds")
+    parser.add_argument("--ramp", type=float, default=0, help="seconds to start all clients")
+    parser.add_argument("--think", type=parse_think, default=(0.1, 1.0),
+                        help="think time range in seconds, e.g. 0.1-1.0")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="op weights, e.g. command=60,tab=15,up=10,ctrl_c=5,write=5,edit=5")
+    parser.add_argument("--command", dest="commands", action="append",
+                        help="command line for the 'command' op (repeatable, {dir} = fixtures)")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--server-pid", type=int, help="sample RSS/threads of this pid")
+    parser.add_argument("--metrics-url",
+                        help="server /metrics to sample executor gauges from "
+                             "(default: http://127.0.0.1:<port + 1>/metrics, 'none' to skip)")
+    parser.add_argument("--sample-interval", type=float, default=1.0)
+    parser.add_argument("--spawn", action="store_true", help="start ws_handler.py locally")
+    parser.add_argument("--report", help="write the JSON report here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    opts = parser.parse_args(argv)
+
+    if opts.compare:
+        compare_reports(*opts.compare)
+        return 0
+
+    check_local(opts.url)
+    port = urlparse(opts.url).port or 8000
+    if opts.metrics_url is None:
+        opts.metrics_url = f"http://127.0.0.1:{port + 1}/metrics"  # ws_handler's METRICS_PORT default
+    elif opts.metrics_url == "none":
+        opts.metrics_url = None
+    else:
+        check_local(opts.metrics_url)
+
+    with tempfile.TemporaryDirectory(prefix="pyterminal-load-") as fixture_dir:
+        opts.fixture_dir = fixture_dir
+        with open(os.path.join(fixture_dir, "sample.txt"), "w") as f:
+            f.write("\n".join(f"line {i % 50}" for i in range(500)) + "\n")
+        opts.commands = [c.format(dir=fixture_dir) for c in (opts.commands or DEFAULT_COMMANDS)]
+
+        server = None
+        if opts.spawn:
+            server = spawn_server(port)
+            opts.server_pid = opts.server_pid or server.pid
+        try:
+            report = asyncio.run(run(opts))
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if opts.report:
+        with open(opts.report, "w") as f:
+            f.write(text + "\n")
+        print(f"Report written to {opts.report}")
+    lat = report["latency"]
+    print(f"{report['throughput_ops_s']} ops/s  p50 {lat['p50_ms']} ms  "
+          f"p99 {lat['p99_ms']} ms  p999 {lat['p999_ms']} ms  errors {report['errors']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,9 @@
 # main.py
 import os
-import shlex
-from pyterminal import *
-from nlp_handler import parse_nlp_command
-from shell_features import cmd_shell
-from advanced_ls import cmd_ls_l
-from process_mgmt import list_processes, kill_process, filter_process
-from io import StringIO
-import sys
-import subprocess
+from pyterminal import COMMANDS, WorkingDirectory, captured_stdout, working_directory
+import time
+import metrics
+from shellparse import plan_for
 
 # Commands that take zero arguments
 ZERO_ARG_COMMANDS = ["ps-list", "sysinfo", "history"]
@@ -22,63 +17,121 @@ LIST_ARG_COMMANDS = ["rmdir", "rm", "echo", "cp", "mv"]
 # ------------------------------
 # Run shell command via subprocess (used for 'shell ...')
 # ------------------------------
+def _run_shell(command: str):
+    import execpolicy
+    if os.name == "nt":  # Windows
+        ps_cmd = f'powershell -Command "{command}"'
+        return execpolicy.run(ps_cmd, shell=True)
+    # Linux / macOS: a warm /bin/sh from the shell pool
+    return execpolicy.run_shell(command)
+
 def run_shell_command(command: str) -> str:
     try:
-        if os.name == "nt":  # Windows
-            ps_cmd = f'powershell -Command "{command}"'
-            result = subprocess.run(
-                ps_cmd, capture_output=True, text=True, shell=True
-            )
-        else:  # Linux / macOS
-            result = subprocess.run(
-                command, shell=True, capture_output=True, text=True
-            )
-        return result.stdout if result.returncode == 0 else result.stderr
+        return _run_shell(command).output()
     except Exception as e:
         return f"Error: {str(e)}"
 
+# ------------------------------
+# Capture what a command prints into a string
+# ------------------------------
+def capture(func, *args):
+    """Run func(*args); returns (what it printed, what it returned)."""
+    with captured_stdout() as out:
+        value = func(*args)
+    return out.getvalue(), value
+
+def capture_status(func, *args):
+    """Run a command; returns (what it printed, ok). Commands return False on failure."""
+    output, value = capture(func, *args)
+    return output, value is not False
+
 # ------------------------------
 # Main command handler
 # ------------------------------
+def run_line(line: str, cwd=None):
+    """
+    Run one command line; returns (output, ok). With `cwd` (a path or a
+    pyterminal.WorkingDirectory) the line runs there without touching the
+    process working directory.
+    """
+    if cwd is not None:
+        if isinstance(cwd, str):
+            cwd = WorkingDirectory(cwd)
+        with working_directory(cwd):
+            return run_line(line)
+    start = time.perf_counter()
+    state = {"kind": None, "name": None, "ok": True}
+    try:
+        output = _dispatch(line.strip(), state)
+        return output, state["ok"]
+    except Exception as e:
+        state["ok"] = False
+        return f"Error: {e}", False
+    finally:
+        if state["kind"]:
+            metrics.observe_command(state["kind"], state["name"],
+                                    time.perf_counter() - start, not state["ok"])
+
 def handle_command(line: str) -> str:
-    import sys
-    from io import StringIO
+    return run_line(line)[0]
 
-    try:
-        line = line.strip()
-        if not line:
-            return ""
-        if line in ("exit", "quit"):
-            return "exit"
-
-        # Shell pipelines / redirects / wildcards
-        if line.startswith("shell ") or any(c in line for c in "|><*?"):
-            cmd = line[len("shell "):].strip() if line.startswith("shell ") else line
-            return run_shell_command(cmd) if line.startswith("shell ") else cmd_shell(line)
-
-        tokens = shlex.split(line)
-        if not tokens:
-            return ""
-
-        cmd_name = tokens[0]
-        args = tokens[1:]
-
-        if cmd_name in COMMANDS:
-            # Capture stdout into string
-            old_stdout = sys.stdout
-            sys.stdout = mystdout = StringIO()
-            try:
-                COMMANDS[cmd_name](args)  # pass full args list
-            finally:
-                sys.stdout = old_stdout
-            return mystdout.getvalue()
-
-        # NLP fallback
-        nlp_cmd = parse_nlp_command(line)
-        if nlp_cmd:
-            return cmd_shell(nlp_cmd.strip().strip("`\"'"))
-
-        return f"{cmd_name}: command not found"
+def _dispatch(line, state):
+    if not line:
+        return ""
+    if line in ("exit", "quit"):
+        return "exit"
 
-    except Exception as e:
-        return f"Error: {e}"
+    # profile takes a whole command line, pipes and redirects included
+    if line.startswith("profile "):
+        from profiler import run_profile
+        state["kind"] = state["name"] = "profile"
+        return run_profile(line[len("profile "):])
+
+    # shell hands the rest of the line to the system shell untouched
+    if line.startswith("shell "):
+        state["kind"] = state["name"] = "external"
+        result = _run_shell(line[len("shell "):].strip())
+        state["ok"] = result.returncode == 0 and not result.violation
+        return result.output()
+
+    plan = plan_for(line)  # cached per line
+    if plan.empty:
+        return ""
+    command = plan.simple
+
+    # Pipelines, sequences and redirects
+    if command is None:
+        from shell_features import execute
+        state["kind"] = state["name"] = "builtin"
+        output, state["ok"] = capture(execute, plan)
+        return output
+
+    cmd_name = command.name
+    if cmd_name in COMMANDS:
+        state["kind"], state["name"] = "command", cmd_name
+        args = command.argv()[1:]  # globs expanded, full args list
+        func = COMMANDS[cmd_name]
+        if COMMANDS.is_read_only(cmd_name):
+            from resultcache import run_cached
+            output, state["ok"] = run_cached(cmd_name, args, lambda: capture_status(func, args))
+        else:
+            output, state["ok"] = capture_status(func, args)
+        return output
+
+    # Builtins and external commands with wildcards
+    from shell_features import cmd_shell, execute
+    if command.globbed:
+        state["kind"] = state["name"] = "builtin"
+        output, state["ok"] = capture(execute, plan)
+        return output
+
+    # NLP fallback
+    from nlp_handler import parse_nlp_command
+    state["kind"] = state["name"] = "nlp"
+    nlp_cmd = parse_nlp_command(line)
+    if nlp_cmd:
+        output, state["ok"] = capture_status(cmd_shell, nlp_cmd.strip().strip("`\"'"))
+        return output
+
+    state["ok"] = False
+    return f"{cmd_name}: command not found"
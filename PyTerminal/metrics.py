@@ -0,0 +1,199 @@
+# metrics.py
+
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Bytes sent over one WebSocket session
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+# ------------------------------
+# Metric types (Prometheus text format)
+# ------------------------------
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(v):
+    return repr(float(v)) if isinstance(v, float) and v != int(v) else str(int(v))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help):
+        self.name, self.help = name, help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [(self.name, key, (), v) for key, v in items]
+
+
+class Gauge(Counter):
+    """Gauge set by the caller, or computed by `func` at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name, help, func=None):
+        super().__init__(name, help)
+        self._func = func
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self._func is not None:
+            return [(self.name, (), (), self._func())]
+        return super().samples()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(buckets)
+        self._series = {}  # label key -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if i < len(self.buckets):
+                series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        out = []
+        for key, series in items:
+            running = 0
+            for bound, n in zip(self.buckets, series):
+                running += n
+                out.append((self.name + "_bucket", key, (("le", _format_value(bound)),), running))
+            out.append((self.name + "_bucket", key, (("le", "+Inf"),), series[-1]))
+            out.append((self.name + "_sum", key, (), series[-2]))
+            out.append((self.name + "_count", key, (), series[-1]))
+        return out
+
+
+REGISTRY = []
+
+
+def register(metric):
+    """Add `metric`; one registered under the same name is replaced."""
+    REGISTRY[:] = [m for m in REGISTRY if m.name != metric.name]
+    REGISTRY.append(metric)
+    return metric
+
+
+def render():
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, key, extra, value in metric.samples():
+            lines.append(f"{name}{_format_labels(key, extra)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ------------------------------
+# PyTerminal metrics
+# ------------------------------
+COMMAND_LATENCY = register(Histogram(
+    "pyterminal_command_duration_seconds",
+    "Command latency by kind (command, builtin, external, nlp) and name"))
+COMMAND_ERRORS = register(Counter(
+    "pyterminal_command_errors_total",
+    "Commands that failed, raised or were not found"))
+NLP_LATENCY = register(Histogram(
+    "pyterminal_nlp_duration_seconds",
+    "Latency of natural language translation calls"))
+OPEN_CONNECTIONS = register(Gauge(
+    "pyterminal_open_connections",
+    "Open WebSocket connections"))
+BYTES_SENT = register(Counter(
+    "pyterminal_sent_bytes_total",
+    "Bytes sent to WebSocket clients"))
+SESSION_BYTES = register(Histogram(
+    "pyterminal_session_sent_bytes",
+    "Bytes sent per WebSocket session, observed on disconnect", SIZE_BUCKETS))
+EXECUTOR_INFLIGHT = register(Gauge(
+    "pyterminal_executor_inflight",
+    "Commands submitted to the worker thread pool and not finished yet"))
+
+
+def observe_command(kind, name, seconds, error=False):
+    COMMAND_LATENCY.observe(seconds, kind=kind, command=name)
+    if error:
+        COMMAND_ERRORS.inc(kind=kind, command=name)
+
+
+# ------------------------------
+# HTTP endpoint
+# ------------------------------
+def start_metrics_server(host, port, setup=None):
+    """
+    Serve GET /metrics from a daemon thread. `setup(app)` may add more
+    routes to the Flask app. Returns the server.
+    """
+    from flask import Flask, Response
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        # HTTP/1.1: persistent connections, chunked streaming responses
+        protocol_version = "HTTP/1.1"
+
+    app = Flask("pyterminal-metrics")
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
+
+    if setup is not None:
+        setup(app)
+
+    server = make_server(host, port, app, threaded=True, request_handler=KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,158 @@
+# multiworker.py
+
+import os
+import time
+import signal
+import socket
+import asyncio
+import tempfile
+import threading
+import multiprocessing
+
+# Seconds between process table samples shared with every worker
+SAMPLE_INTERVAL = float(os.environ.get("PROCESS_SAMPLE_INTERVAL", 1.0))
+READY_TIMEOUT = 15
+# Same setting ws_handler uses to drain a stopping worker
+DRAIN_TIMEOUT = float(os.environ.get("DRAIN_TIMEOUT", 30))
+
+
+# ------------------------------
+# Listening socket
+# ------------------------------
+def listen_socket(host, port):
+    """
+    The one listening socket every worker accepts on. Per-worker
+    SO_REUSEPORT sockets are not used: each has its own accept queue, and
+    connections queued on a draining worker's socket are reset when it
+    closes, which makes rolling restarts drop clients.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(socket.SOMAXCONN)
+    sock.setblocking(False)
+    return sock
+
+
+# ------------------------------
+# Worker process
+# ------------------------------
+def worker_main(index, host, port, ready, released, shared_sock):
+    """
+    Entry point of one worker. All workers accept on the socket inherited
+    from the supervisor, so a stopping worker only stops taking connections
+    and the others pick up whatever is queued. A connection stays on the
+    worker that accepted it (session affinity). `released` is set once a
+    stopping worker has closed its metrics and API ports.
+    """
+    import ws_handler
+
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)  # only the supervisor reloads
+    asyncio.run(ws_handler.serve(host, port, sock=shared_sock, worker=index,
+                                 ready=ready, released=released))
+
+
+# ------------------------------
+# Supervisor
+# ------------------------------
+class Supervisor:
+    """
+    Forks N workers sharing one port and keeps them running.
+    SIGHUP   - rolling restart: stop the old worker (it gives up its HTTP
+               ports and drains), start its replacement on the same ports
+    SIGTERM  - drain and stop every worker
+    Dead workers are respawned. The supervisor also samples the process table
+    once for everybody (see process_mgmt.write_process_snapshot).
+    """
+
+    def __init__(self, workers, host, port):
+        self.count = workers
+        self.host, self.port = host, port
+        self.ctx = multiprocessing.get_context("fork")
+        self.workers = {}   # index -> Process
+        self.released = {}  # index -> Event set when the worker freed its HTTP ports
+        # bound once here; workers inherit it and it outlives any one of them
+        self.shared_sock = listen_socket(host, port)
+        # in a directory only this user can enter: a predictable name in
+        # /tmp could be planted or replaced by anyone
+        self.runtime_dir = tempfile.mkdtemp(prefix=f"pyterminal-{port}-")
+        self.snapshot = os.path.join(self.runtime_dir, "processes.json")
+        self._restart = False
+        self._stopping = False
+
+    def spawn(self, index):
+        ready = self.ctx.Event()
+        self.released[index] = released = self.ctx.Event()
+        proc = self.ctx.Process(target=worker_main, name=f"pyterminal-worker-{index}",
+                                args=(index, self.host, self.port, ready, released, self.shared_sock))
+        proc.start()
+        if not ready.wait(READY_TIMEOUT):
+            print(f"Worker {index} (pid {proc.pid}) did not become ready")
+        return proc
+
+    def stop_worker(self, proc):
+        if proc.is_alive():
+            proc.terminate()  # SIGTERM: stop accepting, drain sessions
+            proc.join(DRAIN_TIMEOUT + 5)
+        if proc.is_alive():
+            proc.kill()
+            proc.join()
+
+    def rolling_restart(self):
+        print("Rolling restart of workers")
+        for index in sorted(self.workers):
+            old = self.workers[index]
+            # the replacement binds the same METRICS_PORT/API_PORT + index:
+            # wait for the old worker to close them, it drains WebSockets meanwhile
+            if old.is_alive():
+                old.terminate()
+                if not self.released[index].wait(READY_TIMEOUT):
+                    print(f"Worker {index} (pid {old.pid}) did not release its ports")
+            self.workers[index] = self.spawn(index)
+            self.stop_worker(old)
+
+    def sample_processes(self):
+        from process_mgmt import write_process_snapshot
+        while not self._stopping:
+            try:
+                write_process_snapshot(self.snapshot)
+            except Exception as e:
+                print(f"process sampler: {e}")
+            time.sleep(SAMPLE_INTERVAL)
+
+    def _on_hup(self, signum, frame):
+        self._restart = True
+
+    def _on_term(self, signum, frame):
+        self._stopping = True
+
+    def run(self):
+        os.environ["PYTERMINAL_PROCESS_SNAPSHOT"] = self.snapshot
+        signal.signal(signal.SIGHUP, self._on_hup)
+        signal.signal(signal.SIGTERM, self._on_term)
+        signal.signal(signal.SIGINT, self._on_term)
+
+        print(f"Supervisor pid {os.getpid()}: {self.count} workers on port {self.port}")
+        print("Session resume is off with WORKERS > 1: a reconnect can reach any worker, "
+              "and sessions end when their connection closes")
+        for index in range(self.count):
+            self.workers[index] = self.spawn(index)
+        threading.Thread(target=self.sample_processes, name="ps-sampler", daemon=True).start()
+
+        while not self._stopping:
+            time.sleep(0.5)
+            if self._restart:
+                self._restart = False
+                self.rolling_restart()
+            for index, proc in list(self.workers.items()):
+                if not proc.is_alive() and not self._stopping:
+                    print(f"Worker {index} exited ({proc.exitcode}), respawning")
+                    self.workers[index] = self.spawn(index)
+
+        for proc in self.workers.values():
+            if proc.is_alive():
+                proc.terminate()
+        for proc in self.workers.values():
+            self.stop_worker(proc)
+        import shutil
+        shutil.rmtree(self.runtime_dir, ignore_errors=True)
@@ -1,6 +1,7 @@
 # nlp_handler.py
 
 import subprocess
+from metrics import NLP_LATENCY
 
 # Replace this with the name of the Ollama model installed on your laptop
 MODEL_NAME = "llama3.2:latest"  # Example: "llama2" or your model name
@@ -57,13 +58,14 @@ def parse_nlp_command(nl_command: str) -> str:
 """
 
     try:
-        result = subprocess.run(
-            ["ollama", "run", MODEL_NAME, prompt],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",  # Fixes Windows Unicode errors
-            errors="ignore"    # Skip any undecodable characters
-        )
+        with NLP_LATENCY.time():
+            result = subprocess.run(
+                ["ollama", "run", MODEL_NAME, prompt],
+                capture_output=True,
+                text=True,
+                encoding="utf-8",  # Fixes Windows Unicode errors
+                errors="ignore"    # Skip any undecodable characters
+            )
 
         # Clean the output: remove backticks, quotes, extra spaces, newlines
         command = result.stdout.strip().strip("`").strip('"').strip("'")
@@ -1,30 +1,88 @@
+import os
+import json
+import time
 import psutil
+from pyterminal import safe_print
+from records import Records
 
 
-def list_processes():
-    from pyterminal import safe_print
+def format_process(row):
+    return f"{row['pid']:>6} {row['name'][:25]:25} {row['cpu']:6.1f} {row['mem']:6.1f}"
+
+
+def _sample_rows():
+    rows = []
+    for p in psutil.process_iter(["pid","name","cpu_percent","memory_percent"]):
+        info = p.info
+        rows.append({
+            "pid": info["pid"],
+            "name": info["name"] or "",
+            "cpu": info["cpu_percent"] or 0.0,
+            "mem": info["memory_percent"] or 0.0,
+        })
+    return rows
+
+
+# ------------------------------
+# Shared process snapshot (multi-worker mode)
+# ------------------------------
+def write_process_snapshot(path):
     """
-    Display processes similar to top in a clean table.
+    Sample the process table once and publish it atomically to `path`.
+    psutil keeps Process objects between process_iter calls, so cpu% is
+    measured since the previous sample without the 0.1s priming sleep.
+    """
+    import tempfile
+    rows = _sample_rows()
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with open(fd, "w", encoding="utf-8") as f:
+            json.dump(rows, f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def read_process_snapshot(path, max_age=5.0):
+    """Rows from a fresh snapshot, or None when missing or stale."""
+    try:
+        if time.time() - os.path.getmtime(path) > max_age:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def process_records(args=None):
+    """
+    Processes as records with pid, name, cpu and mem (percent), for
+    pipelines like `ps-list | where mem>1 | sort -by mem -r`.
     """
     header = f"{'PID':>6} {'NAME':25} {'CPU%':>6} {'MEM%':>6}"
-    lines = [header]
+    columns = ["pid", "name", "cpu", "mem"]
+
+    snapshot = os.environ.get("PYTERMINAL_PROCESS_SNAPSHOT")
+    rows = read_process_snapshot(snapshot) if snapshot else None
+    if rows is not None:
+        return Records(rows, columns, header=header, formatter=format_process)
 
     # first call to cpu_percent to initialize
     for p in psutil.process_iter(["pid", "name"]):
         p.cpu_percent(interval=None)
 
     # small sleep to get actual CPU%
-    import time
     time.sleep(0.1)
 
-    for p in psutil.process_iter(["pid","name","cpu_percent","memory_percent"]):
-        info = p.info
-        lines.append(
-            f"{info['pid']:>6} {info['name'][:25]:25} "
-            f"{info['cpu_percent']:6.1f} {info['memory_percent']:6.1f}"
-        )
+    return Records(_sample_rows(), columns, header=header, formatter=format_process)
 
-    safe_print("\n".join(lines))
+
+def list_processes(args=None):
+    """
+    Display processes similar to top in a clean table.
+    """
+    safe_print("\n".join(process_records(args).render()))
 def case_insensitive_match(sub, string):
     """
     Return True if sub is found in string, ignoring case.
@@ -53,7 +111,6 @@ def kill_process(pid: int):
     """
     Kill a process by PID
     """
-    from pyterminal import safe_print
     try:
         p = psutil.Process(pid)
         p.terminate()
@@ -61,10 +118,11 @@ def kill_process(pid: int):
         safe_print(f"Process {pid} terminated.")
     except Exception as e:
         safe_print(f"kill: {e}")
+        return False
 
-def filter_process(name_substr: str):
-    from pyterminal import safe_print
-    import psutil
+def filter_process(name_substr):
+    if isinstance(name_substr, list):  # called from COMMANDS with an args list
+        name_substr = " ".join(name_substr)
 
     header = f"{'PID':>6} {'NAME':25}"
     lines = [header]
@@ -0,0 +1,205 @@
+# profiler.py
+
+import os
+import sys
+import time
+import shlex
+import pstats
+import hmac
+import cProfile
+import tempfile
+import threading
+import tracemalloc
+from pyterminal import captured_stdout, safe_print
+
+PROFILE_TOP = 15
+PROFILE_DIR = os.environ.get("PYTERMINAL_PROFILE_DIR", tempfile.gettempdir())
+
+# tracemalloc (and the profiler hook) are process-wide: one profile at a time
+_profile_lock = threading.Lock()
+
+
+# ------------------------------
+# profile <command line>
+# ------------------------------
+def _short_path(filename):
+    for root in sorted(sys.path + [os.getcwd()], key=len, reverse=True):
+        if root and filename.startswith(root + os.sep):
+            return filename[len(root) + 1:]
+    return filename
+
+
+def _format_func(func):
+    filename, line, name = func
+    if filename == "~":  # built-in
+        return name
+    return f"{_short_path(filename)}:{line}({name})"
+
+
+def profile_line(line, top=PROFILE_TOP):
+    """
+    Run one terminal command under cProfile and tracemalloc.
+    Returns the command output followed by the top functions by cumulative
+    time and the top allocation sites.
+    """
+    line = line.strip()
+    if not line:
+        return "profile: missing command"
+    if not _profile_lock.acquire(blocking=False):
+        return "profile: already running in another session"
+    try:
+        return _profile_locked(line, top)
+    finally:
+        _profile_lock.release()
+
+
+def _profile_locked(line, top):
+    from main import handle_command
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        # pipelines print instead of returning, so capture both
+        with captured_stdout() as printed:
+            profiler.enable()
+            try:
+                output = handle_command(line)
+            finally:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    out = []
+    if printed.getvalue():
+        out.append(printed.getvalue().rstrip("\n"))
+    if output:
+        out.append(output.rstrip("\n"))
+    out.append(f"--- profile: {elapsed * 1000:.2f} ms wall, peak {peak / 1024:.1f} KiB traced ---")
+
+    stats = pstats.Stats(profiler).stats  # func -> (cc, ncalls, tottime, cumtime, callers)
+    rows = sorted(stats.items(), key=lambda kv: kv[1][3], reverse=True)[:top]
+    out.append("Top functions by cumulative time:")
+    out.append(f"{'ncalls':>9} {'tottime':>9} {'cumtime':>9}  function")
+    for func, (cc, nc, tt, ct, _) in rows:
+        calls = str(nc) if cc == nc else f"{nc}/{cc}"
+        out.append(f"{calls:>9} {tt:9.4f} {ct:9.4f}  {_format_func(func)}")
+
+    here = os.path.abspath(__file__)
+    sites = snapshot.filter_traces([tracemalloc.Filter(False, here),
+                                    tracemalloc.Filter(False, tracemalloc.__file__)])
+    out.append("Top allocation sites:")
+    out.append(f"{'size':>11} {'count':>7}  location")
+    for stat in sites.statistics("lineno")[:top]:
+        frame = stat.traceback[0]
+        out.append(f"{stat.size / 1024:9.1f}KiB {stat.count:>7}  "
+                   f"{_short_path(frame.filename)}:{frame.lineno}")
+    return "\n".join(out)
+
+
+def run_profile(text):
+    """
+    Usage: profile [-n N] <command line>
+    """
+    top = PROFILE_TOP
+    parts = text.split(maxsplit=2)
+    if len(parts) >= 2 and parts[0] == "-n":
+        try:
+            top = int(parts[1])
+        except ValueError:
+            return "profile: -n expects a number"
+        text = parts[2] if len(parts) > 2 else ""
+    return profile_line(text, top)
+
+
+def cmd_profile(args):
+    safe_print(run_profile(shlex.join(args)))
+
+
+# ------------------------------
+# Whole-server sampling profiler
+# ------------------------------
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread with sys._current_frames() at a fixed
+    interval and writes them in collapsed-stack format ("a;b;c count" per
+    line), which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.path = None
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds, interval=0.005, path=None):
+        with self._lock:
+            if self.running():
+                raise RuntimeError(f"sampling profiler already running, writing {self.path}")
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            self.path = path or os.path.join(PROFILE_DIR, f"pyterminal-{stamp}.collapsed")
+            self._thread = threading.Thread(target=self._run, args=(seconds, interval, self.path),
+                                            name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return self.path
+
+    def _run(self, seconds, interval, path):
+        me = threading.get_ident()
+        names = {}
+        counts = {}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(ident, str(ident)))
+                key = ";".join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            time.sleep(interval)
+
+        with open(path, "w", encoding="utf-8") as f:
+            for key, n in sorted(counts.items()):
+                f.write(f"{key} {n}\n")
+
+
+SAMPLER = SamplingProfiler()
+
+
+def install_admin_routes(app):
+    """
+    Add POST /debug/profile?seconds=N to a Flask app. Disabled unless
+    PYTERMINAL_ADMIN_TOKEN is set; requests must send it as X-Admin-Token.
+    """
+    from flask import request, jsonify
+
+    token = os.environ.get("PYTERMINAL_ADMIN_TOKEN")
+    if not token:
+        return
+
+    @app.route("/debug/profile", methods=["POST"])
+    def debug_profile():
+        if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), token.encode()):
+            return jsonify(error="forbidden"), 403
+        try:
+            seconds = min(float(request.args.get("seconds", 30)), 600)
+            interval = max(float(request.args.get("interval", 0.005)), 0.001)
+            path = SAMPLER.start(seconds, interval)
+        except (ValueError, RuntimeError) as e:
+            return jsonify(error=str(e)), 409
+        return jsonify(path=path, seconds=seconds, interval=interval)
@@ -11,17 +11,11 @@ Requires: psutil, prompt_toolkit
 
 import os
 import sys
-import shlex
-import shutil
-import subprocess
-from pathlib import Path
+import contextvars
+from io import StringIO
+from contextlib import contextmanager
 from datetime import datetime
-from prompt_toolkit.history import FileHistory
-from shell_features import cmd_shell
-from advanced_ls import cmd_ls_l
-from process_mgmt import list_processes, kill_process, filter_process
-from texteditor import cmd_edit,cmd_write  # your interactive editor
-from nlp_handler import parse_nlp_command  # for NLP fallback if needed
+from registry import CommandRegistry, RECORDS_GROUP
 
 # pyterminal.py
 # from nlp_handler import parse_nlp_command
@@ -35,19 +29,29 @@ WINDOWS_CMD_MAP = {
     "copy": "cp",
 }
 
-# Optional: psutil for system info
-try:
-    import psutil
-except ImportError:
-    psutil = None
+# Optional: psutil for system info (imported on first use, it is slow to load)
+_psutil = False
 
-# Prompt toolkit for input with tab completion
-try:
-    from prompt_toolkit import prompt
-    from prompt_toolkit.completion import WordCompleter
-except ImportError:
-    print("prompt_toolkit is required: pip install prompt_toolkit")
-    sys.exit(1)
+def get_psutil():
+    global _psutil
+    if _psutil is False:
+        try:
+            import psutil
+        except ImportError:
+            psutil = None
+        _psutil = psutil
+    return _psutil
+
+# Prompt toolkit for input with tab completion (only the local CLI needs it)
+def require_prompt_toolkit():
+    try:
+        from prompt_toolkit import prompt
+        from prompt_toolkit.completion import WordCompleter
+        from prompt_toolkit.history import FileHistory
+    except ImportError:
+        print("prompt_toolkit is required: pip install prompt_toolkit")
+        sys.exit(1)
+    return prompt, WordCompleter, FileHistory
 
 # --- History file for persistent timestamped commands ---
 HISTORY_FILE = os.path.join(os.path.expanduser("~"), ".pyterminal_history")
@@ -59,43 +63,120 @@ def safe_print(s=""):
     except BrokenPipeError:
         sys.exit(0)
 
+# --- Capturing what commands print, per thread ---
+# Commands run concurrently in worker threads, so captures can't swap
+# sys.stdout for everybody: a router sends each write to the buffer of the
+# capture active in the current context, or to the real stdout.
+_capture = contextvars.ContextVar("pyterminal_capture", default=None)
+
+class _StdoutRouter:
+    def __init__(self, stream):
+        self._stream = stream
+
+    def _target(self):
+        return _capture.get() or self._stream
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+@contextmanager
+def captured_stdout():
+    """Collect what the current thread prints into the StringIO it yields."""
+    if not isinstance(sys.stdout, _StdoutRouter):
+        sys.stdout = _StdoutRouter(sys.stdout)
+    buf = StringIO()
+    token = _capture.set(buf)
+    try:
+        yield buf
+    finally:
+        _capture.reset(token)
+
+# --- Working directory, per context ---
+# The terminal uses the process cwd. A batch from the HTTP API runs in a
+# WorkingDirectory of its own instead, so it never chdirs the server under
+# the WebSocket sessions; cd inside the batch only moves that object.
+_workdir = contextvars.ContextVar("pyterminal_workdir", default=None)
+
+class WorkingDirectory:
+    def __init__(self, path):
+        self.path = path
+
+@contextmanager
+def working_directory(workdir):
+    """Run the block with `workdir` (a WorkingDirectory) as the cwd of this context."""
+    token = _workdir.set(workdir)
+    try:
+        yield workdir
+    finally:
+        _workdir.reset(token)
+
+def getcwd():
+    workdir = _workdir.get()
+    return workdir.path if workdir is not None else os.getcwd()
+
+def chdir(path):
+    workdir = _workdir.get()
+    if workdir is None:
+        os.chdir(path)
+    elif not os.path.isdir(path):
+        raise NotADirectoryError(f"Not a directory: '{path}'") if os.path.exists(path) \
+            else FileNotFoundError(f"No such file or directory: '{path}'")
+    else:
+        workdir.path = path
+
 def abspath(path):
-    return os.path.abspath(os.path.expanduser(path))
+    return os.path.abspath(os.path.join(getcwd(), os.path.expanduser(path)))
 
 # --- Commands ---
+# A command prints its output and errors; it returns False when it failed,
+# which sets the exit status for && / || and the API.
 def cmd_pwd(args):
-    safe_print(os.getcwd())
+    safe_print(getcwd())
 
 def cmd_cd(args):
     target = args[0] if args else os.path.expanduser("~")
     try:
-        os.chdir(abspath(target))
+        chdir(abspath(target))
     except Exception as e:
         safe_print(f"cd: {e}")
+        return False
 
 def cmd_ls(args):
+    from archivefs import listdir  # sees mounted archives
     path = args[0] if args else "."
     try:
-        entries = sorted(os.listdir(abspath(path)))
+        entries = sorted(listdir(abspath(path)))
         for e in entries:
             safe_print(e)
     except Exception as e:
         safe_print(f"ls: {e}")
+        return False
 
 def cmd_mkdir(args):
     if not args:
         safe_print("mkdir: missing operand")
-        return
+        return False
+    ok = True
     for p in args:
         try:
             os.makedirs(abspath(p), exist_ok=False)
         except Exception as e:
             safe_print(f"mkdir: {e}")
+            ok = False
+    return ok
 
 def cmd_rm(args):
+    import shutil
     if not args:
         safe_print("rm: missing operand")
-        return
+        return False
+    ok = True
     for p in args:
         p_abs = abspath(p)
         try:
@@ -105,21 +186,27 @@ def cmd_rm(args):
                 os.remove(p_abs)
         except Exception as e:
             safe_print(f"rm: {e}")
+            ok = False
+    return ok
 
 def cmd_rmdir(args):
     if not args:
         safe_print("rmdir: missing operand")
-        return
+        return False
+    ok = True
     for p in args:
         try:
             os.rmdir(abspath(p))
         except Exception as e:
             safe_print(f"rmdir: {e}")
+            ok = False
+    return ok
 
 def cmd_touch(args):
     if not args:
         safe_print("touch: missing file operand")
-        return
+        return False
+    ok = True
     for p in args:
         p_abs = abspath(p)
         try:
@@ -127,46 +214,55 @@ def cmd_touch(args):
                 os.utime(p_abs, None)
         except Exception as e:
             safe_print(f"touch: {e}")
+            ok = False
+    return ok
 
 def cmd_cat(args):
+    from compressed import open_text
     if not args:
         safe_print("cat: missing file operand")
-        return
+        return False
+    ok = True
     for p in args:
         p_abs = abspath(p)
         try:
-            with open(p_abs, "r", encoding="utf-8", errors="replace") as f:
+            with open_text(p_abs, errors="replace") as f:  # decompresses .gz/.bz2/.xz/.zst
                 for line in f:
                     safe_print(line.rstrip("\n"))
         except Exception as e:
             safe_print(f"cat: {e}")
+            ok = False
+    return ok
 
 def cmd_mv(args):
+    import shutil
     if len(args) < 2:
         safe_print("mv: missing file operand")
-        return
+        return False
     srcs = args[:-1]
     dest = abspath(args[-1])
     try:
         if len(srcs) > 1 and not os.path.isdir(dest):
             safe_print("mv: target is not a directory")
-            return
+            return False
         for s in srcs:
             s_abs = abspath(s)
             shutil.move(s_abs, dest)
     except Exception as e:
         safe_print(f"mv: {e}")
+        return False
 
 def cmd_cp(args):
+    import shutil
     if len(args) < 2:
         safe_print("cp: missing file operand")
-        return
+        return False
     srcs = args[:-1]
     dest = abspath(args[-1])
     try:
         if len(srcs) > 1 and not os.path.isdir(dest):
             safe_print("cp: target is not a directory")
-            return
+            return False
         for s in srcs:
             s_abs = abspath(s)
             if os.path.isdir(s_abs):
@@ -175,21 +271,24 @@ def cmd_cp(args):
                 shutil.copy2(s_abs, dest)
     except Exception as e:
         safe_print(f"cp: {e}")
+        return False
 
 def cmd_echo(args):
     safe_print(" ".join(args))
 
 
 def cmd_ps(args):
+    psutil = get_psutil()
     if psutil is None:
         safe_print("ps: psutil not installed. Install with: pip install psutil")
-        return
+        return False
     try:
         for p in psutil.process_iter(["pid", "name", "username", "cpu_percent", "memory_percent"]):
             info = p.info
             safe_print(f"{info.get('pid'):>6} {info.get('name')[:25]:25} {info.get('username')[:12] if info.get('username') else '':12} CPU:{info.get('cpu_percent'):5.1f}% MEM:{info.get('memory_percent'):5.1f}%")
     except Exception as e:
         safe_print(f"ps: {e}")
+        return False
 
 def human_size(n):
     for unit in ["B","KB","MB","GB","TB"]:
@@ -199,6 +298,7 @@ def human_size(n):
     return f"{n:.1f}PB"
 
 def cmd_sysinfo():
+    psutil = get_psutil()
     if psutil is None:
         safe_print("sysinfo: psutil not installed. Install with: pip install psutil")
         return
@@ -237,29 +337,43 @@ def cmd_help(args):
   rmdir <dir>       - remove an empty directory
   touch <file>      - create/update file timestamp
   cat <file>        - print file contents
+  glob [--max-depth N] <pattern> - list matches of *, ?, [...], ** and {a,b}
+  tail [-n N] <file> - print the last lines of a file
+  follow <file>     - stream new lines of a growing file (also tail -f), Ctrl+C stops
   mv <src> <dst>    - rename
   cp <src> <dst>    - copy
   echo ...          - print args
   write [-a] <file> - write content to file, -a to append
   edit <file>       - interactive file editor (add/remove/modify lines)
+  mount <archive> <dir> - browse a tar/zip read-only (umount <dir>; no args lists)
+  grep [-i] [-v] [-n] <regex> [files] - print matching lines
+  upload / download - chunked, resumable file transfer (python transfer.py ...)
   ps                - list processes (requires psutil)
   ps-list           - list processes (advanced features)
   ps-kill <pid>     - kill a process by PID
   ps-filter <args>  - filter processes by name/CPU/memory
   sysinfo           - cpu/memory summary (requires psutil)
   shell <command>   - run complex shell commands with pipes, redirects, globbing
+  ... | sort -by <col> [-r]  - sort records from ls-l / ps-list by a field
+  ... | where <col><op><val> - filter records, e.g. ps-list | where mem>1
+  ... | select <col,...>     - keep only some record fields
   history           - show command history with timestamps
+  cache [on|off|stats|clear] - memoize read-only commands (ls, ls-l, cat, ...)
+  profile <command> - run a command under cProfile/tracemalloc and show hot spots
   help              - show this help
   exit / quit       - exit terminal
 """)
 
 
 # --- Command registry ---
-COMMANDS = {
+# Commands living in other modules are declared as "module:function" and only
+# imported the first time they run. Plugins come from the "pyterminal.commands"
+# entry point group (see registry.py).
+COMMANDS = CommandRegistry({
     "pwd": cmd_pwd,
     "cd": cmd_cd,
     "ls": cmd_ls,
-    "ls-l": cmd_ls_l,
+    "ls-l": "advanced_ls:cmd_ls_l",
     "mkdir": cmd_mkdir,
     "rm": cmd_rm,
     "rmdir": cmd_rmdir,
@@ -268,21 +382,39 @@ COMMANDS = {
     "mv": cmd_mv,
     "cp": cmd_cp,
     "echo": cmd_echo,
-    "write": cmd_write,
-    "edit": cmd_edit,
+    "write": "texteditor:cmd_write",
+    "edit": "texteditor:cmd_edit",
     "ps": cmd_ps,
-    "ps-list": list_processes,
-    "ps-kill": kill_process,
-    "ps-filter": filter_process,
+    "ps-list": "process_mgmt:list_processes",
+    "ps-kill": "process_mgmt:kill_process",
+    "ps-filter": "process_mgmt:filter_process",
     "sysinfo": cmd_sysinfo,
     "history": cmd_history,
-    "shell": cmd_shell,
+    "shell": "shell_features:cmd_shell",
     "help": cmd_help,
-}
+    "profile": "profiler:cmd_profile",
+    "tail": "follow:cmd_tail",
+    "follow": "follow:cmd_follow",
+    "cache": "resultcache:cmd_cache",
+    "glob": "globber:cmd_glob",
+    "mount": "archivefs:cmd_mount",
+    "umount": "archivefs:cmd_umount",
+    "grep": "shell_features:cmd_grep",
+    "upload": "transfer:cmd_transfer_help",
+    "download": "transfer:cmd_transfer_help",
+}, read_only={"ls", "ls-l", "pwd", "cat", "grep", "tail", "history", "help"})
+
+# Commands that can hand typed records to the next pipeline stage instead of
+# text, e.g. `ls-l | sort -by size` or `ps-list | where mem>1 | select name,pid`
+RECORD_COMMANDS = CommandRegistry({
+    "ls-l": "advanced_ls:ls_l_records",
+    "ps-list": "process_mgmt:process_records",
+}, group=RECORDS_GROUP)
 
 
 
 # # --- Tab completion using prompt_toolkit ---
+# prompt, WordCompleter, FileHistory = require_prompt_toolkit()
 # def get_completer():
 #     try:
 #         files = os.listdir(os.getcwd())
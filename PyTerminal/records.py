@@ -0,0 +1,130 @@
+# records.py
+
+import re
+
+# ------------------------------
+# Typed records passed between pipeline stages
+# ------------------------------
+class Records(list):
+    """
+    A list of row dicts flowing through a pipeline without being formatted.
+    `formatter(row)` renders one row the way the producing command prints it;
+    once a stage changes the columns (select), rows are rendered as a plain
+    aligned table instead. `display` maps a column to a value formatter.
+    """
+
+    def __init__(self, rows=(), columns=(), header=None, formatter=None, display=None):
+        super().__init__(rows)
+        self.columns = list(columns)
+        self.header = header
+        self.formatter = formatter
+        self.display = display or {}
+
+    def derive(self, rows, columns=None):
+        """Same kind of records with new rows (and optionally new columns)."""
+        if columns is None or columns == self.columns:
+            return Records(rows, self.columns, self.header, self.formatter, self.display)
+        return Records(rows, columns, display=self.display)
+
+    def cell(self, column, value):
+        if value is None:
+            return ""
+        fmt = self.display.get(column)
+        return fmt(value) if fmt else str(value)
+
+    def render(self):
+        if self.formatter:
+            lines = [self.header] if self.header else []
+            lines.extend(self.formatter(row) for row in self)
+            return lines
+        cells = [[self.cell(c, row.get(c)) for c in self.columns] for row in self]
+        widths = [max([len(c)] + [len(r[i]) for r in cells]) for i, c in enumerate(self.columns)]
+        lines = [" ".join(c.upper().ljust(w) for c, w in zip(self.columns, widths)).rstrip()]
+        for r in cells:
+            lines.append(" ".join(v.ljust(w) for v, w in zip(r, widths)).rstrip())
+        return lines
+
+
+def as_lines(data):
+    """Render pipeline data (None, list of lines or Records) as text lines."""
+    if data is None:
+        return []
+    if isinstance(data, Records):
+        return data.render()
+    return data
+
+
+# ------------------------------
+# Helpers for record stages (sort -by, where, select)
+# ------------------------------
+_CONDITION = re.compile(r"^(\w+)(>=|<=|!=|==|=|>|<|~)(.*)$")
+_SIZE_SUFFIX = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_number(text):
+    """'12', '1.5', '10K', '2M' -> float; raises ValueError."""
+    text = text.strip()
+    mult = _SIZE_SUFFIX.get(text[-1:].upper())
+    if mult:
+        return float(text[:-1]) * mult
+    return float(text)
+
+
+def parse_columns(args):
+    """['name,pid', 'cpu'] -> ['name', 'pid', 'cpu']"""
+    return [c for a in args for c in a.split(",") if c]
+
+
+def parse_condition(text, rows=()):
+    """
+    'mem>1' -> (field, predicate(row)). Operators: = == != > >= < <= ~
+    (substring). Numeric fields compare as numbers (with K/M/G suffixes),
+    others as text. The operand is converted here, once; if `rows` show the
+    field is numeric, an operand that isn't a number raises ValueError.
+    """
+    m = _CONDITION.match(text)
+    if not m:
+        raise ValueError(f"bad condition '{text}' (expected field<op>value)")
+    field, op, raw = m.groups()
+    try:
+        number = parse_number(raw)
+    except ValueError:
+        number = None
+    if number is None and op != "~":
+        sample = next((r[field] for r in rows if r.get(field) is not None), None)
+        if isinstance(sample, (int, float)):
+            raise ValueError(f"'{raw}' is not a number ({field} is numeric)")
+
+    def predicate(row):
+        value = row.get(field)
+        if value is None:
+            return False
+        if op == "~":
+            return raw.lower() in str(value).lower()
+        if isinstance(value, (int, float)):
+            if number is None:
+                return op == "!="
+            other = number
+        else:
+            value, other = str(value), raw
+        if op in ("=", "=="):
+            return value == other
+        if op == "!=":
+            return value != other
+        if op == ">":
+            return value > other
+        if op == ">=":
+            return value >= other
+        if op == "<":
+            return value < other
+        return value <= other
+
+    return field, predicate
+
+
+def sort_key(columns):
+    """Key function sorting rows by `columns`, with missing values last."""
+    def key(row):
+        return tuple((row.get(c) is None, row.get(c) if row.get(c) is not None else 0)
+                     for c in columns)
+    return key
@@ -0,0 +1,89 @@
+# registry.py
+
+import importlib
+from collections.abc import Mapping
+
+# Entry point group third-party packages use to add commands, e.g. in pyproject.toml:
+#   [project.entry-points."pyterminal.commands"]
+#   hello = "my_pkg.cmds:cmd_hello"
+PLUGIN_GROUP = "pyterminal.commands"
+# Commands that can also emit typed records into a pipeline (see records.py)
+RECORDS_GROUP = "pyterminal.records"
+
+
+# ------------------------------
+# Lazy command registry
+# ------------------------------
+class CommandRegistry(Mapping):
+    """
+    Mapping of command name -> callable where each command may be declared
+    as a "module:function" string. The module is only imported the first
+    time the command is looked up, so importing the registry stays cheap.
+    Plugins from the `group` entry point group are discovered on the first
+    lookup that misses the built-in table. Commands listed in `read_only`
+    only look at the filesystem and may have their output cached.
+    """
+
+    def __init__(self, commands=None, group=PLUGIN_GROUP, read_only=()):
+        self.group = group
+        self.read_only = set(read_only)
+        self._targets = {}   # name -> callable, "module:attr" string or EntryPoint
+        self._loaded = {}    # name -> resolved callable
+        self._plugins_scanned = False
+        for name, target in (commands or {}).items():
+            self.register(name, target)
+
+    def register(self, name, target):
+        self._targets[name] = target
+        self._loaded.pop(name, None)
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def is_read_only(self, name):
+        return name in self.read_only
+
+    def _resolve(self, target):
+        if callable(target):
+            return target
+        if isinstance(target, str):
+            module_name, _, attr = target.partition(":")
+            return getattr(importlib.import_module(module_name), attr)
+        return target.load()  # importlib.metadata.EntryPoint
+
+    def load_plugins(self):
+        """Discover entry point plugins once; built-in names always win."""
+        if self._plugins_scanned:
+            return
+        self._plugins_scanned = True
+        try:
+            from importlib.metadata import entry_points
+            eps = entry_points(group=self.group)
+        except Exception:
+            return
+        for ep in eps:
+            self._targets.setdefault(ep.name, ep)
+
+    def __getitem__(self, name):
+        func = self._loaded.get(name)
+        if func is not None:
+            return func
+        if name not in self._targets:
+            self.load_plugins()
+        func = self._resolve(self._targets[name])
+        self._loaded[name] = func
+        return func
+
+    def __contains__(self, name):
+        if name in self._targets:
+            return True
+        self.load_plugins()
+        return name in self._targets
+
+    def __iter__(self):
+        self.load_plugins()
+        return iter(self._targets)
+
+    def __len__(self):
+        self.load_plugins()
+        return len(self._targets)
@@ -0,0 +1,181 @@
+# resultcache.py
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from pyterminal import safe_print, abspath, getcwd, HISTORY_FILE
+
+# Opt-in: PYTERMINAL_RESULT_CACHE=1 or the `cache on` command
+ENABLED = os.environ.get("PYTERMINAL_RESULT_CACHE", "") not in ("", "0")
+MAX_BYTES = int(os.environ.get("PYTERMINAL_CACHE_BYTES", 32 * 1024 * 1024))
+# Files modified this recently may still change within the same mtime tick
+# without changing size, so results depending on them are not stored
+RACY_SECONDS = 2.0
+
+
+# ------------------------------
+# What a read-only command touched
+# ------------------------------
+def _paths(args, default=None):
+    paths = [a for a in args if not a.startswith("-")]
+    return paths or ([default] if default else [])
+
+
+def _deps_ls_l(args):
+    paths = _paths(args, ".")
+    path = abspath(paths[0])
+    deps = [path]
+    if os.path.isdir(path):  # sizes and mtimes of every entry are shown
+        try:
+            deps.extend(os.path.join(path, e) for e in os.listdir(path))
+        except OSError:
+            pass
+    return deps
+
+
+DEPENDENCIES = {
+    "ls": lambda args: _paths(args, "."),
+    "ls-l": _deps_ls_l,
+    "pwd": lambda args: [],
+    "help": lambda args: [],
+    "history": lambda args: [HISTORY_FILE],
+}
+
+
+def dependencies(cmd_name, args):
+    """Absolute paths whose state decides the output of a read-only command."""
+    deps = DEPENDENCIES.get(cmd_name, _paths)(args)
+    return [abspath(p) for p in deps]
+
+
+def signature(path):
+    from archivefs import MOUNTS, signature as mounted_signature
+    if MOUNTS:
+        sig = mounted_signature(path)
+        if sig is not None:
+            return sig
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+# ------------------------------
+# Byte-bounded LRU cache
+# ------------------------------
+class ResultCache:
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (output, [(path, signature)], size)
+        self.size = 0
+        self.hits = self.misses = self.stale = self.evictions = self.skipped = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(cmd_name, args, cwd):
+        return (cmd_name, tuple(args), os.path.realpath(cwd))
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+        output, deps, _ = entry
+        if any(signature(path) != sig for path, sig in deps):
+            with self._lock:
+                self._drop(key)
+                self.stale += 1
+                self.misses += 1
+            return None
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.hits += 1
+        return output
+
+    def put(self, key, output, paths, started):
+        # signatures taken after running, rejected if anything changed meanwhile
+        deps = [(p, signature(p)) for p in paths]
+        racy = started - RACY_SECONDS
+        if any(sig and sig[2] / 1e9 >= racy for _, sig in deps):
+            with self._lock:
+                self.skipped += 1
+            return
+        size = len(output) + sum(len(p) + 48 for p in paths) + 200
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self.entries[key] = (output, deps, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                old, _ = next(iter(self.entries.items()))
+                self._drop(old)
+                self.evictions += 1
+
+    def _drop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        rate = 100.0 * self.hits / lookups if lookups else 0.0
+        return (f"Result cache: {'on' if ENABLED else 'off'}\n"
+                f"  entries:   {len(self.entries)}\n"
+                f"  bytes:     {self.size} / {self.max_bytes}\n"
+                f"  hits:      {self.hits} ({rate:.1f}%)\n"
+                f"  misses:    {self.misses} (stale: {self.stale})\n"
+                f"  evictions: {self.evictions}\n"
+                f"  not stored (recently modified): {self.skipped}")
+
+
+CACHE = ResultCache()
+
+
+def run_cached(cmd_name, args, run):
+    """
+    Return (output, ok) of a read-only command, from the cache when every
+    file it touched still has the same inode, size and mtime. `run()`
+    produces (output, ok) on a miss; failures are not stored.
+    """
+    if not ENABLED:
+        return run()
+    key = CACHE.key(cmd_name, args, getcwd())
+    output = CACHE.get(key)
+    if output is not None:
+        return output, True
+    started = time.time()
+    paths = dependencies(cmd_name, args)
+    output, ok = run()
+    if ok:
+        CACHE.put(key, output, paths, started)
+    return output, ok
+
+
+def cmd_cache(args):
+    """cache [on|off|stats|clear]"""
+    global ENABLED
+    action = args[0] if args else "stats"
+    if action == "on":
+        ENABLED = True
+        safe_print("Result cache enabled for read-only commands.")
+    elif action == "off":
+        ENABLED = False
+        CACHE.clear()
+        safe_print("Result cache disabled.")
+    elif action == "clear":
+        CACHE.clear()
+        safe_print("Result cache cleared.")
+    elif action == "stats":
+        safe_print(CACHE.stats())
+    else:
+        safe_print("Usage: cache [on|off|stats|clear]")
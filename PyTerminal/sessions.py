@@ -0,0 +1,344 @@
+# sessions.py
+"""
+Terminal sessions that outlive their WebSocket connection.
+
+On connect the server sends "__SESSION__<token>". A client that reconnects
+sends "__RESUME__<token>" as its first message and gets back
+"__RESUMED__<new token>" followed by the session's scrollback; history,
+editor state and output of commands that finished while it was away are
+kept. Tokens are single use: every resume issues a new one.
+
+Commands a detached session still runs are killed after KILL_AFTER
+seconds, so a quick reconnect finds them running but an abandoned one
+does not keep burning CPU until the session expires.
+Detached sessions are spilled to disk after SPILL_AFTER seconds (their
+scrollback leaves memory) and freed after EVICT_AFTER seconds, or earlier
+when more than MAX_DETACHED are waiting. Sessions live in the worker
+process that created them and a reconnect may land on any worker, so with
+WORKERS > 1 resume is turned off (`resumable`): no token is sent and a
+session is freed as soon as its connection closes. All of this runs on
+the event loop.
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import asyncio
+import secrets
+import tempfile
+from collections import deque
+import metrics
+
+SCROLLBACK_BYTES = int(os.environ.get("PYTERMINAL_SCROLLBACK_BYTES", 256 * 1024))
+HISTORY_LIMIT = int(os.environ.get("PYTERMINAL_HISTORY_LIMIT", 1000))
+KILL_AFTER = float(os.environ.get("PYTERMINAL_KILL_GRACE", 10))
+SPILL_AFTER = float(os.environ.get("PYTERMINAL_SESSION_SPILL", 300))
+EVICT_AFTER = float(os.environ.get("PYTERMINAL_SESSION_TTL", 1800))
+MAX_DETACHED = int(os.environ.get("PYTERMINAL_MAX_DETACHED", 256))
+REAP_INTERVAL = 30
+
+SESSION_PREFIX = "__SESSION__"
+RESUME_PREFIX = "__RESUME__"
+RESUMED_PREFIX = "__RESUMED__"
+
+
+# ------------------------------
+# Scrollback ring buffer
+# ------------------------------
+def _size(text):
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+class Scrollback:
+    """Output sent to the client, bounded by bytes; the oldest messages fall off."""
+
+    def __init__(self, limit=SCROLLBACK_BYTES):
+        self.limit = limit
+        self.parts = deque()
+        self.size = 0
+        self.spilled = None  # temp file holding the parts while spilled
+
+    def append(self, text):
+        if self.spilled:
+            self.load()
+        n = _size(text)
+        if n > self.limit:
+            # keep the last `limit` bytes; "ignore" drops a character cut in half
+            text = text.encode("utf-8")[-self.limit:].decode("utf-8", "ignore")
+            n = _size(text)
+        self.parts.append((text, n))
+        self.size += n
+        while self.size > self.limit:
+            self.size -= self.parts.popleft()[1]
+
+    def text(self):
+        if self.spilled:
+            self.load()
+        return "".join(t for t, _ in self.parts)
+
+    @property
+    def resident(self):
+        return 0 if self.spilled else self.size
+
+    def spill(self):
+        if self.spilled or not self.parts:
+            return
+        fd, path = tempfile.mkstemp(prefix="pyterminal-scrollback-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump([t for t, _ in self.parts], f)
+        self.parts.clear()
+        self.spilled = path
+
+    def load(self):
+        path, self.spilled = self.spilled, None
+        try:
+            with open(path, encoding="utf-8") as f:
+                parts = json.load(f)
+        except (OSError, ValueError):
+            parts = []  # lost with the temp dir: start over
+        finally:
+            self.discard_file(path)
+        self.parts = deque((t, _size(t)) for t in parts)
+        self.size = sum(n for _, n in self.parts)
+
+    def discard(self):
+        if self.spilled:
+            self.discard_file(self.spilled)
+            self.spilled = None
+        self.parts.clear()
+        self.size = 0
+
+    @staticmethod
+    def discard_file(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# ------------------------------
+# Session
+# ------------------------------
+class Session:
+    def __init__(self):
+        # `id` keys editor sessions and process groups; `token` is what the
+        # client holds, replaced on every resume
+        self.id = f"s-{secrets.token_hex(8)}"
+        self.token = secrets.token_urlsafe(24)
+        self.history = deque(maxlen=HISTORY_LIMIT)
+        self.pointer = 0
+        self.scrollback = Scrollback()
+        self.connection = None
+        self.created = self.last_active = time.monotonic()
+        self.detached_at = None
+
+    @property
+    def attached(self):
+        return self.connection is not None
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def record(self, text):
+        self.scrollback.append(text)
+
+    # --- command history (Up/Down arrows) ---
+    def add_history(self, cmd):
+        self.history.append(cmd)
+        self.pointer = len(self.history)
+
+    def history_step(self, direction):
+        if not self.history:
+            return ""
+        if direction == "up":
+            self.pointer = max(0, self.pointer - 1)
+        else:  # down
+            self.pointer = min(len(self.history) - 1, self.pointer + 1)
+        return self.history[self.pointer]
+
+    def memory(self):
+        """Approximate bytes held in memory, by kind."""
+        from texteditor import editor_sessions
+        editor = 0
+        state = editor_sessions.get(self.id)
+        if state:
+            if state.get("type") == "edit":
+                editor = sum(sys.getsizeof(line) for line in state.get("lines", ()))
+            elif state.get("tmp") is not None:
+                from texteditor import WRITE_BUFFER
+                editor = WRITE_BUFFER
+        return {
+            "scrollback": self.scrollback.resident,
+            "history": sum(sys.getsizeof(c) for c in list(self.history)),
+            "editor": editor,
+        }
+
+    def describe(self, now=None):
+        now = now or time.monotonic()
+        memory = self.memory()
+        return {
+            "id": self.id,
+            "attached": self.attached,
+            "age_seconds": round(now - self.created, 1),
+            "idle_seconds": round(now - self.last_active, 1),
+            "detached_seconds": None if self.attached else round(now - self.detached_at, 1),
+            "spilled": bool(self.scrollback.spilled),
+            "scrollback_bytes": self.scrollback.size,
+            "history_entries": len(self.history),
+            "memory_bytes": sum(memory.values()),
+            "memory": memory,
+        }
+
+
+# ------------------------------
+# Session store
+# ------------------------------
+class SessionStore:
+    def __init__(self, resumable=True):
+        self.sessions = {}   # id -> Session
+        self._tokens = {}    # token -> Session
+        self.resumable = resumable
+
+    def create(self, connection):
+        session = Session()
+        self.sessions[session.id] = session
+        self._tokens[session.token] = session
+        self.attach(session, connection)
+        return session
+
+    def resume(self, token, connection):
+        """
+        Attach the session holding `token` to `connection` under a new token.
+        Returns (session, connection it was taken from or None), or
+        (None, None) for an unknown or expired token, or when resume is off.
+        """
+        if not self.resumable:
+            return None, None
+        session = self._tokens.pop(token, None)
+        if session is None:
+            return None, None
+        session.token = secrets.token_urlsafe(24)
+        self._tokens[session.token] = session
+        previous = self.attach(session, connection)
+        SESSIONS_RESUMED.inc()
+        return session, previous
+
+    def attach(self, session, connection):
+        previous, session.connection = session.connection, connection
+        session.detached_at = None
+        session.touch()
+        return previous  # a connection that still thinks it owns the session
+
+    def detach(self, session, connection):
+        # ignored if another connection has resumed the session meanwhile
+        if session.connection is connection:
+            session.connection = None
+            session.detached_at = time.monotonic()
+            if not self.resumable:
+                self.evict(session, "disconnected")
+                return
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return  # not serving: reap() still kills them
+            loop.call_later(KILL_AFTER, self._kill_detached, session, session.detached_at)
+
+    def _kill_detached(self, session, detached_at):
+        # unless it was resumed (or detached again) meanwhile
+        if session.detached_at == detached_at and session.id in self.sessions:
+            from execpolicy import kill_session
+            kill_session(session.id)
+
+    def evict(self, session, reason="idle"):
+        from execpolicy import kill_session
+        from texteditor import editor_sessions, discard_write
+        if self.sessions.pop(session.id, None) is None:
+            return
+        self._tokens.pop(session.token, None)
+        kill_session(session.id)
+        discard_write(session.id)
+        editor_sessions.pop(session.id, None)
+        session.scrollback.discard()
+        session.history.clear()
+        SESSIONS_EVICTED.inc(reason=reason)
+
+    def reap(self, now=None):
+        """Spill and free detached sessions that have been idle too long."""
+        now = now or time.monotonic()
+        detached = sorted((s for s in self.sessions.values() if not s.attached),
+                          key=lambda s: s.detached_at)
+        for session in detached:
+            if now - session.detached_at >= EVICT_AFTER:
+                self.evict(session, "idle")
+                continue
+            if now - session.detached_at >= KILL_AFTER:
+                self._kill_detached(session, session.detached_at)
+            if now - session.detached_at >= SPILL_AFTER:
+                session.scrollback.spill()
+        detached = [s for s in detached if s.id in self.sessions]
+        for session in detached[:max(0, len(detached) - MAX_DETACHED)]:
+            self.evict(session, "capacity")
+
+    async def reap_forever(self, interval=REAP_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            self.reap()
+
+    def close_all(self):
+        """Free every session, e.g. when the server stops."""
+        for session in list(self.sessions.values()):
+            self.evict(session, "shutdown")
+
+    def memory_bytes(self):
+        return sum(sum(s.memory().values()) for s in list(self.sessions.values()))
+
+    def describe(self):
+        now = time.monotonic()
+        return [s.describe(now) for s in list(self.sessions.values())]
+
+
+SESSIONS = SessionStore()
+
+metrics.register(metrics.Gauge(
+    "pyterminal_sessions_attached",
+    "Sessions with a connected client",
+    func=lambda: sum(1 for s in list(SESSIONS.sessions.values()) if s.attached)))
+metrics.register(metrics.Gauge(
+    "pyterminal_sessions_detached",
+    "Sessions waiting to be resumed",
+    func=lambda: sum(1 for s in list(SESSIONS.sessions.values()) if not s.attached)))
+metrics.register(metrics.Gauge(
+    "pyterminal_sessions_memory_bytes",
+    "Approximate memory held by sessions (scrollback, history, editor state)",
+    func=SESSIONS.memory_bytes))
+SESSIONS_RESUMED = metrics.register(metrics.Counter(
+    "pyterminal_sessions_resumed_total",
+    "Sessions resumed by a reconnecting client"))
+SESSIONS_EVICTED = metrics.register(metrics.Counter(
+    "pyterminal_sessions_evicted_total",
+    "Sessions freed, by reason (idle, capacity, exit, replaced, disconnected, shutdown)"))
+
+
+# ------------------------------
+# Admin route
+# ------------------------------
+def install_session_routes(app):
+    """
+    Add GET /debug/sessions (per-session memory and idle times) to a Flask
+    app. Like /debug/profile it needs PYTERMINAL_ADMIN_TOKEN as X-Admin-Token.
+    """
+    from flask import request, jsonify
+
+    token = os.environ.get("PYTERMINAL_ADMIN_TOKEN")
+    if not token:
+        return
+
+    @app.route("/debug/sessions", methods=["GET"])
+    def debug_sessions():
+        if not hmac.compare_digest(request.headers.get("X-Admin-Token", "").encode(), token.encode()):
+            return jsonify(error="forbidden"), 403
+        sessions = SESSIONS.describe()
+        return jsonify(sessions=sessions, memory_bytes=sum(s["memory_bytes"] for s in sessions),
+                       kill_after=KILL_AFTER, spill_after=SPILL_AFTER, evict_after=EVICT_AFTER)
@@ -1,177 +1,287 @@
 import shlex
-import glob
 import os
-import subprocess
-
-# --- Expand wildcards like * and ? ---
-def expand_globs(tokens):
-    expanded_tokens = []
-    for t in tokens:
-        if "*" in t or "?" in t:
-            matches = glob.glob(t)
-            if matches:
-                expanded_tokens.extend(matches)
-            else:
-                expanded_tokens.append(t)
-        else:
-            expanded_tokens.append(t)
-    return expanded_tokens
+import re
+import execpolicy
+from compressed import open_text
+from pyterminal import COMMANDS, RECORD_COMMANDS, abspath, captured_stdout, safe_print
+from globber import Walker, expand_globs
+from shellparse import ShellSyntaxError, plan_for
+from records import Records, as_lines, parse_columns, parse_condition, sort_key
 
 # --- Builtin commands ---
-def builtin_cat(args, input_lines=None):
-    from pyterminal import safe_print
-    lines = input_lines if input_lines else []
-    if not input_lines:
-        for filename in args:
-            try:
-                with open(filename, "r", encoding="utf-8") as f:
-                    lines.extend(f.read().splitlines())
-            except Exception as e:
-                safe_print(f"cat: {e}")
-    return lines
+# Piped input is either a list of text lines or Records (see records.py);
+# builtins pass records through untouched where they can. Errors go to
+# `err`: the terminal by default, stderr of the stage inside a pipeline,
+# where reporting one also makes the stage fail.
+class _ErrorLog:
+    """An err callback for builtins that remembers whether anything failed."""
+
+    def __init__(self, write):
+        self.write = write
+        self.failed = False
 
-def builtin_sort(args, input_lines=None):
-    from pyterminal import safe_print
+    def __call__(self, message):
+        self.failed = True
+        self.write(message)
+
+def _read_files(name, args, err):
     lines = []
+    for filename in args:
+        try:
+            with open_text(abspath(filename)) as f:  # .gz/.bz2/.xz/.zst decompressed on the fly
+                lines.extend(f.read().splitlines())
+        except Exception as e:
+            err(f"{name}: {e}")
+    return lines
+
+def builtin_cat(args, input_lines=None, err=safe_print):
+    if input_lines:
+        return input_lines
+    return _read_files("cat", args, err)
+
+def builtin_sort(args, input_lines=None, err=safe_print):
+    """
+    sort [-r] [files]          - sort text lines
+    sort -by col[,col] [-r]    - sort records by fields, e.g. ls-l | sort -by size
+    """
+    reverse = "-r" in args
+    args = [a for a in args if a != "-r"]
+    by = []
+    if "-by" in args:
+        i = args.index("-by")
+        by = parse_columns(args[i + 1:i + 2])
+        args = args[:i] + args[i + 2:]
+
+    if isinstance(input_lines, Records):
+        columns = by or input_lines.columns[:1]
+        return input_lines.derive(sorted(input_lines, key=sort_key(columns), reverse=reverse))
+    if by:
+        err("sort: -by needs records (e.g. ls-l | sort -by size)")
+        return input_lines or []
 
     if input_lines:
         lines = input_lines[:]   # use piped input
-    elif args:                  # otherwise read files
-        for filename in args:
-            try:
-                with open(filename, "r", encoding="utf-8") as f:
-                    lines.extend(f.read().splitlines())
-            except Exception as e:
-                safe_print(f"sort: {e}")
+    else:                        # otherwise read files
+        lines = _read_files("sort", args, err)
 
-    lines.sort()
+    lines.sort(reverse=reverse)
     return lines
 
-def builtin_uniq(args, input_lines=None):
-    from pyterminal import safe_print
+def builtin_uniq(args, input_lines=None, err=safe_print):
     lines = input_lines if input_lines else []
     if not lines and args:
-        for filename in args:
-            try:
-                with open(filename, "r", encoding="utf-8") as f:
-                    lines.extend(f.read().splitlines())
-            except Exception as e:
-                safe_print(f"uniq: {e}")
+        lines = _read_files("uniq", args, err)
     uniq_lines = []
     prev = None
     for line in lines:
         if line != prev:
             uniq_lines.append(line)
             prev = line
+    if isinstance(lines, Records):
+        return lines.derive(uniq_lines)
     return uniq_lines
 
+def builtin_where(args, input_lines=None, err=safe_print):
+    """where field<op>value [...]  - keep records matching every condition"""
+    if not isinstance(input_lines, Records):
+        err("where: needs records (e.g. ps-list | where mem>1)")
+        return []
+    try:
+        predicates = [parse_condition(a, input_lines)[1] for a in args]
+    except ValueError as e:
+        err(f"where: {e}")
+        return input_lines.derive([])
+    return input_lines.derive(r for r in input_lines if all(p(r) for p in predicates))
+
+def builtin_select(args, input_lines=None, err=safe_print):
+    """select col[,col...]  - keep only these record fields"""
+    if not isinstance(input_lines, Records):
+        err("select: needs records (e.g. ls-l | select name,size)")
+        return []
+    columns = parse_columns(args) or input_lines.columns
+    return input_lines.derive(({c: r.get(c) for c in columns} for r in input_lines), columns)
+
+def builtin_grep(args, input_lines=None, err=safe_print):
+    """grep [-i] [-v] [-n] <regex> [files]  - lines matching a regular expression"""
+    flags = [a for a in args if a in ("-i", "-v", "-n")]
+    args = [a for a in args if a not in flags]
+    if not args:
+        err("grep: missing pattern")
+        return []
+    try:
+        regex = re.compile(args[0], re.IGNORECASE if "-i" in flags else 0)
+    except re.error as e:
+        err(f"grep: bad pattern: {e}")
+        return []
+    invert, numbered = "-v" in flags, "-n" in flags
+    if isinstance(input_lines, Records):  # keep matching records as records
+        records = input_lines
+        line_of = records.formatter or (lambda r: " ".join(records.cell(c, r.get(c)) for c in records.columns))
+        return records.derive(r for r in records if bool(regex.search(line_of(r))) != invert)
+
+    def matches(lines, prefix=""):
+        return [f"{prefix}{n}:{line}" if numbered else prefix + line
+                for n, line in enumerate(lines, 1) if bool(regex.search(line)) != invert]
+
+    files = args[1:]
+    if input_lines or not files:
+        return matches(input_lines or [])
+    out = []
+    for filename in files:
+        try:
+            with open_text(abspath(filename), errors="replace") as f:  # also inside mounted archives
+                out.extend(matches(f.read().splitlines(), f"{filename}:" if len(files) > 1 else ""))
+        except Exception as e:
+            err(f"grep: {e}")
+    return out
+
+def cmd_grep(args):
+    err = _ErrorLog(safe_print)
+    for line in builtin_grep(args, err=err):
+        safe_print(line)
+    return not err.failed
+
 # Map built-in command names to functions
 BUILTINS = {
     "cat": builtin_cat,
     "sort": builtin_sort,
     "uniq": builtin_uniq,
+    "where": builtin_where,
+    "select": builtin_select,
+    "grep": builtin_grep,
 }
 
 # --- Pipeline runner (hybrid: builtins + subprocess) ---
-def run_pipeline(pipe_parts):
-    from pyterminal import COMMANDS
-    from pyterminal import safe_print
+def _read_input(redirect, err):
+    try:
+        with open_text(abspath(redirect.name), errors="replace") as f:
+            return f.read().splitlines()
+    except OSError as e:
+        err(f"{redirect.name}: {e.strerror or e}")
+        return None
 
+def _write_output(redirect, lines, err):
+    try:
+        with open(abspath(redirect.name), redirect.mode, encoding="utf-8") as f:
+            if lines:
+                f.write("\n".join(lines) + "\n")
+        return True
+    except OSError as e:
+        err(f"Redirection error: {e}")
+        return False
+
+def run_stages(commands, walker=None):
+    """
+    Run the Commands of one pipeline and return (data, ok): the final data
+    unrendered (a list of text lines, Records, or None when nothing was
+    produced) and whether the last stage succeeded. Redirect targets are
+    resolved against the cwd as each stage runs.
+    """
     prev_output = None
+    ok = True
+    walker = walker or Walker()  # one directory scan per pipeline, shared by its stages
 
-    for part in pipe_parts:
-        tokens = shlex.split(part)
-        tokens = expand_globs(tokens)
+    for command in commands:
+        tokens = command.argv(walker)
         if not tokens:
             continue
 
         cmd_name, cmd_args = tokens[0], tokens[1:]
+        ok = True
+        stderr_to = command.redirect(2)
+        errors = []
+        err = errors.append if stderr_to else safe_print
 
-        # 1️⃣ If it's one of your custom commands
-        if cmd_name in COMMANDS:
-            try:
-                func = COMMANDS[cmd_name]
-                output = func(cmd_args)   # run your Python terminal command
-                if isinstance(output, list):
-                    prev_output = "\n".join(output)
-                elif output is not None:
-                    prev_output = str(output)
-            except Exception as e:
-                safe_print(f"{cmd_name}: {e}")
+        stdin_from = command.redirect(0)
+        if stdin_from:
+            prev_output = _read_input(stdin_from, err)
+            ok = prev_output is not None
 
-        # 2️⃣ Else if it's one of your builtins
+        # 1️⃣ Builtins handle piped input (and records) themselves
+        if not ok:
+            pass
         elif cmd_name in BUILTINS:
-            input_lines = prev_output.splitlines() if prev_output else None
-            output_lines = BUILTINS[cmd_name](cmd_args, input_lines)
-            prev_output = "\n".join(output_lines)
+            failures = _ErrorLog(err)
+            prev_output = BUILTINS[cmd_name](cmd_args, prev_output, err=failures)
+            ok = not failures.failed
+
+        # 2️⃣ If it's one of your custom commands
+        elif cmd_name in COMMANDS:
+            try:
+                if cmd_name in RECORD_COMMANDS:
+                    prev_output = RECORD_COMMANDS[cmd_name](cmd_args)
+                else:
+                    with captured_stdout() as out:
+                        status = COMMANDS[cmd_name](cmd_args)   # run your Python terminal command
+                    prev_output = out.getvalue().splitlines()
+                    ok = status is not False
+            except Exception as e:
+                err(f"{cmd_name}: {e}")
+                prev_output, ok = None, False
 
         # 3️⃣ Otherwise, fallback to system command
         else:
-            proc = subprocess.Popen(
-                tokens,
-                stdin=subprocess.PIPE if prev_output else None,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            out, err = proc.communicate(input=prev_output if prev_output else None)
-            if err:
-                safe_print(err)
-            prev_output = out
-
-    return prev_output.splitlines() if prev_output else []
+            text = "\n".join(as_lines(prev_output)) + "\n" if prev_output else None
+            try:
+                result = execpolicy.run(tokens, input=text)
+                if result.stderr:
+                    err(result.stderr.rstrip("\n"))
+                if result.violation:
+                    err(result.violation)
+                prev_output = result.stdout.splitlines()
+                ok = result.returncode == 0
+            except OSError as e:
+                err(f"{cmd_name}: {e}")
+                prev_output, ok = None, False
+
+        if stderr_to:
+            _write_output(stderr_to, errors, safe_print)
+        stdout_to = command.redirect(1)
+        if stdout_to:
+            # records stay unformatted until here: render once for the file
+            if _write_output(stdout_to, as_lines(prev_output), err):
+                safe_print(f"Output redirected to {stdout_to.name}")
+            prev_output = None
+
+    return prev_output, ok
+
+def run_pipeline(pipe_parts):
+    plan = plan_for(" | ".join(pipe_parts))
+    return as_lines(run_stages(plan.pipelines[0].commands)[0]) if not plan.empty else []
+
+def execute(plan):
+    """Run a parsed Plan, printing the output of each pipeline."""
+    ok = True
+    for pipeline in plan.pipelines:
+        if (pipeline.connector == "&&" and not ok) or (pipeline.connector == "||" and ok):
+            continue
+        # a fresh walker rooted at the cwd of this moment: an earlier
+        # pipeline may have changed directory or created files
+        data, ok = run_stages(pipeline.commands, Walker())
+        # records stay unformatted until here: render once for the terminal
+        for line in as_lines(data):
+            safe_print(line)
+    return ok
 
 # --- Main shell executor ---
-def cmd_shell(command_line: str):
-    from pyterminal import safe_print
+def cmd_shell(command_line):
     """
     Execute a shell-like command line supporting:
-    - Multiple commands (&& ;)
+    - Sequences (; && ||)
     - Pipes (|)
-    - Redirects (> >>)
-    - Globbing (* ?)
+    - Redirects (> >> 2> 2>> <)
+    - Quoting ('...' "..." \\)
+    - Globbing (* ? [...] ** {a,b})
     - Built-in commands entirely in Python
+    Returns False when the line failed.
     """
+    if isinstance(command_line, list):  # run as a registered command
+        command_line = shlex.join(command_line)
     if not command_line.strip():
-        return
-
-    # --- Handle multiple commands separated by && or ; ---
-    if "&&" in command_line or ";" in command_line:
-        separators = ["&&", ";"]
-        for sep in separators:
-            if sep in command_line:
-                parts = [p.strip() for p in command_line.split(sep) if p.strip()]
-                for part in parts:
-                    cmd_shell(part)  # recursively execute each command
-                return  # stop here (already executed sub-commands)
-
-    # --- Check for output redirection ---
-    output_file = None
-    mode = None
-    if ">>" in command_line:
-        parts = command_line.rsplit(">>", 1)
-        command_line = parts[0].strip()
-        output_file = parts[1].strip()
-        mode = "a"
-    elif ">" in command_line:
-        parts = command_line.rsplit(">", 1)
-        command_line = parts[0].strip()
-        output_file = parts[1].strip()
-        mode = "w"
-
-    # --- Handle pipelines (|) ---
-    pipe_parts = [p.strip() for p in command_line.split("|")]
-    input_lines = run_pipeline(pipe_parts)
-
-    # --- Output handling ---
-    if input_lines:
-        if output_file:
-            try:
-                with open(output_file, mode, encoding="utf-8") as f:
-                    f.write("\n".join(input_lines) + "\n")
-                safe_print(f"Output redirected to {output_file}")
-            except Exception as e:
-                safe_print(f"Redirection error: {e}")
-        else:
-            for line in input_lines:
-                safe_print(line)
+        return True
+    try:
+        plan = plan_for(command_line)
+    except ShellSyntaxError as e:
+        safe_print(f"shell: {e}")
+        return False
+    return execute(plan)
@@ -0,0 +1,271 @@
+# shellparse.py
+
+import os
+from functools import lru_cache
+from globber import RAW_PATTERN_COMMANDS, Walker, has_magic
+
+# Plans kept per line; repeated commands skip tokenizing and parsing
+PLAN_CACHE_SIZE = int(os.environ.get("PYTERMINAL_PLAN_CACHE", 512))
+
+SEPARATORS = ("&&", "||", ";")
+REDIRECTS = ("2>>", "2>", ">>", ">", "<")
+_GLOB_CHARS = "*?["
+
+
+class ShellSyntaxError(ValueError):
+    pass
+
+
+# ------------------------------
+# AST
+# ------------------------------
+class Word:
+    """
+    One shell word after quote removal. `pattern` is set when the word holds
+    unquoted glob characters or braces; quoted glob characters in it are
+    escaped as [*] so they only match themselves.
+    """
+
+    def __init__(self, text, pattern=None):
+        self.text = text
+        self.pattern = pattern
+
+    def __repr__(self):
+        return f"Word({self.text!r}{', glob' if self.pattern else ''})"
+
+
+class Redirect:
+    """
+    `fd` is 0 (<), 1 (> >>) or 2 (2> 2>>). `name` is the file as typed: it
+    is resolved against the cwd when the redirect is opened, since an
+    earlier `cd` on the same line may have moved it.
+    """
+
+    def __init__(self, fd, append, name):
+        self.fd = fd
+        self.append = append
+        self.name = name
+
+    @property
+    def mode(self):
+        return "a" if self.append else "w"
+
+    def __repr__(self):
+        op = {0: "<", 1: ">", 2: "2>"}[self.fd] + (">" if self.append else "")
+        return f"Redirect({op} {self.name!r})"
+
+
+class Command:
+    def __init__(self, words, redirects):
+        self.words = words
+        self.redirects = redirects
+
+    @property
+    def name(self):
+        return self.words[0].text if self.words else ""
+
+    @property
+    def globbed(self):
+        return any(w.pattern for w in self.words)
+
+    def redirect(self, fd):
+        """The redirect that wins for `fd` (the last one, as in sh), or None."""
+        found = None
+        for r in self.redirects:
+            if r.fd == fd:
+                found = r
+        return found
+
+    def argv(self, walker=None):
+        """
+        Words with globs expanded against the walker's root (the cwd when
+        none is given); patterns matching nothing stay as typed.
+        """
+        if not self.globbed or self.name in RAW_PATTERN_COMMANDS:
+            return [w.text for w in self.words]
+        walker = walker or Walker()
+        argv = []
+        for w in self.words:
+            if w.pattern:
+                argv.extend(walker.glob(w.pattern) or [w.text])
+            else:
+                argv.append(w.text)
+        return argv
+
+    def __repr__(self):
+        return f"Command({self.words!r}, {self.redirects!r})"
+
+
+class Pipeline:
+    """Commands joined by |. `connector` is how it follows the previous one."""
+
+    def __init__(self, commands, connector=None):
+        self.commands = commands
+        self.connector = connector  # None, "&&", "||" or ";"
+
+    def __repr__(self):
+        return f"Pipeline({self.commands!r}, {self.connector!r})"
+
+
+class Plan:
+    """
+    A parsed command line: pipelines run in order, honouring && and ||.
+    Nothing in it depends on the cwd; globs and redirect targets are
+    resolved when each command runs.
+    """
+
+    def __init__(self, line, pipelines):
+        self.line = line
+        self.pipelines = pipelines
+
+    @property
+    def empty(self):
+        return not self.pipelines
+
+    @property
+    def simple(self):
+        """The only Command if the line is one command without redirects."""
+        if len(self.pipelines) == 1 and len(self.pipelines[0].commands) == 1:
+            command = self.pipelines[0].commands[0]
+            if not command.redirects:
+                return command
+        return None
+
+    def __repr__(self):
+        return f"Plan({self.pipelines!r})"
+
+
+# ------------------------------
+# Tokenizer
+# ------------------------------
+def tokenize(line):
+    """
+    Split a command line into Word objects and operator strings.
+    |, ;, &&, || and redirects end a word anywhere unless quoted, so
+    `echo hi>out.txt` redirects as in sh. The conditions of `where` are the
+    exception: there > and < inside a word compare, as in `where mem>1`.
+    """
+    tokens = []
+    text, pattern = [], []
+    in_word = False
+    magic = False
+    command = None  # name of the command being tokenized
+    i, n = 0, len(line)
+
+    def end_word():
+        nonlocal text, pattern, in_word, magic, command
+        if in_word:
+            raw = "".join(text)
+            glob = "".join(pattern) if magic and has_magic("".join(pattern)) else None
+            if command is None and not (tokens and tokens[-1] in REDIRECTS):
+                command = raw
+            tokens.append(Word(raw, glob))
+        text, pattern, in_word, magic = [], [], False, False
+
+    while i < n:
+        c = line[i]
+        if c in " \t\n":
+            end_word()
+            i += 1
+            continue
+        op = next((s for s in SEPARATORS + ("|",) if line.startswith(s, i)), None)
+        if op is None and not in_word:
+            op = next((r for r in REDIRECTS if line.startswith(r, i)), None)
+        elif op is None and c in "<>" and command != "where":
+            op = ">>" if line.startswith(">>", i) else c  # 2> only starts a word
+        if op is not None:
+            end_word()
+            tokens.append(op)
+            if op not in REDIRECTS:
+                command = None
+            i += len(op)
+            continue
+
+        in_word = True
+        if c == "'":
+            end = line.find("'", i + 1)
+            if end < 0:
+                raise ShellSyntaxError("No closing quotation")
+            _quoted(line[i + 1:end], text, pattern)
+            i = end + 1
+        elif c == '"':
+            i += 1
+            chars = []
+            while i < n and line[i] != '"':
+                if line[i] == "\\" and i + 1 < n and line[i + 1] in '"\\$`':
+                    i += 1
+                chars.append(line[i])
+                i += 1
+            if i >= n:
+                raise ShellSyntaxError("No closing quotation")
+            _quoted("".join(chars), text, pattern)
+            i += 1
+        elif c == "\\":
+            if i + 1 < n:
+                _quoted(line[i + 1], text, pattern)
+            i += 2
+        else:
+            text.append(c)
+            pattern.append(c)
+            magic = magic or c in _GLOB_CHARS or c == "{"
+            i += 1
+    end_word()
+    return tokens
+
+
+def _quoted(chars, text, pattern):
+    text.append(chars)
+    pattern.extend(f"[{c}]" if c in _GLOB_CHARS else c for c in chars)
+
+
+# ------------------------------
+# Parser
+# ------------------------------
+def _target(tokens, i, op):
+    if i >= len(tokens) or not isinstance(tokens[i], Word):
+        raise ShellSyntaxError(f"missing file name after '{op}'")
+    return tokens[i].text
+
+
+def parse(line):
+    """Parse `line` into a Plan."""
+    tokens = tokenize(line)
+    pipelines, commands = [], []
+    words, redirects = [], []
+    connector = None
+    i = 0
+    while i <= len(tokens):
+        tok = tokens[i] if i < len(tokens) else ";"
+        if isinstance(tok, Word):
+            words.append(tok)
+        elif tok in REDIRECTS:
+            i += 1
+            redirects.append(Redirect(0 if tok == "<" else 2 if tok.startswith("2") else 1,
+                                      tok.endswith(">>"), _target(tokens, i, tok)))
+        else:  # | or a separator: close the current command
+            if words:
+                commands.append(Command(words, redirects))
+            elif redirects or tok == "|" or commands:
+                near = tok if i < len(tokens) else "end of line"
+                raise ShellSyntaxError(f"syntax error near {near!r}")
+            words, redirects = [], []
+            if tok != "|":
+                if commands:
+                    pipelines.append(Pipeline(commands, connector))
+                elif tok in ("&&", "||"):
+                    raise ShellSyntaxError(f"syntax error near {tok!r}")
+                commands, connector = [], tok
+        i += 1
+    if pipelines and pipelines[0].connector is not None:
+        pipelines[0].connector = None
+    return Plan(line, pipelines)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def plan_for(line):
+    """Execution plan for `line`, from the LRU when the same line ran before."""
+    return parse(line)
+
+
+def plan_cache_info():
+    return plan_for.cache_info()
@@ -0,0 +1,437 @@
+# spawner.py
+
+import os
+import re
+import sys
+import json
+import shlex
+import locale
+import select
+import signal
+import socket
+import secrets
+import threading
+import time
+import subprocess
+
+try:
+    import resource  # POSIX only
+except ImportError:
+    resource = None
+
+# Spawn helper: PYTERMINAL_SPAWNER=0 makes every child a direct fork of the server
+ENABLED = (os.environ.get("PYTERMINAL_SPAWNER", "1") not in ("", "0")
+           and sys.platform.startswith("linux") and hasattr(socket, "send_fds"))
+# Idle /bin/sh coprocesses kept for `shell ...` commands
+SHELL_POOL_SIZE = int(os.environ.get("PYTERMINAL_SHELL_POOL", 4))
+MAX_MESSAGE = 1 << 20
+ENCODING = locale.getpreferredencoding(False)
+
+
+def _readable(fds, timeout=None):
+    """
+    The descriptors in `fds` that are ready to read (data, EOF or error).
+    poll rather than select.select: a busy server hands out descriptor
+    numbers above FD_SETSIZE (1024), which select can't watch.
+    """
+    poller = select.poll()
+    for fd in fds:
+        poller.register(fd, select.POLLIN)
+    events = poller.poll(None if timeout is None else max(0, timeout) * 1000)
+    return [fd for fd, _ in events]
+
+
+def _decode(data):
+    """Text like Popen(text=True) returns it: locale encoding, universal newlines."""
+    text = data.decode(ENCODING, errors="replace")
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+# ------------------------------
+# Helper process (runs in the forked child)
+# ------------------------------
+def _preexec(rlimits, cgroup=None):
+    """
+    The preexec_fn of a child: join `cgroup` (a cgroup v2 directory), then
+    apply `rlimits`. Runs between fork and exec, so it sticks to syscalls.
+    """
+    if resource is None:
+        rlimits = ()
+    if not rlimits and not cgroup:
+        return None
+    procs = os.path.join(cgroup, "cgroup.procs").encode() if cgroup else None
+
+    def apply():
+        if procs:
+            try:
+                fd = os.open(procs, os.O_WRONLY)
+                try:
+                    os.write(fd, b"0")  # "0": the writing process itself
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass  # cgroup gone or not delegated: rlimits still apply
+        for which, value in rlimits:
+            resource.setrlimit(which, tuple(value))
+    return apply
+
+
+def _reap(children):
+    """
+    Collect exited children and report "<exit code> <CPU seconds>" on their
+    status pipes.
+    """
+    while True:
+        try:
+            pid, status, usage = os.wait4(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        entry = children.pop(pid, None)
+        if entry is not None:
+            proc, status_fd = entry
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            cpu_time = usage.ru_utime + usage.ru_stime
+            try:
+                os.write(status_fd, f"{proc.returncode} {cpu_time:.6f}".encode())
+            except OSError:
+                pass
+            os.close(status_fd)
+
+
+def _spawn(sock, request, children):
+    try:
+        proc = subprocess.Popen(
+            request["args"],
+            shell=request["shell"],
+            cwd=request["cwd"],
+            env=request["env"],
+            stdin=subprocess.PIPE if request["stdin"] else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+            preexec_fn=_preexec(request["rlimits"], request.get("cgroup")),
+        )
+    except OSError as e:
+        reply = {"errno": e.errno, "error": e.strerror or str(e), "filename": e.filename}
+        sock.send(json.dumps(reply).encode())
+        return
+    status_r, status_w = os.pipe()
+    pipes = [proc.stdout, proc.stderr] + ([proc.stdin] if proc.stdin else [])
+    fds = [proc.stdout.fileno(), proc.stderr.fileno(), status_r]
+    if proc.stdin:
+        fds.append(proc.stdin.fileno())
+    try:
+        socket.send_fds(sock, [json.dumps({"pid": proc.pid}).encode()], fds)
+    finally:
+        for f in pipes:  # the server holds the only copies now
+            f.close()
+        os.close(status_r)
+    children[proc.pid] = (proc, status_w)
+
+
+def _helper_main(sock):
+    """Spawn one child per request until the server closes its end."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    wake_r, wake_w = os.pipe()
+    os.set_blocking(wake_r, False)
+    os.set_blocking(wake_w, False)
+    signal.set_wakeup_fd(wake_w)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    children = {}  # pid -> (Popen, status pipe write end)
+    while True:
+        ready = _readable([sock.fileno(), wake_r])
+        if wake_r in ready:
+            try:
+                while os.read(wake_r, 512):
+                    pass
+            except BlockingIOError:
+                pass
+        _reap(children)
+        if sock.fileno() in ready:
+            data = sock.recv(MAX_MESSAGE)
+            if not data:
+                return
+            _spawn(sock, json.loads(data), children)
+
+
+# ------------------------------
+# Server side
+# ------------------------------
+_helper = None  # (socket, pid) once started
+_helper_lock = threading.Lock()   # one request/reply at a time on the socket
+
+
+def start():
+    """
+    Fork the spawn helper now, while the process is still small. Children
+    are then forked from the helper, so spawn cost no longer grows with the
+    server's memory. Returns True if the helper is running.
+    """
+    global _helper
+    with _helper_lock:
+        if _helper is not None:
+            return True
+        if not ENABLED:
+            return False
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                parent.close()
+                # drop inherited descriptors such as listening sockets
+                keep = child.fileno()
+                os.closerange(3, keep)
+                os.closerange(keep + 1, 65536)
+                _helper_main(child)
+            finally:
+                os._exit(0)
+        child.close()
+        _helper = (parent, pid)
+        return True
+
+
+def _helper_lost():
+    global _helper
+    sock, pid = _helper
+    _helper = None
+    sock.close()
+    try:
+        os.waitpid(pid, os.WNOHANG)
+    except ChildProcessError:
+        pass
+
+
+def spawn(args, shell=False, stdin=False, rlimits=(), cwd=None, cgroup=None):
+    """
+    Start a child through the helper in its own session, placed in
+    `cgroup` before it execs. Returns a
+    RemoteProcess, or None when the helper is unavailable and the caller
+    should fork the child itself. Raises OSError if the command can't run.
+    """
+    if _helper is None:
+        # forking a process with other threads running is unsafe; the server
+        # starts the helper early instead (see ws_handler.serve)
+        if threading.active_count() > 1 or not start():
+            return None
+    request = json.dumps({
+        "args": args, "shell": shell, "stdin": stdin, "rlimits": list(rlimits),
+        "cwd": cwd or os.getcwd(), "env": dict(os.environ), "cgroup": cgroup,
+    }).encode()
+    with _helper_lock:
+        if _helper is None:
+            return None
+        sock = _helper[0]
+        try:
+            sock.send(request)
+            data, fds, _flags, _addr = socket.recv_fds(sock, 4096, 4)
+        except OSError as e:
+            if e.errno != getattr(os, "EMSGSIZE", None) and not isinstance(e, InterruptedError):
+                _helper_lost()
+            return None
+        if not data:
+            _helper_lost()
+            return None
+    reply = json.loads(data)
+    if "errno" in reply:
+        raise OSError(reply["errno"], reply["error"], reply.get("filename"))
+    return RemoteProcess(args, reply["pid"], fds)
+
+
+class RemoteProcess:
+    """The part of Popen that execpolicy uses, for a child started by the helper."""
+
+    def __init__(self, args, pid, fds):
+        self.args = args
+        self.pid = pid
+        self.returncode = None
+        self.cpu_time = None  # user + system seconds, once it has exited
+        self.stdout_fd, self.stderr_fd, self._status = fds[:3]
+        self.stdin_fd = fds[3] if len(fds) > 3 else None
+        self._out, self._err = [], []
+        self._threads = None
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            if not _readable([self._status], timeout):
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            data = os.read(self._status, 64).split()
+            os.close(self._status)
+            if data:
+                self.returncode, self.cpu_time = int(data[0]), float(data[1])
+            else:
+                self.returncode = -signal.SIGKILL  # helper died
+        return self.returncode
+
+    def poll(self):
+        try:
+            return self.wait(0)
+        except subprocess.TimeoutExpired:
+            return None
+
+    def _pump(self, input):
+        def read(fd, chunks):
+            with open(fd, "rb", closefd=True) as f:
+                while True:
+                    block = f.read1(65536)
+                    if not block:
+                        return
+                    chunks.append(block)
+
+        def write(fd, data):
+            with open(fd, "wb", closefd=True) as f:
+                try:
+                    f.write(data)
+                except BrokenPipeError:
+                    pass
+
+        self._threads = [threading.Thread(target=read, args=(self.stdout_fd, self._out), daemon=True),
+                         threading.Thread(target=read, args=(self.stderr_fd, self._err), daemon=True)]
+        if self.stdin_fd is not None:
+            data = (input or "").encode(ENCODING)
+            self._threads.append(threading.Thread(target=write, args=(self.stdin_fd, data), daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def communicate(self, input=None, timeout=None):
+        """Like Popen.communicate in text mode; call again after a timeout to collect."""
+        if self._threads is None:
+            self._pump(input)
+        self.cpu_time = None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.wait(timeout)
+        for t in self._threads:
+            t.join(None if deadline is None else max(0, deadline - time.monotonic()))
+            if t.is_alive():  # a grandchild still holds the pipe open
+                raise subprocess.TimeoutExpired(self.args, timeout)
+        return _decode(b"".join(self._out)), _decode(b"".join(self._err))
+
+    def kill(self):
+        try:
+            os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+# ------------------------------
+# Warm /bin/sh coprocesses for `shell ...`
+# ------------------------------
+_TIMES = re.compile(rb"(\d+)m\s*([\d.]+)s")
+
+
+def _seconds(times_line):
+    """'0m0.810000s 0m0.020000s' (a line of the times builtin) -> 0.83"""
+    return sum(int(m) * 60 + float(s) for m, s in _TIMES.findall(times_line))
+
+
+class Coprocess:
+    """
+    A long-running /bin/sh reading commands on stdin. Each command runs in a
+    subshell (cd and exit don't leak) followed by a sentinel line carrying
+    its exit status, on stdout and on stderr. After the stderr sentinel the
+    shell's `times` reports the CPU time of its reaped children so far; the
+    growth is the command's CPU time, kept in `cpu_time`.
+    """
+
+    def __init__(self, rlimits=()):
+        self.proc = spawn(["/bin/sh"], stdin=True, rlimits=rlimits)
+        if self.proc is not None:
+            fds = (self.proc.stdin_fd, self.proc.stdout_fd, self.proc.stderr_fd)
+        else:
+            self.proc = subprocess.Popen(["/bin/sh"], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                         stderr=subprocess.PIPE, start_new_session=True,
+                                         preexec_fn=_preexec(rlimits))
+            fds = (self.proc.stdin.fileno(), self.proc.stdout.fileno(), self.proc.stderr.fileno())
+        self.stdin, self.stdout, self.stderr = fds
+        self.alive = True
+        self.cpu_time = None      # user + system seconds of the last command
+        self._children_cpu = 0.0  # what `times` reported after the previous one
+
+    def run(self, command, cwd, timeout=None):
+        """Run `command` in `cwd`; returns (returncode, stdout, stderr)."""
+        token = secrets.token_hex(8)
+        script = (f"( cd -- {shlex.quote(cwd)} && eval {shlex.quote(command)} ) </dev/null\n"
+                  f"printf '\\n__PYT_{token}_%d__\\n' $?\n"
+                  f"printf '\\n__PYT_{token}__\\n' >&2\n"
+                  f"times >&2\n")
+        out_end = re.compile(rb"\n__PYT_" + token.encode() + rb"_(\d+)__\n\Z")
+        err_end = re.compile(rb"\n__PYT_" + token.encode() + rb"__\n[^\n]*\n([^\n]*)\n\Z")
+        try:
+            os.write(self.stdin, script.encode(ENCODING))
+        except OSError:
+            self.alive = False
+            raise
+        out, err = bytearray(), bytearray()
+        done_out = done_err = None
+        self.cpu_time = None
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while done_out is None or done_err is None:
+            wait = None if deadline is None else deadline - time.monotonic()
+            if wait is not None and wait <= 0:
+                self.alive = False
+                raise subprocess.TimeoutExpired(command, timeout)
+            fds = [fd for fd, done in ((self.stdout, done_out), (self.stderr, done_err)) if done is None]
+            for fd in _readable(fds, wait):
+                block = os.read(fd, 65536)
+                if not block:  # killed, e.g. the session disconnected
+                    self.alive = False
+                    return -signal.SIGKILL, _decode(bytes(out)), _decode(bytes(err))
+                if fd == self.stdout:
+                    out += block
+                    done_out = out_end.search(out, max(0, len(out) - len(block) - 64))
+                else:
+                    err += block
+                    done_err = err_end.search(err, max(0, len(err) - len(block) - 128))
+        children = _seconds(done_err.group(1))
+        self.cpu_time, self._children_cpu = children - self._children_cpu, children
+        stdout = bytes(out[:done_out.start()])
+        stderr = bytes(err[:done_err.start()])
+        return int(done_out.group(1)), _decode(stdout), _decode(stderr)
+
+    def close(self):
+        self.alive = False
+        for fd in (self.stdin, self.stdout, self.stderr):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if isinstance(self.proc, subprocess.Popen):
+            self.proc.wait()
+        elif self.proc.returncode is None:
+            os.close(self.proc._status)  # the helper reaps the shell on its own
+
+
+class ShellPool:
+    def __init__(self, size=SHELL_POOL_SIZE):
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self, rlimits=()):
+        """An idle coprocess started with `rlimits`, or a new one."""
+        key = json.dumps(list(rlimits))
+        with self._lock:
+            for i, (k, shell) in enumerate(self._idle):
+                if k == key:
+                    del self._idle[i]
+                    return shell
+        shell = Coprocess(rlimits)
+        shell.key = key
+        return shell
+
+    def release(self, shell):
+        if shell.alive:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append((shell.key, shell))
+                    return
+        shell.close()
+
+    def warm(self, count, rlimits=()):
+        shells = [self.acquire(rlimits) for _ in range(min(count, self.size))]
+        for shell in shells:
+            self.release(shell)
+
+
+SHELL_POOL = ShellPool()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# startup_report.py
+"""
+Import-time report and regression budget for server/CLI cold start.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter,
+prints the slowest imports and fails when the total goes over budget or
+when a module that should be lazy got imported at startup.
+
+Usage:
+    python startup_report.py                 # check every entry in BUDGETS
+    python startup_report.py main -n 5 -t 20 # best of 5 runs, show top 20
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+# Cumulative import time budget in milliseconds (best of N runs)
+BUDGETS = {
+    "main": 60,
+    "ws_handler": 150,
+}
+
+# Modules that must only be imported on first use, never at startup
+LAZY_MODULES = [
+    "prompt_toolkit",
+    "psutil",
+    "nlp_handler",
+    "advanced_ls",
+    "process_mgmt",
+    "shell_features",
+]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure(module):
+    """
+    Import `module` in a fresh interpreter.
+    Returns {imported name: (self_us, cumulative_us)} or raises RuntimeError.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=HERE, capture_output=True, text=True
+    )
+    timings = {}
+    errors = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # header line
+        timings[parts[2].strip()] = (int(parts[0]), int(parts[1]))
+    if proc.returncode != 0:
+        raise RuntimeError("\n".join(errors[-5:]) or f"import {module} failed")
+    return timings
+
+
+def report(module, runs=3, top=15, budget_ms=None):
+    """Print the report for one module. Returns True when within budget."""
+    best = None
+    for _ in range(runs):
+        timings = measure(module)
+        if best is None or timings[module][1] < best[module][1]:
+            best = timings
+
+    total_ms = best[module][1] / 1000
+    print(f"== {module}: {total_ms:.1f} ms cumulative (best of {runs})")
+    slowest = sorted(best.items(), key=lambda kv: kv[1][1], reverse=True)
+    for name, (self_us, cum_us) in slowest[:top]:
+        print(f"  {cum_us / 1000:8.1f} ms  {self_us / 1000:8.1f} ms self  {name}")
+
+    ok = True
+    eager = [m for m in LAZY_MODULES if m in best]
+    if eager:
+        print(f"  FAIL: imported at startup, should be lazy: {', '.join(eager)}")
+        ok = False
+    if budget_ms is not None and total_ms > budget_ms:
+        print(f"  FAIL: {total_ms:.1f} ms is over the {budget_ms} ms budget")
+        ok = False
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time report with budget")
+    parser.add_argument("modules", nargs="*", help="modules to check (default: BUDGETS)")
+    parser.add_argument("-n", "--runs", type=int, default=3)
+    parser.add_argument("-t", "--top", type=int, default=15)
+    parser.add_argument("-b", "--budget", type=float, help="budget in ms for every module")
+    opts = parser.parse_args(argv)
+
+    ok = True
+    for module in opts.modules or list(BUDGETS):
+        budget = opts.budget if opts.budget is not None else BUDGETS.get(module)
+        try:
+            ok = report(module, opts.runs, opts.top, budget) and ok
+        except RuntimeError as e:
+            print(f"== {module}: import failed\n{e}")
+            ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+# test_api.py
+
+import os
+import pytest
+import resultcache
+from api import MAX_COMMANDS, BatchError, parse_batch, run_batch
+from pyterminal import WorkingDirectory
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(resultcache, "ENABLED", False)
+
+
+def statuses(commands, cwd, **kw):
+    return [r["status"] for r in run_batch(commands, str(cwd), **kw)]
+
+
+# ------------------------------
+# Status of each command
+# ------------------------------
+@pytest.mark.parametrize("line", ["cat nope.txt", "ls nope", "cd nope", "grep x nope",
+                                  "mkdir a a", "cat nope.txt && echo no", "nosuchcommand"])
+def test_failures_have_status_1(tmp_path, line):
+    assert statuses([line], tmp_path) == [1]
+
+
+@pytest.mark.parametrize("line", ["pwd", "ls", "echo hi", "cat nope.txt || echo fallback"])
+def test_successes_have_status_0(tmp_path, line):
+    assert statuses([line], tmp_path) == [0]
+
+
+def test_stop_on_error(tmp_path):
+    assert statuses(["echo a", "cat nope.txt", "echo b"], tmp_path, stop_on_error=True) == [0, 1]
+
+
+# ------------------------------
+# Request validation
+# ------------------------------
+@pytest.mark.parametrize("body", [None, [], "ls", {}, {"commands": [1]},
+                                  {"commands": ["ls"] * (MAX_COMMANDS + 1)},
+                                  {"commands": ["ls"], "cwd": 5}])
+def test_bad_bodies(body):
+    with pytest.raises(BatchError):
+        parse_batch(body)
+
+
+def test_parse_batch(tmp_path):
+    assert parse_batch({"commands": "ls"}) == (["ls"], None, False, False, False)
+    body = {"commands": ["ls", "pwd"], "cwd": str(tmp_path), "parallel": 1, "stream": True}
+    assert parse_batch(body) == (["ls", "pwd"], str(tmp_path), True, False, True)
+    with pytest.raises(BatchError, match="no such directory"):
+        parse_batch({"commands": ["ls"], "cwd": str(tmp_path / "gone")})
+
+
+@pytest.mark.parametrize("line", ["cd sub", "echo a && cd sub", "ls | cd sub; pwd"])
+def test_parallel_batches_refuse_cd(line):
+    with pytest.raises(BatchError):
+        parse_batch({"commands": ["pwd", line], "parallel": True})
+    assert parse_batch({"commands": ["pwd", line]})[0] == ["pwd", line]
+
+
+# ------------------------------
+# Working directory of a batch
+# ------------------------------
+def test_cd_moves_only_the_batch(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "s.txt").write_text("s\n")
+    before = os.getcwd()
+    workdir = WorkingDirectory(str(tmp_path))
+    results = list(run_batch(["cd sub", "cat s.txt", "pwd"], workdir))
+    assert [r["output"].strip() for r in results[1:]] == ["s", str(tmp_path / "sub")]
+    assert workdir.path == str(tmp_path / "sub")
+    assert os.getcwd() == before
+    # a new batch starts where it is told to
+    assert next(run_batch(["pwd"], str(tmp_path)))["output"].strip() == str(tmp_path)
+
+
+def test_parallel_results_cover_every_command(tmp_path):
+    for name in "abcdef":
+        (tmp_path / name).write_text(name + "\n")
+    results = list(run_batch([f"cat {name}" for name in "abcdef"], str(tmp_path), parallel=True))
+    ordered = sorted(results, key=lambda r: r["index"])
+    assert [r["output"] for r in ordered] == [name + "\n" for name in "abcdef"]
+    assert all(r["status"] == 0 and r["duration_ms"] >= 0 for r in ordered)
@@ -0,0 +1,127 @@
+# test_archivefs.py
+
+import io
+import os
+import tarfile
+import zipfile
+import pytest
+import archivefs
+import resultcache
+from main import run_line
+
+FILES = {
+    "README": b"hello archive\n",
+    "src/main.c": b"int main(void) {\n    /* TODO: args */\n    return 0;\n}\n",
+    "src/util/big.txt": b"".join(b"line %d\n" % i for i in range(50000)),
+}
+
+
+@pytest.fixture(autouse=True)
+def clean_mounts(monkeypatch):
+    monkeypatch.setattr(resultcache, "ENABLED", False)
+    yield
+    for mount_point in list(archivefs.MOUNTS):
+        archivefs.umount(mount_point)
+    for archive in archivefs._INDEXES.values():
+        archive.close()
+    archivefs._INDEXES.clear()
+
+
+def make_tar(path, mode):
+    with tarfile.open(path, mode) as tf:
+        for name, data in FILES.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+        link = tarfile.TarInfo("latest")
+        link.type, link.linkname = tarfile.SYMTYPE, "src/main.c"
+        tf.addfile(link)
+
+
+def make_zip(path):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in FILES.items():
+            zf.writestr(name, data)
+
+
+@pytest.fixture(params=["tar.gz", "tar", "zip"])
+def mounted(request, tmp_path, monkeypatch):
+    # small checkpoint span: gzip reads resume from several saved states
+    monkeypatch.setattr(archivefs, "CHECKPOINT_SPAN", 64 * 1024)
+    archive = tmp_path / f"release.{request.param}"
+    if request.param == "zip":
+        make_zip(archive)
+    else:
+        make_tar(archive, "w:gz" if request.param == "tar.gz" else "w")
+    (tmp_path / "mnt").mkdir()
+
+    def run(line):
+        return run_line(line, cwd=str(tmp_path))
+    output, ok = run(f"mount {archive.name} mnt/rel")
+    assert ok, output
+    return run
+
+
+# ------------------------------
+# Reading through a mount
+# ------------------------------
+def test_ls(mounted, tmp_path):
+    assert set(archivefs.listdir(str(tmp_path / "mnt/rel"))) >= {"README", "src"}
+    assert mounted("ls mnt/rel/src")[0].split() == ["main.c", "util"]
+    assert "rel" in archivefs.listdir(str(tmp_path / "mnt"))
+    assert archivefs.isdir(str(tmp_path / "mnt/rel/src/util"))
+    output, ok = mounted("ls mnt/rel/nothing")
+    assert not ok
+
+
+def test_cat(mounted, tmp_path):
+    assert mounted("cat mnt/rel/README") == ("hello archive\n", True)
+    with archivefs.open_member(str(tmp_path / "mnt/rel/src/util/big.txt")) as f:
+        assert f.read() == FILES["src/util/big.txt"]
+    # a read from the middle of a member
+    with archivefs.open_member(str(tmp_path / "mnt/rel/src/util/big.txt")) as f:
+        f.read(300_000)
+        assert f.read(12) == FILES["src/util/big.txt"][300_000:300_012]
+    assert not mounted("cat mnt/rel/src")[1]
+
+
+def test_grep(mounted):
+    output, ok = mounted("grep TODO mnt/rel/src/main.c")
+    assert ok and "TODO: args" in output
+    output, ok = mounted("cat mnt/rel/src/util/big.txt | grep 'line 4999[0-9]'")
+    assert ok and len(output.splitlines()) == 10
+
+
+def test_tar_symlink(tmp_path):
+    make_tar(tmp_path / "r.tar.gz", "w:gz")
+    archivefs.mount(str(tmp_path / "r.tar.gz"), str(tmp_path / "rel"))
+    with archivefs.open_member(str(tmp_path / "rel/latest")) as f:
+        assert f.read() == FILES["src/main.c"]
+
+
+# ------------------------------
+# Mount table
+# ------------------------------
+def test_mount_errors(tmp_path):
+    make_zip(tmp_path / "r.zip")
+    (tmp_path / "bad.zip").write_bytes(b"not a zip")
+    (tmp_path / "bad.tar").write_bytes(b"not a tar" * 100)
+    archivefs.mount(str(tmp_path / "r.zip"), str(tmp_path / "a"))
+    for archive, point in [("r.zip", "a"), ("r.zip", "a/src"), ("bad.zip", "b"),
+                           ("bad.tar", "b"), ("missing.tar", "b")]:
+        with pytest.raises((ValueError, OSError)):
+            archivefs.mount(str(tmp_path / archive), str(tmp_path / point))
+    with pytest.raises(ValueError):
+        archivefs.umount(str(tmp_path / "b"))
+
+
+def test_umount_and_index_reuse(tmp_path):
+    make_tar(tmp_path / "r.tar", "w")
+    first = archivefs.mount(str(tmp_path / "r.tar"), str(tmp_path / "a"))
+    archivefs.umount(str(tmp_path / "a"))
+    assert archivefs.lookup(str(tmp_path / "a/README")) is None
+    again = archivefs.mount(str(tmp_path / "r.tar"), str(tmp_path / "b"))
+    assert again is first  # unchanged archive: the index is reused
+    os.utime(tmp_path / "r.tar", (0, 0))
+    archivefs.umount(str(tmp_path / "b"))
+    assert archivefs.mount(str(tmp_path / "r.tar"), str(tmp_path / "b")) is not first
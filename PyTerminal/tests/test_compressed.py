@@ -0,0 +1,107 @@
+# test_compressed.py
+
+import bz2
+import gzip
+import lzma
+import pytest
+import compressed
+from compressed import detect, open_binary, open_text
+
+TEXT = "".join(f"line {i} é\n" for i in range(5000))
+DATA = TEXT.encode("utf-8")
+
+
+@pytest.mark.parametrize("fmt, compress", [
+    ("gzip", gzip.compress),
+    ("bz2", bz2.compress),
+    ("xz", lzma.compress),
+])
+def test_detect_and_read(tmp_path, fmt, compress):
+    # detected by content, whatever the name says
+    path = tmp_path / "data.txt"
+    path.write_bytes(compress(DATA))
+    assert detect(str(path)) == fmt
+    with open_binary(str(path)) as f:
+        assert f.read() == DATA
+    with open_text(str(path)) as f:
+        assert f.read() == TEXT
+
+
+def test_plain_and_tiny_files(tmp_path):
+    plain = tmp_path / "plain.gz"  # a .gz name alone doesn't make it gzip
+    plain.write_text(TEXT, encoding="utf-8")
+    assert detect(str(plain)) is None
+    with open_text(str(plain)) as f:
+        assert f.read() == TEXT
+    empty = tmp_path / "empty"
+    empty.write_bytes(b"")
+    assert detect(str(empty)) is None
+    short = tmp_path / "short"
+    short.write_bytes(b"\x1f")
+    assert detect(str(short)) is None
+
+
+def test_zstd_magic(tmp_path):
+    path = tmp_path / "x.zst"
+    path.write_bytes(b"\x28\xb5\x2f\xfd" + b"\0" * 8)
+    assert detect(str(path)) == "zstd"
+
+
+def test_gzip_multi_member(tmp_path):
+    path = tmp_path / "multi.gz"
+    path.write_bytes(gzip.compress(DATA[:1000]) + gzip.compress(DATA[1000:]))
+    with open_text(str(path)) as f:
+        assert f.read() == TEXT
+
+
+# ------------------------------
+# bz2 split into several streams (pbzip2/lbzip2 style)
+# ------------------------------
+@pytest.fixture
+def parallel(monkeypatch):
+    monkeypatch.setattr(compressed, "PARALLEL_MIN_SIZE", 0)
+    monkeypatch.setattr(compressed, "PARALLEL_WORKERS", 2)
+
+
+def multistream(tmp_path, pieces):
+    path = tmp_path / "multi.bz2"
+    step = len(DATA) // pieces + 1
+    path.write_bytes(b"".join(bz2.compress(DATA[i:i + step]) for i in range(0, len(DATA), step)))
+    return str(path)
+
+
+def test_bz2_stream_boundaries(tmp_path):
+    path = multistream(tmp_path, 7)
+    ranges = compressed._bz2_streams(path)
+    assert len(ranges) == 7
+    assert ranges[0][0] == 0
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+
+
+def test_bz2_multistream_parallel(tmp_path, parallel):
+    # more streams than 2 * workers, so pieces are queued and reordered
+    path = multistream(tmp_path, 9)
+    f = open_binary(path)
+    assert isinstance(f, compressed._ChunkStream)
+    with open_text(path) as text:
+        assert text.read() == TEXT
+    f.close()
+
+
+def test_bz2_single_stream_stays_sequential(tmp_path, parallel):
+    path = tmp_path / "one.bz2"
+    path.write_bytes(bz2.compress(DATA))
+    f = open_binary(str(path))
+    assert not isinstance(f, compressed._ChunkStream)
+    assert f.read() == DATA
+    f.close()
+
+
+def test_bz2_false_boundary_falls_back(tmp_path, parallel):
+    # a "stream start" inside compressed data: from there on, decompress sequentially
+    path = multistream(tmp_path, 3)
+    ranges = compressed._bz2_streams(path)
+    start, end = ranges[1]
+    bogus = ranges[:1] + [(start, start + 100), (start + 100, end)] + ranges[2:]
+    with compressed._parallel_bz2(path, bogus) as f:
+        assert b"".join(iter(lambda: f.read(65536), b"")) == DATA
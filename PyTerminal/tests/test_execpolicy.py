@@ -0,0 +1,76 @@
+# test_execpolicy.py
+
+import sys
+import time
+import signal
+import threading
+import pytest
+import execpolicy
+from execpolicy import CURRENT_SESSION, ExecPolicy, _explain, kill_session, run, run_shell
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="POSIX process groups and rlimits")
+
+# ignores SIGXCPU, so only the hard limit's SIGKILL stops it
+SPIN = "import signal; signal.signal(signal.SIGXCPU, signal.SIG_IGN)\nwhile True: pass"
+
+
+def test_output_status_and_input(tmp_path):
+    result = run(["sh", "-c", "pwd; cat; echo oops >&2; exit 3"], input="fed\n", cwd=str(tmp_path))
+    assert (result.returncode, result.stdout, result.stderr) == (3, f"{tmp_path}\nfed\n", "oops\n")
+    assert result.violation is None
+    # more than a pipe buffer both ways
+    assert run(["cat"], input="x" * 1_000_000).stdout == "x" * 1_000_000
+
+
+def test_wall_clock_limit():
+    start = time.monotonic()
+    result = run(["sh", "-c", "echo started; sleep 30"], policy=ExecPolicy(timeout=0.5))
+    assert time.monotonic() - start < 5
+    assert result.returncode == -signal.SIGKILL
+    assert result.stdout == "started\n"
+    assert "wall-clock limit" in result.violation
+
+
+@pytest.mark.parametrize("runner", [
+    lambda policy: run([sys.executable, "-c", SPIN], policy=policy),
+    lambda policy: run_shell(f"{sys.executable} -c '{SPIN}'", policy=policy),
+])
+def test_sigkill_from_the_cpu_hard_limit_is_attributed(runner):
+    result = runner(ExecPolicy(timeout=20, cpu_seconds=1))
+    assert result.violation == "Error: CPU time limit of 1s exceeded"
+
+
+def test_sigkill_from_outside_is_not_a_cpu_violation():
+    policy = ExecPolicy(timeout=20, cpu_seconds=1)
+    result = run(["sh", "-c", "kill -9 $$"], policy=policy)
+    assert result.returncode == -signal.SIGKILL
+    assert result.violation is None
+
+
+def test_explain():
+    policy = ExecPolicy(cpu_seconds=2, memory_mb=64, max_files=8)
+    assert _explain(policy, -signal.SIGXCPU, "", None) == "Error: CPU time limit of 2s exceeded"
+    assert _explain(policy, 128 + signal.SIGXCPU, "", None) is not None  # reported by /bin/sh
+    assert _explain(policy, -signal.SIGKILL, "", None, cpu_time=0.1) is None
+    assert _explain(policy, -signal.SIGKILL, "", None, cpu_time=2.5) is not None
+    assert "memory limit" in _explain(policy, 1, "MemoryError", None)
+    assert "open file limit" in _explain(policy, 1, "Too many open files", None)
+    assert _explain(policy, 0, "Too many open files", None) is None
+
+
+def test_kill_session():
+    results = []
+
+    def start():
+        CURRENT_SESSION.set("test-kill")
+        results.append(run(["sleep", "30"]))
+
+    thread = threading.Thread(target=start)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while "test-kill" not in execpolicy._running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert kill_session("test-kill") == 1
+    thread.join(5)
+    assert results[0].returncode == -signal.SIGKILL
+    assert kill_session("test-kill") == 0
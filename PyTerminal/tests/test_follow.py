@@ -0,0 +1,131 @@
+# test_follow.py
+
+import os
+import asyncio
+import pytest
+import follow
+from follow import parse_follow, read_tail
+
+
+def test_read_tail(tmp_path):
+    path = tmp_path / "log"
+    path.write_text("".join(f"line {i}\n" for i in range(100)))
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        assert read_tail(fd, size, 2) == "line 98\nline 99\n"
+        assert read_tail(fd, size, 0) == ""
+        assert read_tail(fd, size, 500).count("\n") == 100
+    finally:
+        os.close(fd)
+
+
+def test_parse_follow():
+    assert parse_follow("follow app.log") == ("app.log", follow.TAIL_LINES)
+    assert parse_follow("tail -f -n 5 app.log") == ("app.log", 5)
+    assert parse_follow("tail -n 5 app.log") is None
+    with pytest.raises(ValueError):
+        parse_follow("follow a b")
+
+
+# ------------------------------
+# Following a file from the event loop
+# ------------------------------
+def following(path, lines=2):
+    """Run `scenario(queue, tail)` against a follower of `path`."""
+    def run(scenario):
+        async def main():
+            follower, tail, queue = follow.subscribe(str(path), lines)
+            try:
+                return await scenario(queue, tail)
+            finally:
+                follow.unsubscribe(follower, queue)
+                follower.task.cancel()  # else it sleeps until the next safety check
+                await asyncio.gather(follower.task, return_exceptions=True)
+        return asyncio.run(main())
+    return run
+
+
+async def received(queue, until):
+    """Text from the queue until it contains `until`."""
+    text = ""
+    while until not in text:
+        text += await asyncio.wait_for(queue.get(), 5)
+    return text
+
+
+def append(path, text):
+    with open(path, "a") as f:
+        f.write(text)
+
+
+def test_tail_then_appended_lines(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("one\ntwo\nthree\n")
+
+    async def scenario(queue, tail):
+        assert tail == "two\nthree\n"
+        append(path, "four\nfi")  # the half line waits for its newline
+        assert await received(queue, "four\n") == "four\n"
+        append(path, "ve\n")
+        return await received(queue, "five")
+    assert following(path)(scenario) == "five\n"
+
+
+def test_large_append_arrives_whole(tmp_path):
+    path = tmp_path / "big.log"
+    path.write_text("")
+    block = "".join(f"{i:07d}\n" for i in range(3 * follow.READ_BLOCK // 8))
+
+    async def scenario(queue, tail):
+        append(path, block + "end\n")
+        return await received(queue, "end\n")
+    assert following(path)(scenario) == block + "end\n"
+
+
+def test_truncation(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("old line that is long\n")
+
+    async def scenario(queue, tail):
+        with open(path, "w") as f:  # truncate and start over, shorter
+            f.write("new\n")
+        return await received(queue, "new\n")
+    text = following(path)(scenario)
+    assert text == f"follow: {path} was truncated\nnew\n"
+
+
+def test_rotation_by_rename(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("first\n")
+
+    async def scenario(queue, tail):
+        append(path, "last words")  # never terminated
+        await asyncio.sleep(0.05)
+        os.rename(path, tmp_path / "app.log.1")
+        path.write_text("fresh\n")
+        return await received(queue, "fresh\n")
+    text = following(path)(scenario)
+    assert text.endswith(f"last words\nfollow: {path} was replaced, following the new file\nfresh\n")
+    assert "first" not in text  # already shown as the tail
+
+
+def test_slow_reader_is_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(follow, "QUEUE_SIZE", 2)
+    path = tmp_path / "fast.log"
+    path.write_text("")
+
+    async def scenario(queue, tail):
+        for i in range(5):
+            append(path, f"{i}\n")
+            await asyncio.sleep(0.05)
+        messages = []
+        while (item := await asyncio.wait_for(queue.get(), 5)) is not None:
+            messages.append(item)
+        return messages
+    assert "faster than it can be sent" in following(path)(scenario)[-1]
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        follow.subscribe(str(tmp_path / "nope"))
@@ -0,0 +1,100 @@
+# test_globber.py
+
+import glob
+import pytest
+from globber import Walker, expand_braces, expand_globs, cmd_glob
+
+FILES = [
+    "a.txt", "b.py", "c.log", ".env",
+    "src/m.py", "src/m.pyc", "src/pkg/n.py", "src/pkg/.hidden.py", "src/pkg/deep/o.py",
+    "src/pkg/deep/er/p.py", ".git/config.py", "docs/r.md", "docs/s.txt", "docs/[x].txt",
+]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in FILES:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(name)
+    (tmp_path / "empty").mkdir()
+    return tmp_path
+
+
+def stdlib(root, pattern):
+    return sorted(glob.glob(pattern, root_dir=root, recursive=True), key=lambda p: p.split("/"))
+
+
+# ------------------------------
+# Same answers as the standard library
+# ------------------------------
+@pytest.mark.parametrize("pattern", [
+    "*", "*.txt", "*.p?", "[ab].*", "[!a]*.txt", "*/", "*/*.py", "src/*/*.py",
+    "**", "**/", "**/*.py", "src/**/*.py", "src/**/", "**/deep/**/*.py", "**/pkg",
+    ".*", "src/pkg/.*", "docs/[[]x].txt", "missing/*", "nothing*",
+])
+def test_matches_stdlib(tree, pattern):
+    assert Walker(root=str(tree)).glob(pattern) == stdlib(tree, pattern)
+
+
+def test_absolute_patterns(tree):
+    pattern = f"{tree}/**/*.md"
+    assert Walker(root="/").glob(pattern) == [f"{tree}/docs/r.md"]
+
+
+def test_trailing_double_star_lists_contents_only(tree):
+    # unlike glob.glob, "src/**" does not include "src/" itself
+    assert Walker(root=str(tree)).glob("src/**") == [p for p in stdlib(tree, "src/**") if p != "src/"]
+
+
+def test_hidden_files_need_a_dotted_segment(tree):
+    walker = Walker(root=str(tree))
+    assert ".env" not in walker.glob("*")
+    assert ".git/config.py" not in walker.glob("**/*.py")
+    assert "src/pkg/.hidden.py" not in walker.glob("**/*.py")
+    assert walker.glob(".git/*") == [".git/config.py"]
+
+
+# ------------------------------
+# Braces
+# ------------------------------
+def test_expand_braces():
+    assert expand_braces("a{b,c}d") == ["abd", "acd"]
+    assert expand_braces("a{b,c{d,e}}f") == ["abf", "acdf", "acef"]
+    assert expand_braces("{x,y}{1,2}") == ["x1", "x2", "y1", "y2"]
+    assert expand_braces("a{,b}") == ["a", "ab"]
+    assert expand_braces("a{b}c") == ["a{b}c"]
+    assert expand_braces("a{b,c") == ["a{b,c"]
+
+
+def test_brace_patterns_merge_sorted_without_duplicates(tree):
+    walker = Walker(root=str(tree))
+    expected = sorted(set(stdlib(tree, "*.txt") + stdlib(tree, "docs/*")), key=lambda p: p.split("/"))
+    assert walker.glob("{*.txt,docs/*}") == expected
+    assert walker.glob("{a,a}.txt") == ["a.txt"]
+    assert walker.glob("src/**/*.{py,pyc}") == sorted(
+        stdlib(tree, "src/**/*.py") + stdlib(tree, "src/**/*.pyc"), key=lambda p: p.split("/"))
+
+
+# ------------------------------
+# --max-depth
+# ------------------------------
+@pytest.mark.parametrize("depth", [0, 1, 2, 3])
+def test_max_depth_limits_double_star(tree, depth):
+    expected = [p for p in stdlib(tree, "**/*.py") if p.count("/") <= depth]
+    assert Walker(max_depth=depth, root=str(tree)).glob("**/*.py") == expected
+
+
+def test_cmd_glob_max_depth(tree, monkeypatch, capsys):
+    monkeypatch.chdir(tree)
+    cmd_glob(["--max-depth", "1", "**/*.py"])
+    assert capsys.readouterr().out.split() == ["b.py", "src/m.py"]
+    cmd_glob(["--max-depth=0", "**/*.py"])
+    assert capsys.readouterr().out.split() == ["b.py"]
+    cmd_glob(["--max-depth", "x", "*"])
+    assert "expects a number" in capsys.readouterr().out
+
+
+def test_expand_globs_keeps_unmatched_tokens(tree):
+    walker = Walker(root=str(tree))
+    assert expand_globs(["ls", "*.txt", "*.none", "plain"], walker) == ["ls", "a.txt", "*.none", "plain"]
@@ -0,0 +1,39 @@
+# test_metrics.py
+
+import pytest
+import metrics
+import resultcache
+from main import run_line
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(resultcache, "ENABLED", False)
+
+
+def errors(kind, name):
+    return metrics.COMMAND_ERRORS.value(kind=kind, command=name)
+
+
+@pytest.mark.parametrize("line, kind, name", [
+    ("cat missing", "command", "cat"),
+    ("cd missing", "command", "cd"),
+    ("cat missing && echo x", "builtin", "builtin"),
+    ("nosuchcommand", "nlp", "nlp"),
+])
+def test_failures_count_as_errors(tmp_path, line, kind, name):
+    before = errors(kind, name)
+    _, ok = run_line(line, str(tmp_path))
+    assert not ok
+    assert errors(kind, name) == before + 1
+
+
+def test_successes_do_not(tmp_path):
+    before = errors("command", "pwd")
+    assert run_line("pwd", str(tmp_path))[1]
+    assert errors("command", "pwd") == before
+
+
+def test_render_includes_the_counter(tmp_path):
+    run_line("cat missing", str(tmp_path))
+    assert 'pyterminal_command_errors_total{command="cat",kind="command"}' in metrics.render()
@@ -0,0 +1,136 @@
+# test_records.py
+
+import os
+import pytest
+from records import Records, as_lines, parse_condition, parse_number
+from shell_features import builtin_select, builtin_sort, builtin_where
+from main import run_line
+
+ROWS = [
+    {"name": "python", "pid": 30, "mem": 2.5},
+    {"name": "bash", "pid": 10, "mem": 0.5},
+    {"name": "nginx", "pid": 20, "mem": None},
+    {"name": "pytest", "pid": 40, "mem": 1.5},
+]
+
+
+@pytest.fixture
+def records():
+    return Records([dict(r) for r in ROWS], ["name", "pid", "mem"])
+
+
+def names(rows):
+    return [r["name"] for r in rows]
+
+
+def test_parse_number():
+    assert parse_number("12") == 12
+    assert parse_number("1.5") == 1.5
+    assert parse_number("2K") == 2048
+    assert parse_number("1m") == 1024 ** 2
+    with pytest.raises(ValueError):
+        parse_number("abc")
+
+
+# ------------------------------
+# where
+# ------------------------------
+@pytest.mark.parametrize("condition, expected", [
+    ("mem>1", ["python", "pytest"]),
+    ("mem>=1.5", ["python", "pytest"]),
+    ("mem<1", ["bash"]),
+    ("pid=20", ["nginx"]),
+    ("pid==20", ["nginx"]),
+    ("pid!=20", ["python", "bash", "pytest"]),
+    ("name~PY", ["python", "pytest"]),
+    ("name=bash", ["bash"]),
+    ("name>p", ["python", "pytest"]),
+])
+def test_where(records, condition, expected):
+    assert names(builtin_where([condition], records)) == expected
+
+
+def test_where_combines_conditions(records):
+    assert names(builtin_where(["name~py", "mem<2"], records)) == ["pytest"]
+
+
+def test_where_keeps_the_record_kind(records):
+    assert builtin_where(["pid>10"], records).columns == records.columns
+
+
+def test_where_rejects_bad_conditions_up_front(records, capsys):
+    assert builtin_where(["mem>abc"], records) == []
+    assert "where: 'abc' is not a number" in capsys.readouterr().out
+    assert builtin_where(["no operator"], records) == []
+    assert "bad condition" in capsys.readouterr().out
+
+
+def test_parse_condition_without_rows_compares_lazily():
+    _, predicate = parse_condition("size>abc")
+    assert predicate({"size": "zzz"}) is True
+    assert predicate({"size": 5}) is False
+    assert predicate({}) is False
+
+
+def test_where_needs_records(capsys):
+    assert builtin_where(["mem>1"], ["plain line"]) == []
+    assert "needs records" in capsys.readouterr().out
+
+
+# ------------------------------
+# select / sort -by
+# ------------------------------
+def test_select(records):
+    selected = builtin_select(["name,pid"], records)
+    assert selected.columns == ["name", "pid"]
+    assert selected[0] == {"name": "python", "pid": 30}
+    assert as_lines(selected) == ["NAME   PID", "python 30", "bash   10", "nginx  20", "pytest 40"]
+    assert builtin_select(["name", "missing"], records)[0] == {"name": "python", "missing": None}
+
+
+def test_sort_by(records):
+    assert names(builtin_sort(["-by", "pid"], records)) == ["bash", "nginx", "python", "pytest"]
+    assert names(builtin_sort(["-by", "pid", "-r"], records)) == ["pytest", "python", "nginx", "bash"]
+    # missing values sort last
+    assert names(builtin_sort(["-by", "mem"], records)) == ["bash", "pytest", "python", "nginx"]
+    # default: the first column
+    assert names(builtin_sort([], records)) == ["bash", "nginx", "pytest", "python"]
+
+
+def test_sort_by_several_columns():
+    rows = Records([{"a": 1, "b": 2}, {"a": 0, "b": 9}, {"a": 1, "b": 1}], ["a", "b"])
+    assert builtin_sort(["-by", "a,b"], rows) == [{"a": 0, "b": 9}, {"a": 1, "b": 1}, {"a": 1, "b": 2}]
+
+
+def test_sort_plain_lines():
+    assert builtin_sort([], ["b", "a", "c"]) == ["a", "b", "c"]
+    assert builtin_sort(["-r"], ["b", "a", "c"]) == ["c", "b", "a"]
+
+
+# ------------------------------
+# Whole pipelines
+# ------------------------------
+@pytest.fixture
+def sized(tmp_path):
+    for name, size in (("small", 1), ("medium", 100), ("large", 5000)):
+        (tmp_path / name).write_bytes(b"x" * size)
+    return tmp_path
+
+
+def test_pipeline_of_record_stages(sized):
+    output, ok = run_line("ls-l | where size>50 | sort -by size -r | select name,size", str(sized))
+    assert ok
+    assert output.splitlines() == ["NAME   SIZE", "large  5000", "medium 100"]
+
+
+def test_pipeline_redirect_renders_records(sized):
+    output, ok = run_line("ls-l | sort -by size | select name > out.txt", str(sized))
+    assert ok
+    with open(os.path.join(sized, "out.txt")) as f:
+        assert f.read().splitlines() == ["NAME", "small", "medium", "large"]
+
+
+def test_pipeline_bad_where(sized):
+    output, ok = run_line("ls-l | where size>big", str(sized))
+    assert not ok
+    assert output.startswith("where: 'big' is not a number")
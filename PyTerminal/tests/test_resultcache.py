@@ -0,0 +1,143 @@
+# test_resultcache.py
+
+import os
+import time
+import pytest
+import resultcache
+from resultcache import ResultCache, dependencies, run_cached
+
+OLD = time.time() - 3600
+
+
+def aged(path, when=OLD):
+    """Backdate `path` past the racy window so results depending on it are stored."""
+    os.utime(path, (when, when))
+    return str(path)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ResultCache(max_bytes=10_000)
+    monkeypatch.setattr(resultcache, "CACHE", cache)
+    monkeypatch.setattr(resultcache, "ENABLED", True)
+    return cache
+
+
+def test_hit_until_the_file_changes(tmp_path, cache):
+    (tmp_path / "f.txt").write_text("one")
+    path = aged(tmp_path / "f.txt")
+    key = cache.key("cat", [path], str(tmp_path))
+    cache.put(key, "one", [path], time.time())
+    assert cache.get(key) == "one"
+    assert cache.hits == 1
+
+    (tmp_path / "f.txt").write_text("three")
+    aged(path, OLD + 1)
+    assert cache.get(key) is None
+    assert (cache.stale, len(cache.entries)) == (1, 0)
+
+
+def test_same_size_rewrite_is_caught_by_mtime(tmp_path, cache):
+    f = tmp_path / "f.txt"
+    f.write_text("aaa")
+    path = aged(f)
+    key = cache.key("cat", [path], str(tmp_path))
+    cache.put(key, "aaa", [path], time.time())
+    f.write_text("bbb")
+    aged(path, OLD + 10)
+    assert cache.get(key) is None
+
+
+def test_replaced_and_deleted_files(tmp_path, cache):
+    f = tmp_path / "f.txt"
+    f.write_text("x")
+    path = aged(f)
+    key = cache.key("cat", [path], str(tmp_path))
+    cache.put(key, "x", [path], time.time())
+    f.unlink()
+    assert cache.get(key) is None
+    # a missing file is a valid dependency: stays cached until it appears
+    cache.put(key, "missing", [path], time.time())
+    assert cache.get(key) == "missing"
+    f.write_text("x")
+    assert cache.get(key) is None
+
+
+def test_recently_modified_files_are_not_stored(tmp_path, cache):
+    f = tmp_path / "fresh.txt"
+    f.write_text("x")
+    key = cache.key("cat", [str(f)], str(tmp_path))
+    cache.put(key, "x", [str(f)], time.time())
+    assert cache.get(key) is None
+    assert cache.skipped == 1
+
+
+def test_evicts_least_recently_used(tmp_path, cache):
+    cache.max_bytes = 3 * (1000 + 200)
+    keys = [cache.key("echo", [str(i)], str(tmp_path)) for i in range(4)]
+    for key in keys[:3]:
+        cache.put(key, "x" * 1000, [], time.time())
+    assert cache.get(keys[0]) is not None  # now the most recent
+    cache.put(keys[3], "x" * 1000, [], time.time())
+    assert cache.evictions == 1
+    assert cache.get(keys[1]) is None
+    assert all(cache.get(k) is not None for k in (keys[0], keys[2], keys[3]))
+    assert cache.size == sum(e[2] for e in cache.entries.values())
+
+
+def test_key_is_per_directory(tmp_path, cache):
+    assert cache.key("ls", [], str(tmp_path)) != cache.key("ls", [], str(tmp_path / "sub"))
+    link = tmp_path / "link"
+    link.symlink_to(tmp_path)
+    assert cache.key("ls", [], str(link)) == cache.key("ls", [], str(tmp_path))
+
+
+def test_run_cached_invalidates_on_new_directory_entry(tmp_path, cache, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a").write_text("a")
+    aged(tmp_path / "a")
+    aged(tmp_path)
+    calls = []
+
+    def run():
+        calls.append(1)
+        return " ".join(sorted(os.listdir(tmp_path))), True
+
+    assert run_cached("ls-l", [], run) == ("a", True)
+    assert run_cached("ls-l", [], run) == ("a", True)
+    assert len(calls) == 1
+
+    (tmp_path / "b").write_text("b")  # changes the directory's mtime
+    aged(tmp_path, OLD + 5)
+    assert run_cached("ls-l", [], run) == ("a b", True)
+    assert len(calls) == 2
+
+
+def test_run_cached_does_not_store_failures(tmp_path, cache, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    calls = []
+
+    def run():
+        calls.append(1)
+        return "cat: missing", False
+
+    assert run_cached("cat", ["missing"], run) == ("cat: missing", False)
+    assert run_cached("cat", ["missing"], run) == ("cat: missing", False)
+    assert len(calls) == 2 and not cache.entries
+
+
+def test_run_cached_disabled(cache, monkeypatch):
+    monkeypatch.setattr(resultcache, "ENABLED", False)
+    calls = []
+    run_cached("pwd", [], lambda: calls.append(1) or ("x", True))
+    run_cached("pwd", [], lambda: calls.append(1) or ("x", True))
+    assert len(calls) == 2
+    assert not cache.entries
+
+
+def test_dependencies(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "x").write_text("")
+    assert dependencies("cat", ["-n", "x"]) == [str(tmp_path / "x")]
+    assert dependencies("pwd", []) == []
+    assert set(dependencies("ls-l", [])) == {str(tmp_path), str(tmp_path / "x")}
@@ -0,0 +1,151 @@
+# test_sessions.py
+
+import os
+import asyncio
+import pytest
+import execpolicy
+import sessions
+from sessions import Scrollback, SessionStore
+
+
+@pytest.fixture
+def killed(monkeypatch):
+    calls = []
+    monkeypatch.setattr(execpolicy, "kill_session", calls.append)
+    return calls
+
+
+@pytest.fixture
+def store(killed):
+    store = SessionStore()
+    yield store
+    store.close_all()
+
+
+# ------------------------------
+# Scrollback
+# ------------------------------
+def test_scrollback_keeps_the_newest_bytes():
+    sb = Scrollback(limit=10)
+    for text in ("abc", "def", "ghi", "jkl"):
+        sb.append(text)
+    assert sb.text() == "defghijkl" and sb.size == 9
+    sb.append("0123456789abcdef")  # larger than the limit: its tail is kept
+    assert sb.text() == "6789abcdef"
+    sb.append("é" * 6)  # sizes are counted in UTF-8 bytes
+    assert sb.size <= 10 and sb.text().endswith("éé")
+
+
+def test_scrollback_spill_and_load():
+    sb = Scrollback()
+    sb.append("first\n")
+    sb.append("second\n")
+    sb.spill()
+    path = sb.spilled
+    assert os.path.exists(path) and sb.resident == 0 and sb.size == 13
+    sb.append("third\n")  # loads it back first
+    assert not os.path.exists(path) and sb.spilled is None
+    assert sb.text() == "first\nsecond\nthird\n"
+    sb.spill()
+    path = sb.spilled
+    sb.discard()
+    assert not os.path.exists(path) and sb.text() == ""
+
+
+# ------------------------------
+# Resume
+# ------------------------------
+def test_resume_issues_a_new_token(store):
+    session = store.create("ws1")
+    session.record("output\n")
+    session.add_history("ls")
+    old = session.token
+    store.detach(session, "ws1")
+    assert not session.attached
+
+    resumed, previous = store.resume(old, "ws2")
+    assert resumed is session and previous is None
+    assert session.token != old and session.connection == "ws2"
+    assert session.scrollback.text() == "output\n" and list(session.history) == ["ls"]
+    assert store.resume(old, "ws3") == (None, None)  # tokens are single use
+
+
+def test_resume_takes_over_a_live_connection(store):
+    session = store.create("ws1")
+    resumed, previous = store.resume(session.token, "ws2")
+    assert previous == "ws1"
+    store.detach(session, "ws1")  # the old connection closing later changes nothing
+    assert session.attached and session.connection == "ws2"
+
+
+def test_unknown_token(store):
+    assert store.resume("nope", "ws") == (None, None)
+
+
+def test_not_resumable(killed):
+    store = SessionStore(resumable=False)
+    session = store.create("ws1")
+    assert store.resume(session.token, "ws2") == (None, None)
+    store.detach(session, "ws1")
+    assert session.id not in store.sessions and killed == [session.id]
+
+
+# ------------------------------
+# Detached sessions: kill grace, spill, eviction
+# ------------------------------
+def test_commands_killed_after_the_grace(store, killed, monkeypatch):
+    monkeypatch.setattr(sessions, "KILL_AFTER", 0.05)
+
+    async def run():
+        kept = store.create("ws1")
+        left = store.create("ws2")
+        store.detach(kept, "ws1")
+        store.detach(left, "ws2")
+        store.resume(kept.token, "ws3")  # back within the grace
+        await asyncio.sleep(0.15)
+        return kept, left
+    kept, left = asyncio.run(run())
+    assert killed == [left.id]
+    assert left.id in store.sessions  # only its commands go; the session stays
+
+
+def test_reap(store, killed, monkeypatch):
+    monkeypatch.setattr(sessions, "KILL_AFTER", 10)
+    monkeypatch.setattr(sessions, "SPILL_AFTER", 100)
+    monkeypatch.setattr(sessions, "EVICT_AFTER", 1000)
+    attached = store.create("live")
+    fresh, idle, old = (store.create(f"ws{i}") for i in range(3))
+    for session in (fresh, idle, old):
+        session.record("scrollback\n")
+        store.detach(session, session.connection)
+    now = fresh.detached_at
+    idle.detached_at = now - 200
+    old.detached_at = now - 2000
+
+    store.reap(now)
+    assert set(store.sessions) == {attached.id, fresh.id, idle.id}
+    assert idle.scrollback.spilled and not fresh.scrollback.spilled
+    assert idle.id in killed and fresh.id not in killed
+    assert store.resume(old.token, "ws") == (None, None)
+    assert idle.scrollback.text() == "scrollback\n"  # loads back on resume
+
+
+def test_reap_capacity(store, monkeypatch):
+    monkeypatch.setattr(sessions, "MAX_DETACHED", 2)
+    detached = [store.create(f"ws{i}") for i in range(4)]
+    for i, session in enumerate(detached):
+        store.detach(session, session.connection)
+        session.detached_at = 100 + i
+    store.create("live")
+    store.reap(101)
+    # the sessions detached longest go first; attached ones never count
+    assert [s.id in store.sessions for s in detached] == [False, False, True, True]
+    assert len(store.sessions) == 3
+
+
+def test_describe(store):
+    session = store.create("ws")
+    session.record("x" * 100)
+    info = store.describe()[0]
+    assert info["id"] == session.id and info["attached"]
+    assert info["scrollback_bytes"] == 100 and info["detached_seconds"] is None
@@ -0,0 +1,142 @@
+# test_shellparse.py
+
+import os
+import pytest
+from pyterminal import captured_stdout
+from shell_features import execute
+from shellparse import ShellSyntaxError, Word, parse, plan_for, tokenize
+
+
+# ------------------------------
+# Tokenizer
+# ------------------------------
+def words(line):
+    return [t.text if isinstance(t, Word) else t for t in tokenize(line)]
+
+
+def test_quotes_and_escapes():
+    assert words("echo \"a b\" 'c d' e\\ f") == ["echo", "a b", "c d", "e f"]
+    assert words('echo "say \\"hi\\" \\\\ \\n"') == ["echo", 'say "hi" \\ \\n']
+
+
+def test_quoted_glob_characters_are_literal():
+    tokens = tokenize("ls *.py '*.txt' a\\*")
+    assert tokens[1].pattern == "*.py"
+    assert tokens[2].text == "*.txt" and tokens[2].pattern is None
+    assert tokens[3].text == "a*" and tokens[3].pattern is None
+    # mixed: the quoted star only matches itself
+    assert tokenize("'x*'*")[0].pattern == "x[*]*"
+
+
+def test_braces_mark_a_pattern():
+    assert tokenize("ls {a,b}.txt")[1].pattern == "{a,b}.txt"
+    assert tokenize("echo {a}")[1].pattern is None
+
+
+def test_operators_split_words_anywhere():
+    assert words("a|b&&c||d;e") == ["a", "|", "b", "&&", "c", "||", "d", ";", "e"]
+    assert words("echo 'a|b;c'") == ["echo", "a|b;c"]
+
+
+def test_redirects_split_words():
+    assert words("echo hi>out.txt") == ["echo", "hi", ">", "out.txt"]
+    assert words("cat<in>>out") == ["cat", "<", "in", ">>", "out"]
+    assert words("ls >out 2>>err <in") == ["ls", ">", "out", "2>>", "err", "<", "in"]
+    # 2> only names stderr at the start of a word, as in sh
+    assert words("echo a2>f") == ["echo", "a2", ">", "f"]
+    assert words("echo 'a>b' a\\>b") == ["echo", "a>b", "a>b"]
+
+
+def test_where_conditions_keep_comparisons():
+    assert words("where mem>1 size<=2") == ["where", "mem>1", "size<=2"]
+    assert words("ls-l | where size>5 > out|sort>x") == [
+        "ls-l", "|", "where", "size>5", ">", "out", "|", "sort", ">", "x"]
+
+
+def test_unclosed_quote():
+    with pytest.raises(ShellSyntaxError):
+        tokenize("echo 'open")
+    with pytest.raises(ShellSyntaxError):
+        tokenize('echo "open')
+
+
+# ------------------------------
+# Parser
+# ------------------------------
+def test_pipelines_and_connectors():
+    plan = parse("a x | b && c || d ; e | f | g")
+    assert [p.connector for p in plan.pipelines] == [None, "&&", "||", ";"]
+    assert [[c.name for c in p.commands] for p in plan.pipelines] == [
+        ["a", "b"], ["c"], ["d"], ["e", "f", "g"]]
+    assert plan.simple is None
+
+
+def test_simple_command():
+    plan = parse("ls -l src")
+    assert plan.simple is not None
+    assert plan.simple.argv() == ["ls", "-l", "src"]
+    assert parse("   ").empty
+
+
+def test_redirects():
+    command = parse("cat < in.txt 2>> err.log > a.txt >> b.txt").pipelines[0].commands[0]
+    assert [w.text for w in command.words] == ["cat"]
+    assert command.redirect(0).name == "in.txt"
+    err = command.redirect(2)
+    assert (err.name, err.append, err.mode) == ("err.log", True, "a")
+    out = command.redirect(1)  # the last one for a descriptor wins, as in sh
+    assert (out.name, out.append) == ("b.txt", True)
+
+
+@pytest.mark.parametrize("line", ["| ls", "ls | | wc", "ls && && b", "ls >", "ls 2>", "> out"])
+def test_syntax_errors(line):
+    with pytest.raises(ShellSyntaxError):
+        parse(line)
+
+
+def test_leading_and_trailing_semicolons():
+    for line in ("; ls", "ls ;", "ls ;; "):
+        plan = parse(line)
+        assert [p.connector for p in plan.pipelines] == [None]
+
+
+def test_plan_cache():
+    assert plan_for("cat x > y") is plan_for("cat x > y")
+
+
+# ------------------------------
+# Running plans: globs and redirects follow the cwd of the moment
+# ------------------------------
+@pytest.fixture
+def shell(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "s.txt").write_text("s\n")
+    (tmp_path / "a.txt").write_text("a\n")
+
+    def run(line):
+        with captured_stdout() as out:
+            ok = execute(plan_for(line))
+        return out.getvalue().splitlines(), ok
+    return run
+
+
+def test_globs_see_files_made_by_earlier_pipelines(shell):
+    assert shell("echo *.txt; touch b.txt; echo *.txt")[0] == ["a.txt", "a.txt b.txt"]
+
+
+def test_globs_and_redirects_after_cd(shell, tmp_path):
+    assert shell("cd sub && echo *.txt")[0] == ["s.txt"]
+    os.chdir(tmp_path)
+    shell("cd sub && echo x>out.txt")
+    assert (tmp_path / "sub" / "out.txt").read_text() == "x\n"
+    assert not (tmp_path / "out.txt").exists()
+
+
+def test_builtin_errors_go_to_stderr_and_fail_the_stage(shell, tmp_path):
+    output, ok = shell("cat missing.txt 2> err.txt")
+    assert not ok and output == []
+    assert "missing.txt" in (tmp_path / "err.txt").read_text()
+    assert shell("cat nope.txt || echo fallback") == (["cat: [Errno 2] No such file or directory: "
+                                                     f"'{tmp_path / 'nope.txt'}'", "fallback"], True)
+    assert shell("echo x | grep '(' && echo no")[1] is False
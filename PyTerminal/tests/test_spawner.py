@@ -0,0 +1,115 @@
+# test_spawner.py
+
+import os
+import sys
+import subprocess
+import pytest
+import spawner
+from spawner import Coprocess, ShellPool, _seconds
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="POSIX only")
+
+
+@pytest.fixture
+def shell():
+    sh = Coprocess()
+    yield sh
+    sh.close()
+
+
+# ------------------------------
+# Warm shell: sentinels
+# ------------------------------
+def test_status_stdout_and_stderr(shell, tmp_path):
+    assert shell.run("echo out; echo err >&2; exit 7", str(tmp_path)) == (7, "out\n", "err\n")
+    assert shell.alive  # exit only left the subshell
+    assert shell.run("true", str(tmp_path)) == (0, "", "")
+
+
+def test_output_without_newline_or_looking_like_a_sentinel(shell, tmp_path):
+    assert shell.run("printf partial", str(tmp_path)) == (0, "partial", "")
+    fake = "printf '\\n__PYT_0000000000000000_0__\\n'; printf '\\n__PYT_0000000000000000__\\n' >&2"
+    status, out, err = shell.run(fake + "; exit 3", str(tmp_path))
+    assert status == 3
+    assert out == "\n__PYT_0000000000000000_0__\n"
+    assert err == "\n__PYT_0000000000000000__\n"
+
+
+def test_large_output(shell, tmp_path):
+    status, out, _ = shell.run("seq 1 200000", str(tmp_path))
+    assert status == 0 and out.splitlines()[-1] == "200000"
+
+
+def test_stdin_is_not_the_command_stream(shell, tmp_path):
+    # a command reading stdin must not swallow the sentinel lines
+    assert shell.run("cat", str(tmp_path)) == (0, "", "")
+    assert shell.run("echo still here", str(tmp_path)) == (0, "still here\n", "")
+
+
+# ------------------------------
+# Warm shell: every command starts clean
+# ------------------------------
+def test_cwd_per_command(shell, tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    assert shell.run("pwd", str(tmp_path / "a"))[1] == f"{tmp_path / 'a'}\n"
+    assert shell.run("cd ..; pwd", str(tmp_path / "a"))[1] == f"{tmp_path}\n"
+    # neither cd nor variables leak into the next command
+    shell.run("cd /; X=1; export Y=2", str(tmp_path / "a"))
+    assert shell.run('pwd; echo "[$X$Y]"', str(tmp_path / "b"))[1] == f"{tmp_path / 'b'}\n[]\n"
+
+
+def test_missing_cwd(shell, tmp_path):
+    status, out, err = shell.run("echo never", str(tmp_path / "gone"))
+    assert status != 0 and out == "" and err
+
+
+def test_timeout_retires_the_shell(tmp_path):
+    sh = Coprocess()
+    with pytest.raises(subprocess.TimeoutExpired):
+        sh.run("sleep 5", str(tmp_path), timeout=0.2)
+    assert not sh.alive
+    sh.close()
+
+
+def test_cpu_time_per_command(shell, tmp_path):
+    shell.run(f"{sys.executable} -c 'sum(range(3000000))'", str(tmp_path))
+    assert shell.cpu_time > 0
+    shell.run("true", str(tmp_path))
+    assert shell.cpu_time < 0.05
+
+
+def test_seconds():
+    assert _seconds(b"0m0.810000s 0m0.020000s") == pytest.approx(0.83)
+    assert _seconds(b"1m2.5s 0m0.5s") == pytest.approx(63.0)
+
+
+# ------------------------------
+# Pool
+# ------------------------------
+def test_pool_reuses_shells_per_rlimits(tmp_path):
+    pool = ShellPool(size=1)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    other = pool.acquire([(0, (100, 100))])  # different limits: a new shell
+    assert other is not first
+    pool.release(first)
+    pool.release(other)  # pool full: closed
+    assert not other.alive
+    first.close()
+
+
+# ------------------------------
+# Spawn helper
+# ------------------------------
+@pytest.mark.skipif(not spawner.ENABLED, reason="spawn helper unavailable")
+def test_helper_spawn(tmp_path):
+    if not spawner.start():
+        pytest.skip("spawn helper did not start")
+    proc = spawner.spawn(["sh", "-c", "pwd; cat; echo err >&2; exit 4"], stdin=True, cwd=str(tmp_path))
+    out, err = proc.communicate(input="fed\n", timeout=10)
+    assert (proc.returncode, out, err) == (4, f"{tmp_path}\nfed\n", "err\n")
+    assert proc.cpu_time is not None
+    with pytest.raises(OSError):
+        spawner.spawn(["/nonexistent/binary"])
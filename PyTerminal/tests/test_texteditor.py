@@ -0,0 +1,117 @@
+# test_texteditor.py
+
+import os
+import stat
+import pytest
+from texteditor import cmd_write, discard_write, editor_sessions, handle_write_command
+
+SESSION = "test-write"
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    yield tmp_path
+    discard_write(SESSION)
+    editor_sessions.pop(SESSION, None)
+
+
+def write(name, lines, append=False):
+    cmd_write((["-a"] if append else []) + [name], session_id=SESSION)
+    for line in lines:
+        assert handle_write_command(SESSION, line) in ("", None)
+    return handle_write_command(SESSION, ".")
+
+
+def leftovers(directory):
+    return [n for n in os.listdir(directory) if n.endswith(".tmp")]
+
+
+def test_new_file(workdir):
+    assert write("new.txt", ["one", "two"]).endswith("saved successfully.")
+    assert (workdir / "new.txt").read_text() == "one\ntwo\n"
+    umask = os.umask(0)
+    os.umask(umask)
+    assert stat.S_IMODE(os.stat(workdir / "new.txt").st_mode) == 0o666 & ~umask
+    assert leftovers(workdir) == []
+
+
+def test_overwrite_is_atomic_and_keeps_the_mode(workdir):
+    path = workdir / "f.txt"
+    path.write_text("old\n")
+    os.chmod(path, 0o640)
+    before = os.stat(path).st_ino
+    cmd_write(["f.txt"], session_id=SESSION)
+    handle_write_command(SESSION, "new")
+    # nothing reaches the file before the final '.'
+    assert path.read_text() == "old\n"
+    handle_write_command(SESSION, ".")
+    assert path.read_text() == "new\n"
+    st = os.stat(path)
+    assert stat.S_IMODE(st.st_mode) == 0o640
+    assert st.st_ino != before  # renamed into place
+    assert leftovers(workdir) == []
+
+
+def test_symlink_is_written_through(workdir):
+    (workdir / "real").mkdir()
+    target = workdir / "real" / "target.txt"
+    target.write_text("old\n")
+    os.chmod(target, 0o600)
+    link = workdir / "link.txt"
+    link.symlink_to(target)
+
+    write("link.txt", ["new"])
+    assert link.is_symlink()
+    assert os.readlink(link) == str(target)
+    assert target.read_text() == "new\n"
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o600
+    # the temp file was made next to the target, and is gone
+    assert leftovers(workdir) == [] and leftovers(workdir / "real") == []
+
+
+def test_dangling_symlink_creates_its_target(workdir):
+    link = workdir / "link.txt"
+    link.symlink_to(workdir / "created.txt")
+    write("link.txt", ["hello"])
+    assert link.is_symlink()
+    assert (workdir / "created.txt").read_text() == "hello\n"
+
+
+def test_hard_links_keep_sharing_content(workdir):
+    first, second = workdir / "a.txt", workdir / "b.txt"
+    first.write_text("old\n")
+    os.link(first, second)
+    write("a.txt", ["new", "text"])
+    assert second.read_text() == "new\ntext\n"
+    assert os.stat(first).st_ino == os.stat(second).st_ino
+    assert leftovers(workdir) == []
+
+
+def test_append(workdir):
+    path = workdir / "log.txt"
+    path.write_text("first\n")
+    write("log.txt", ["second"], append=True)
+    assert path.read_text() == "first\n\nsecond\n"
+    write("fresh.txt", ["only"], append=True)
+    assert (workdir / "fresh.txt").read_text() == "only\n"
+
+
+def test_cancel_leaves_the_file_alone(workdir):
+    path = workdir / "keep.txt"
+    path.write_text("keep\n")
+    cmd_write(["keep.txt"], session_id=SESSION)
+    handle_write_command(SESSION, "lost")
+    assert leftovers(workdir)
+    discard_write(SESSION)
+    assert path.read_text() == "keep\n"
+    assert leftovers(workdir) == []
+    assert not editor_sessions[SESSION]["active"]
+
+
+def test_missing_directory(workdir):
+    # reported on the first line, naming the file rather than the temp file
+    cmd_write(["nope/f.txt"], session_id=SESSION)
+    result = handle_write_command(SESSION, "x")
+    assert result.startswith("write: ") and result.endswith("nope/f.txt'")
+    assert not editor_sessions[SESSION]["active"]
@@ -0,0 +1,188 @@
+# test_transfer.py
+
+import os
+import asyncio
+import hashlib
+import pytest
+import transfer
+from transfer import HEADER, TransferChannel, Upload, frame, parse_control, unframe
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def ops(messages):
+    return [(m["op"], m.get("offset")) for m in map(parse_control, messages)]
+
+
+# ------------------------------
+# Framing
+# ------------------------------
+def test_frame_round_trip():
+    offset, payload = unframe(frame(12345, b"data"))
+    assert (offset, bytes(payload)) == (12345, b"data")
+    damaged = bytearray(frame(0, b"data"))
+    damaged[-1] ^= 1
+    with pytest.raises(ValueError):
+        unframe(bytes(damaged))
+    with pytest.raises(ValueError):
+        unframe(b"\0" * (HEADER.size - 1))
+
+
+def test_parse_control():
+    assert parse_control(transfer.control("ack", offset=3)) == {"op": "ack", "offset": 3}
+    assert parse_control("ls -l") is None
+    assert parse_control(transfer.PREFIX + "[1]") is None
+
+
+def test_file_sha256(tmp_path):
+    data = os.urandom(3 * transfer.HASH_BLOCK + 17)
+    (tmp_path / "f").write_bytes(data)
+    assert transfer.file_sha256(str(tmp_path / "f")) == sha256(data)
+    assert transfer.file_sha256(str(tmp_path / "f"), 1000) == sha256(data[:1000])
+
+
+# ------------------------------
+# Upload: receiving, committing, resuming
+# ------------------------------
+DATA = bytes(range(256)) * 100  # 25600 bytes
+CHUNK = 4096
+
+
+def chunks(data, start=0):
+    return [frame(pos, data[pos:pos + CHUNK]) for pos in range(start, len(data), CHUNK)]
+
+
+def test_receive_and_commit(tmp_path):
+    target = str(tmp_path / "up.bin")
+    upload = Upload(target, len(DATA), sha256(DATA), chunk=CHUNK, window=4)
+    assert ops([upload.start()]) == [("ready", 0)]
+    replies = [reply for data in chunks(DATA) for reply in upload.receive(data)]
+    # an ack every window/2 chunks, and one for the last chunk
+    assert ops(replies) == [("ack", 8192), ("ack", 16384), ("ack", 24576), ("ack", len(DATA))]
+    assert upload.complete
+    done = parse_control(upload.commit())
+    assert done == {"op": "done", "path": target, "size": len(DATA), "sha256": sha256(DATA)}
+    assert open(target, "rb").read() == DATA
+    assert not os.path.exists(upload.part)
+
+
+def test_damaged_lost_and_repeated_chunks(tmp_path):
+    upload = Upload(str(tmp_path / "up.bin"), len(DATA), sha256(DATA), chunk=CHUNK)
+    upload.start()
+    first, second, third = chunks(DATA)[:3]
+    upload.receive(first)
+    damaged = bytearray(second)
+    damaged[-1] ^= 1
+    assert ops(upload.receive(bytes(damaged))) == [("nack", CHUNK)]
+    assert ops(upload.receive(third)) == [("nack", CHUNK)]  # second chunk was lost
+    assert upload.receive(first) == []                       # already have it
+    upload.receive(second)
+    assert upload.offset == 2 * CHUNK
+    too_much = frame(upload.offset, b"x" * len(DATA))
+    assert ops(upload.receive(too_much)) == [("error", None)]
+    upload.close()
+
+
+def test_resume_from_part_file(tmp_path):
+    target = str(tmp_path / "up.bin")
+    first = Upload(target, len(DATA), sha256(DATA), chunk=CHUNK)
+    first.start()
+    for data in chunks(DATA)[:3]:
+        first.receive(data)
+    first.close()  # connection lost
+    assert os.path.getsize(first.part) == 3 * CHUNK
+
+    again = Upload(target, len(DATA), sha256(DATA), chunk=CHUNK)
+    assert again.part == first.part
+    assert ops([again.start()]) == [("ready", 3 * CHUNK)]
+    for data in chunks(DATA, 3 * CHUNK):
+        again.receive(data)
+    again.commit()
+    assert open(target, "rb").read() == DATA
+
+
+def test_other_content_does_not_resume(tmp_path):
+    target = str(tmp_path / "up.bin")
+    first = Upload(target, len(DATA), sha256(DATA), chunk=CHUNK)
+    first.start()
+    first.receive(chunks(DATA)[0])
+    first.close()
+    other = DATA[::-1]
+    assert ops([Upload(target, len(other), sha256(other)).start()]) == [("ready", 0)]
+
+
+def test_checksum_mismatch(tmp_path):
+    target = tmp_path / "up.bin"
+    upload = Upload(str(target), len(DATA), sha256(b"something else"), chunk=CHUNK)
+    upload.start()
+    for data in chunks(DATA):
+        upload.receive(data)
+    with pytest.raises(ValueError, match="sha256 mismatch"):
+        upload.commit()
+    assert not target.exists() and not os.path.exists(upload.part)
+
+
+def test_upload_needs_a_digest(tmp_path):
+    with pytest.raises(ValueError):
+        Upload(str(tmp_path / "up.bin"), 1, "abc").start()
+
+
+# ------------------------------
+# Client and server channel, end to end
+# ------------------------------
+class Link:
+    """The client's end of an in-memory WebSocket to a TransferChannel."""
+
+    def __init__(self):
+        self.inbox = asyncio.Queue()
+        self.channel = TransferChannel(self._reply, self._reply)
+
+    async def _reply(self, message):
+        await self.inbox.put(message)
+
+    async def send(self, message):
+        if isinstance(message, str):
+            await self.channel.handle_control(parse_control(message))
+        else:
+            await self.channel.handle_binary(message)
+
+    async def recv(self):
+        return await self.inbox.get()
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_upload_and_download(workdir):
+    data = os.urandom(300_000)
+    (workdir / "local.bin").write_bytes(data)
+
+    async def run():
+        link = Link()
+        await transfer.upload(link, "local.bin", "remote.bin", chunk=8192, window=4)
+        await transfer.download(link, "remote.bin", "copy.bin", chunk=8192, window=4)
+    asyncio.run(run())
+    assert (workdir / "remote.bin").read_bytes() == data
+    assert (workdir / "copy.bin").read_bytes() == data
+
+
+def test_download_resumes_from_part(workdir):
+    data = os.urandom(100_000)
+    (workdir / "remote.bin").write_bytes(data)
+    (workdir / "copy.bin.part").write_bytes(data[:40_000])
+    asyncio.run(transfer.download(Link(), "remote.bin", "copy.bin", chunk=8192))
+    assert (workdir / "copy.bin").read_bytes() == data
+
+
+def test_download_errors(workdir):
+    (workdir / "small.bin").write_bytes(b"abc")
+    (workdir / "copy.bin.part").write_bytes(b"abcdef")
+    with pytest.raises(RuntimeError, match="past the end"):
+        asyncio.run(transfer.download(Link(), "small.bin", "copy.bin"))
+    with pytest.raises(RuntimeError, match="not a regular file"):
+        asyncio.run(transfer.download(Link(), "missing.bin", "other.bin"))
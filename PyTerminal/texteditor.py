@@ -1,19 +1,22 @@
 import os
+import shutil
+import tempfile
+from pyterminal import safe_print, abspath
+
+# Write sessions stream into a temp file beside the target: buffered writes,
+# one fsync per FSYNC_BYTES instead of per line, committed on '.'
+WRITE_BUFFER = 64 * 1024
+FSYNC_BYTES = 4 * 1024 * 1024
 
 # ------------------------------
 # Editor sessions storage
 # ------------------------------
 editor_sessions = {}  # session_id -> session dict
 
-def abspath(path):
-    return os.path.abspath(os.path.expanduser(path))
-
 # ------------------------------
 # Edit command (existing)
 # ------------------------------
 def cmd_edit(args, session_id="local"):
-    from pyterminal import safe_print
-
     if not args:
         safe_print("edit: missing filename")
         return "edit: missing filename"
@@ -44,8 +47,6 @@ def cmd_edit(args, session_id="local"):
 
 
 def handle_edit_command(session_id, cmd, input_line=None):
-    from pyterminal import safe_print
-
     if session_id not in editor_sessions or not editor_sessions[session_id]["active"]:
         return "No active editor session. Use: edit <filename>"
 
@@ -124,7 +125,7 @@ def cmd_write(args, session_id=None):
     Usage:
         write filename.txt         # overwrite
         write -a filename.txt      # append
-    End input with a single '.' on a line.
+    End input with a single '.' on a line, Ctrl+C discards the input.
     """
     if not args:
         return "write: missing filename"
@@ -138,37 +139,136 @@ def cmd_write(args, session_id=None):
     else:
         filename = abspath(args[0])
 
+    discard_write(session_id)  # a session left open is abandoned
     editor_sessions[session_id] = {
         "type": "write",
         "active": True,
-        "buffer": [],
         "filename": filename,
-        "append": append
+        "append": append,
+        "tmp": None,        # temp file object, created with the first line
+        "tmp_path": None,
+        "unsynced": 0,      # bytes written since the last fsync
     }
 
     return f"{'Appending to' if append else 'Writing to'} {filename}. End with a single '.' on a line."
 
+def _open_temp(session):
+    filename = session["filename"]
+    # beside the file a symlink points to: that is the file os.replace swaps
+    target = os.path.realpath(filename)
+    try:
+        fd, path = tempfile.mkstemp(dir=os.path.dirname(target),
+                                    prefix=f".{os.path.basename(target)}.", suffix=".tmp")
+    except OSError as e:  # report the target, not the temp name
+        raise OSError(e.errno, e.strerror, filename) from None
+    session["tmp_path"] = path
+    session["tmp"] = os.fdopen(fd, "w", encoding="utf-8", newline="\n", buffering=WRITE_BUFFER)
+
+def _sync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _commit(session):
+    # write through symlinks, like open(filename, "w") did
+    filename = os.path.realpath(session["filename"])
+    tmp = session["tmp"]
+    if tmp is None:  # '.' right away: an empty line, as before
+        _open_temp(session)
+        tmp = session["tmp"]
+        tmp.write("\n")
+    _sync(tmp)
+    if session["append"]:
+        # one append of the whole input, copied from the temp file
+        with open(filename, "ab") as out:
+            if out.tell() > 0:
+                out.write(b"\n")
+            with open(session["tmp_path"], "rb") as src:
+                shutil.copyfileobj(src, out, 1 << 20)
+            _sync(out)
+        tmp.close()
+        os.remove(session["tmp_path"])
+    else:
+        try:
+            st = os.stat(filename)
+        except FileNotFoundError:
+            st = None
+        if st is not None and st.st_nlink > 1:
+            # a rename would split the hard links: rewrite in place instead
+            with open(filename, "r+b") as out, open(session["tmp_path"], "rb") as src:
+                out.truncate(0)
+                shutil.copyfileobj(src, out, 1 << 20)
+                _sync(out)
+            tmp.close()
+            os.remove(session["tmp_path"])
+            session["tmp"] = session["tmp_path"] = None
+            return
+        # mkstemp creates 0600 owned by us: keep the mode (and owner, when
+        # allowed) of the file being replaced
+        if st is not None:
+            mode = st.st_mode & 0o7777
+            if hasattr(os, "chown"):
+                try:
+                    os.chown(tmp.fileno(), st.st_uid, st.st_gid)
+                except OSError:
+                    pass
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp.fileno(), mode)
+        tmp.close()
+        os.replace(session["tmp_path"], filename)
+        _fsync_dir(filename)
+    session["tmp"] = session["tmp_path"] = None
+
+def discard_write(session_id):
+    """Drop a write session's input, e.g. on Ctrl+C or disconnect."""
+    session = editor_sessions.get(session_id)
+    if not session or session.get("type") != "write":
+        return
+    session["active"] = False
+    if session.get("tmp") is not None:
+        session["tmp"].close()
+        try:
+            os.remove(session["tmp_path"])
+        except OSError:
+            pass
+        session["tmp"] = session["tmp_path"] = None
+
 def handle_write_command(session_id, line):
     """
     Handle a line typed in a write session.
     """
     session = editor_sessions[session_id]
 
-    if line.strip() == ".":
-        # Save file
-        mode = "a" if session.get("append") else "w"
-        try:
-            with open(session["filename"], mode, encoding="utf-8") as f:
-                if session.get("append") and os.path.getsize(session["filename"]) > 0:
-                    f.write("\n")
-                f.write("\n".join(session["buffer"]) + "\n")
-        except Exception as e:
+    try:
+        if line.strip() == ".":
+            # Save file
+            _commit(session)
             session["active"] = False
-            return f"write: {e}"
-
-        session["active"] = False
-        return f"{session['filename']} saved successfully."
+            return f"{session['filename']} saved successfully."
 
-    # Otherwise append line to buffer
-    session["buffer"].append(line)
+        # Otherwise stream the line to the temp file
+        if session["tmp"] is None:
+            _open_temp(session)
+        session["tmp"].write(line + "\n")
+        session["unsynced"] += len(line) + 1
+        if session["unsynced"] >= FSYNC_BYTES:
+            _sync(session["tmp"])
+            session["unsynced"] = 0
+    except Exception as e:
+        discard_write(session_id)
+        return f"write: {e}"
     return ""  # no output yet
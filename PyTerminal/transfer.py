@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+# transfer.py
+"""
+Chunked, resumable file transfer over the terminal WebSocket.
+
+Control messages are text frames "__XFER__" + JSON; file data travels in
+binary frames of HEADER (offset, crc32 of the payload) + payload.
+
+Download (server -> client):
+    C: {"op": "download", "path": p, "offset": o, "chunk": n, "window": w}
+    S: {"op": "meta", "path": abs, "size": N, "offset": o, "chunk": n}
+    S: binary chunks, at most `window` ahead of the last ack
+    C: {"op": "ack", "offset": x}     every chunk written up to x
+    C: {"op": "nack", "offset": x}    bad chunk: resend from x
+    S: {"op": "done", "size": N, "sha256": hex}
+Upload (client -> server):
+    C: {"op": "upload", "path": p, "size": N, "sha256": hex, "chunk": n, "window": w}
+    S: {"op": "ready", "offset": o}   resume point of an earlier attempt
+    C: binary chunks from o on
+    S: ack / nack as above
+    S: {"op": "done", "path": abs, "size": N, "sha256": hex}
+Either side: {"op": "cancel"}; the server answers errors with {"op": "error"}.
+
+An interrupted upload keeps a .part file beside the target, named after the
+file's sha256, so repeating the upload resumes from its confirmed size.
+A download resumes by asking for the offset the client already has.
+
+Client usage:
+    python transfer.py download ws://localhost:8000 remote.bin [local.bin]
+    python transfer.py upload ws://localhost:8000 local.bin [remote.bin]
+"""
+
+import os
+import sys
+import json
+import zlib
+import struct
+import asyncio
+import hashlib
+
+PREFIX = "__XFER__"
+HEADER = struct.Struct(">QI")  # offset, crc32
+CHUNK_SIZE = 256 * 1024
+MAX_CHUNK = 4 * 1024 * 1024
+# largest WebSocket message the server must accept (websockets defaults to 1 MiB)
+MAX_MESSAGE = HEADER.size + MAX_CHUNK
+WINDOW = 8
+HASH_BLOCK = 1 << 20
+
+
+def control(op, **fields):
+    return PREFIX + json.dumps(dict(op=op, **fields))
+
+
+def parse_control(text):
+    """The JSON of a control message, or None if `text` isn't one."""
+    if not text.startswith(PREFIX):
+        return None
+    try:
+        msg = json.loads(text[len(PREFIX):])
+    except ValueError:
+        return None
+    return msg if isinstance(msg, dict) else None
+
+
+def frame(offset, payload):
+    return HEADER.pack(offset, zlib.crc32(payload)) + payload
+
+
+def frame_into(view, offset, n):
+    """
+    Frame the n payload bytes already at view[HEADER.size:] in place: the
+    header is packed in front of them, nothing is copied.
+    """
+    end = HEADER.size + n
+    HEADER.pack_into(view, 0, offset, zlib.crc32(view[HEADER.size:end]))
+    return view[:end]
+
+
+def _read_at(f, offset, view):
+    f.seek(offset)
+    return f.readinto(view)
+
+
+def unframe(data):
+    """(offset, payload) of a binary chunk; ValueError if it is damaged."""
+    if len(data) < HEADER.size:
+        raise ValueError("short chunk")
+    offset, crc = HEADER.unpack_from(data)
+    payload = memoryview(data)[HEADER.size:]
+    if zlib.crc32(payload) != crc:
+        raise ValueError(f"checksum mismatch at offset {offset}")
+    return offset, payload
+
+
+def file_sha256(path, end=None):
+    """sha256 of the first `end` bytes of a file (all of it by default)."""
+    h = hashlib.sha256()
+    buf = bytearray(HASH_BLOCK)
+    view = memoryview(buf)
+    remaining = end
+    with open(path, "rb", buffering=0) as f:
+        while remaining is None or remaining > 0:
+            n = f.readinto(view if remaining is None else view[:min(HASH_BLOCK, remaining)])
+            if not n:
+                break
+            h.update(view[:n])
+            if remaining is not None:
+                remaining -= n
+    return h.hexdigest()
+
+
+def _chunk_size(value):
+    try:
+        return max(4096, min(int(value or CHUNK_SIZE), MAX_CHUNK))
+    except (TypeError, ValueError):
+        return CHUNK_SIZE
+
+
+def _window(value):
+    try:
+        return max(1, min(int(value or WINDOW), 64))
+    except (TypeError, ValueError):
+        return WINDOW
+
+
+# ------------------------------
+# Server side: sending a file
+# ------------------------------
+class Download:
+    def __init__(self, path, offset=0, chunk=None, window=None):
+        self.path = path
+        self.chunk = _chunk_size(chunk)
+        self.window = _window(window)
+        self.acked = self.next = int(offset or 0)
+        self._changed = asyncio.Event()
+
+    def on_ack(self, offset):
+        self.acked = max(self.acked, int(offset))
+        self._changed.set()
+
+    def on_nack(self, offset):
+        # go back to the first chunk the client is missing
+        self.acked = self.next = min(self.next, max(self.acked, int(offset)))
+        self._changed.set()
+
+    async def run(self, send, send_bytes):
+        # file I/O goes to worker threads; the event loop serves every session
+        f = await asyncio.to_thread(open, self.path, "rb", buffering=0)
+        read = None
+        try:
+            size = os.fstat(f.fileno()).st_size
+            if self.next > size:
+                await send(control("error", message=f"offset {self.next} is past the end ({size} bytes)"))
+                return
+            await send(control("meta", path=self.path, size=size, offset=self.next, chunk=self.chunk))
+            # one reusable buffer, header in front of the payload: chunks are
+            # read and framed in place (the transport copies what it can't
+            # send at once, so the buffer is free again after the await)
+            view = memoryview(bytearray(HEADER.size + self.chunk))
+            payload = view[HEADER.size:]
+            while self.acked < size:
+                if self.next < size and self.next - self.acked < self.window * self.chunk:
+                    read = asyncio.ensure_future(asyncio.to_thread(
+                        _read_at, f, self.next, payload[:min(self.chunk, size - self.next)]))
+                    n = await asyncio.shield(read)
+                    if not n:
+                        break  # the file shrank under us
+                    await send_bytes(frame_into(view, self.next, n))
+                    self.next += n
+                    continue
+                self._changed.clear()
+                await self._changed.wait()
+            # whole-file checksum: hashed off the event loop
+            digest = await asyncio.to_thread(file_sha256, self.path, size)
+            await send(control("done", size=size, sha256=digest))
+        finally:
+            if read is not None and not read.done():
+                read.add_done_callback(lambda _: f.close())  # cancelled mid-read
+            else:
+                f.close()
+
+
+# ------------------------------
+# Server side: receiving a file
+# ------------------------------
+class Upload:
+    def __init__(self, path, size, sha256, chunk=None, window=None):
+        self.path = path
+        self.size = int(size)
+        self.sha256 = str(sha256).lower()
+        self.chunk = _chunk_size(chunk)
+        self.window = _window(window)
+        directory, name = os.path.split(path)
+        self.part = os.path.join(directory, f".{name}.{self.sha256[:16]}.part")
+        self.f = None
+        self.offset = 0
+        self._since_ack = 0
+
+    def start(self):
+        """Open (or reopen) the .part file; returns the 'ready' message."""
+        if len(self.sha256) != 64:
+            raise ValueError("upload needs the sha256 of the whole file")
+        self.f = open(self.part, "ab", buffering=0)
+        self.offset = min(self.f.tell(), self.size)
+        self.f.truncate(self.offset)
+        return control("ready", offset=self.offset, chunk=self.chunk, window=self.window)
+
+    def receive(self, data):
+        """Write one binary chunk; returns the control messages to send back."""
+        try:
+            offset, payload = unframe(data)
+        except ValueError:
+            return [control("nack", offset=self.offset)]
+        if offset != self.offset:  # lost or repeated chunk: ignore, ask again
+            return [control("nack", offset=self.offset)] if offset > self.offset else []
+        if self.offset + len(payload) > self.size:
+            return [control("error", message="more data than the announced size")]
+        self.f.write(payload)
+        self.offset += len(payload)
+        self._since_ack += 1
+        if self.offset < self.size:
+            if self._since_ack >= max(1, self.window // 2):
+                self._since_ack = 0
+                return [control("ack", offset=self.offset)]
+            return []
+        return [control("ack", offset=self.offset)]
+
+    @property
+    def complete(self):
+        return self.offset >= self.size
+
+    def commit(self):
+        """Verify the whole file and move it into place; returns the 'done' message."""
+        os.fsync(self.f.fileno())
+        self.f.close()
+        digest = file_sha256(self.part)
+        if digest != self.sha256:
+            os.remove(self.part)
+            raise ValueError(f"sha256 mismatch: got {digest}, expected {self.sha256}")
+        os.replace(self.part, self.path)
+        return control("done", path=self.path, size=self.size, sha256=digest)
+
+    def close(self):
+        """Stop receiving; the .part file stays for a later resume."""
+        if self.f is not None and not self.f.closed:
+            self.f.close()
+
+
+# ------------------------------
+# Per-session channel used by ws_handler
+# ------------------------------
+class TransferChannel:
+    """One transfer at a time per WebSocket session."""
+
+    def __init__(self, send, send_bytes):
+        self.send = send
+        self.send_bytes = send_bytes
+        self.download = None
+        self.download_task = None
+        self.upload = None
+
+    @property
+    def active(self):
+        return self.upload is not None or (self.download_task is not None
+                                            and not self.download_task.done())
+
+    async def handle_control(self, msg):
+        from pyterminal import abspath
+        op = msg.get("op")
+        try:
+            if op == "download":
+                if self.active:
+                    raise ValueError("a transfer is already running")
+                path = abspath(str(msg.get("path", "")))
+                if not os.path.isfile(path):
+                    raise ValueError(f"{path}: not a regular file")
+                self.download = Download(path, msg.get("offset"), msg.get("chunk"), msg.get("window"))
+                self.download_task = asyncio.create_task(self._run_download(self.download))
+            elif op == "upload":
+                if self.active:
+                    raise ValueError("a transfer is already running")
+                path = abspath(str(msg.get("path", "")))
+                if os.path.isdir(path):
+                    raise ValueError(f"{path}: is a directory")
+                upload = Upload(path, msg.get("size", 0), msg.get("sha256", ""),
+                                msg.get("chunk"), msg.get("window"))
+                ready = await asyncio.to_thread(upload.start)
+                self.upload = upload
+                await self.send(ready)
+                if upload.complete:
+                    await self._commit()
+            elif op == "ack" and self.download is not None:
+                self.download.on_ack(msg.get("offset", 0))
+            elif op == "nack" and self.download is not None:
+                self.download.on_nack(msg.get("offset", 0))
+            elif op == "cancel":
+                self.cancel()
+                await self.send(control("cancelled"))
+        except (OSError, ValueError, TypeError) as e:
+            await self.send(control("error", message=str(e)))
+
+    async def handle_binary(self, data):
+        if self.upload is None:
+            await self.send(control("error", message="no upload in progress"))
+            return
+        # the write happens in a worker thread; messages are handled one at a
+        # time, so chunks still land in order
+        for reply in await asyncio.to_thread(self.upload.receive, data):
+            await self.send(reply)
+        if self.upload is not None and self.upload.complete:
+            await self._commit()
+
+    async def _commit(self):
+        upload, self.upload = self.upload, None
+        try:
+            await self.send(await asyncio.to_thread(upload.commit))
+        except (OSError, ValueError) as e:
+            await self.send(control("error", message=str(e)))
+
+    async def _run_download(self, download):
+        try:
+            await download.run(self.send, self.send_bytes)
+        except OSError as e:
+            await self.send(control("error", message=str(e)))
+        finally:
+            if self.download is download:
+                self.download = None
+
+    def cancel(self):
+        if self.download_task is not None:
+            self.download_task.cancel()
+            self.download_task = None
+        self.download = None
+        if self.upload is not None:
+            self.upload.close()
+            self.upload = None
+
+
+def cmd_transfer_help(args):
+    """upload / download typed at the prompt: they need a transfer client."""
+    from pyterminal import safe_print
+    safe_print("upload/download use the binary transfer channel, e.g.\n"
+               "  python transfer.py download ws://HOST:PORT <remote> [local]\n"
+               "  python transfer.py upload ws://HOST:PORT <local> [remote]")
+
+
+# ------------------------------
+# Client
+# ------------------------------
+async def _recv_control(ws):
+    """Next control message, skipping terminal output such as prompts."""
+    while True:
+        message = await ws.recv()
+        if isinstance(message, str):
+            msg = parse_control(message)
+            if msg is not None:
+                if msg.get("op") == "error":
+                    raise RuntimeError(msg.get("message"))
+                return msg
+
+
+async def download(ws, remote, local, chunk=CHUNK_SIZE, window=WINDOW, progress=None):
+    """Fetch `remote` into `local`, resuming from local + '.part' if present."""
+    part = local + ".part"
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    await ws.send(control("download", path=remote, offset=offset, chunk=chunk, window=window))
+    meta = await _recv_control(ws)
+    size = meta["size"]
+    with open(part, "ab") as f:
+        f.truncate(offset)
+        while True:
+            message = await ws.recv()
+            if isinstance(message, str):
+                msg = parse_control(message)
+                if msg is None:
+                    continue
+                if msg.get("op") == "error":
+                    raise RuntimeError(msg.get("message"))
+                if msg.get("op") == "done":
+                    break
+                continue
+            try:
+                at, payload = unframe(message)
+            except ValueError:
+                await ws.send(control("nack", offset=offset))
+                continue
+            if at != offset:
+                continue  # resent after a nack; wait for the expected offset
+            f.write(payload)
+            offset += len(payload)
+            await ws.send(control("ack", offset=offset))
+            if progress:
+                progress(offset, size)
+    digest = file_sha256(part)
+    if digest != msg["sha256"]:
+        os.remove(part)
+        raise RuntimeError(f"sha256 mismatch for {remote}: {digest} != {msg['sha256']}")
+    os.replace(part, local)
+    return size
+
+
+async def upload(ws, local, remote, chunk=CHUNK_SIZE, window=WINDOW, progress=None):
+    """Send `local` to `remote`; the server resumes an earlier partial upload."""
+    size = os.path.getsize(local)
+    digest = await asyncio.to_thread(file_sha256, local)
+    await ws.send(control("upload", path=remote, size=size, sha256=digest, chunk=chunk, window=window))
+    ready = await _recv_control(ws)
+    acked = sent = ready["offset"]
+    with open(local, "rb") as f:
+        while True:
+            while sent < size and sent - acked < window * chunk:
+                f.seek(sent)
+                payload = f.read(chunk)
+                await ws.send(frame(sent, payload))
+                sent += len(payload)
+            msg = await _recv_control(ws)
+            op = msg.get("op")
+            if op == "ack":
+                acked = max(acked, msg["offset"])
+                if progress:
+                    progress(acked, size)
+            elif op == "nack":
+                acked = sent = msg["offset"]
+            elif op == "done":
+                return size
+
+
+def main(argv=None):
+    import argparse
+    import websockets
+    parser = argparse.ArgumentParser(description="Upload/download files through a PyTerminal server")
+    parser.add_argument("op", choices=("upload", "download"))
+    parser.add_argument("url", help="ws://host:port of the terminal")
+    parser.add_argument("source")
+    parser.add_argument("dest", nargs="?")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--window", type=int, default=WINDOW)
+    args = parser.parse_args(argv)
+    dest = args.dest or os.path.basename(args.source)
+
+    def progress(done, total):
+        sys.stderr.write(f"\r{done}/{total} bytes ({100 * done // max(total, 1)}%)")
+
+    async def run():
+        async with websockets.connect(args.url, max_size=None) as ws:
+            if args.op == "download":
+                size = await download(ws, args.source, dest, args.chunk, args.window, progress)
+            else:
+                size = await upload(ws, args.source, dest, args.chunk, args.window, progress)
+        sys.stderr.write("\n")
+        print(f"{args.op}: {size} bytes, sha256 verified")
+
+    try:
+        asyncio.run(run())
+    except (RuntimeError, OSError) as e:
+        sys.stderr.write(f"\n{args.op}: {e}\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,65 +1,45 @@
 import asyncio
 import websockets
 import os
-import subprocess
-from main import handle_command as base_handle_command
-from texteditor import editor_sessions, handle_edit_command, cmd_edit, cmd_write, handle_write_command
+import signal
+import metrics
+import follow
+from main import run_line
+from execpolicy import CURRENT_SESSION, prewarm
+from texteditor import editor_sessions, handle_edit_command, cmd_edit, cmd_write, handle_write_command, discard_write
+from transfer import TransferChannel, parse_control, MAX_MESSAGE
+from sessions import SESSIONS, SESSION_PREFIX, RESUME_PREFIX, RESUMED_PREFIX, install_session_routes
 
-# ------------------------------
-# Subprocess runner for `shell ...`
-# ------------------------------
-def run_shell_command(command: str) -> str:
-    try:
-        if os.name == "nt":  # Windows
-            ps_cmd = f'powershell -Command "{command}"'
-            result = subprocess.run(
-                ps_cmd,
-                capture_output=True,
-                text=True,
-                shell=True
-            )
-        else:
-            result = subprocess.run(
-                command,
-                shell=True,
-                capture_output=True,
-                text=True
-            )
-        return result.stdout if result.returncode == 0 else result.stderr
-    except Exception as e:
-        return f"Error: {str(e)}"
+# Seconds a stopping server waits for open sessions to finish
+DRAIN_TIMEOUT = float(os.environ.get("DRAIN_TIMEOUT", 30))
+# /metrics also carries the admin and session routes: loopback unless configured
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
 
 # ------------------------------
-# Main command handler
+# Server gauges
 # ------------------------------
-def handle_command(line: str) -> str:
-    if line.startswith("shell "):
-        cmd = line[len("shell "):].strip()
-        return run_shell_command(cmd)
-    return base_handle_command(line)
+# asyncio.to_thread runs on the default executor: min(32, cpu_count + 4) workers
+EXECUTOR_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+metrics.register(metrics.Gauge(
+    "pyterminal_executor_queue_depth",
+    "Commands waiting for a free worker thread",
+    func=lambda: max(0, metrics.EXECUTOR_INFLIGHT.value() - EXECUTOR_WORKERS)))
+metrics.register(metrics.Gauge(
+    "pyterminal_editor_sessions_active",
+    "Active edit/write sessions",
+    func=lambda: sum(1 for s in list(editor_sessions.values()) if s.get("active"))))
+
+async def run_in_executor(func, *args):
+    metrics.EXECUTOR_INFLIGHT.inc()
+    try:
+        return await asyncio.to_thread(func, *args)
+    finally:
+        metrics.EXECUTOR_INFLIGHT.dec()
 
 # ------------------------------
-# Command history & autocomplete
+# Autocomplete (history lives on the Session, see sessions.py)
 # ------------------------------
-session_history = {}
-
-def add_to_history(session_id, cmd):
-    hist = session_history.setdefault(session_id, [])
-    hist.append(cmd)
-    session_history[f"{session_id}_pointer"] = len(hist)
-
-def get_history(session_id, direction):
-    hist = session_history.setdefault(session_id, [])
-    if not hist:
-        return ""
-    pointer = session_history.setdefault(f"{session_id}_pointer", len(hist))
-    if direction == "up":
-        pointer = max(0, pointer-1)
-    else:  # down
-        pointer = min(len(hist)-1, pointer+1)
-    session_history[f"{session_id}_pointer"] = pointer
-    return hist[pointer]
-
 def autocomplete(prefix, session_id):
     from main import COMMANDS
     try:
@@ -74,39 +54,135 @@ def autocomplete(prefix, session_id):
 # WebSocket handler
 # ------------------------------
 async def ws_handler(websocket):
-    session_id = id(websocket)
-    await websocket.send(f"{os.getcwd()}$ ")
+    term = SESSIONS.create(websocket)
+    session_id = term.id
+    sent = 0
+
+    async def send(text, record=True):
+        nonlocal sent
+        # kept before sending: output of a command that finishes after the
+        # client dropped is still there when it resumes
+        if record:
+            term.record(text)
+        n = len(text) if text.isascii() else len(text.encode("utf-8"))
+        sent += n
+        metrics.BYTES_SENT.inc(n)
+        await websocket.send(text)
+
+    async def send_control(text):
+        await send(text, record=False)
 
+    async def send_bytes(data):
+        nonlocal sent
+        sent += len(data)
+        metrics.BYTES_SENT.inc(len(data))
+        await websocket.send(data)
+
+    follow_task = None
+    transfer = TransferChannel(send_control, send_bytes)
+
+    async def stream_file(path, lines):
+        try:
+            follower, tail, queue = follow.subscribe(path, lines)
+        except (OSError, ValueError) as e:
+            await send(f"follow: {e}\n{os.getcwd()}$ ")
+            return
+        try:
+            await send(f"Following {follower.path} (Ctrl+C to stop)\n" + tail)
+            while True:
+                text = await queue.get()
+                if text is None:  # dropped for falling behind
+                    await send(f"{os.getcwd()}$ ")
+                    return
+                await send(text)
+        finally:
+            follow.unsubscribe(follower, queue)
+
+    async def resume(token):
+        nonlocal term, session_id
+        resumed, previous = SESSIONS.resume(token, websocket)
+        if resumed is None:
+            if not SESSIONS.resumable:
+                await send("Session resume is off on this server (WORKERS > 1); this is a new session.\n")
+            else:
+                await send("Session expired; this is a new session.\n")
+            await send(f"{os.getcwd()}$ ")
+            return
+        if resumed is not term:
+            if not term.history:  # the session made for this connection
+                SESSIONS.evict(term, "replaced")
+            else:
+                SESSIONS.detach(term, websocket)
+            term, session_id = resumed, resumed.id
+        if previous is not None and previous is not websocket:  # a half-open connection still holding it
+            asyncio.create_task(previous.close(code=4000, reason="session resumed elsewhere"))
+        await send_control(RESUMED_PREFIX + term.token)
+        await send_control(term.scrollback.text() or f"{os.getcwd()}$ ")
+
+    metrics.OPEN_CONNECTIONS.inc()
     try:
+        if SESSIONS.resumable:
+            await send_control(SESSION_PREFIX + term.token)
+        await send(f"{os.getcwd()}$ ")
         async for line in websocket:
+            term.touch()
+            # --------------------------
+            # File transfer: binary chunks and __XFER__ control messages
+            # --------------------------
+            if isinstance(line, bytes):
+                await transfer.handle_binary(line)
+                continue
+            msg = parse_control(line)
+            if msg is not None:
+                await transfer.handle_control(msg)
+                continue
+
             line = line.rstrip("\n\r")
 
+            if line.startswith(RESUME_PREFIX):
+                await resume(line[len(RESUME_PREFIX):])
+                continue
+
+            # --------------------------
+            # Following a file: only Ctrl+C gets through
+            # --------------------------
+            if follow_task is not None and not follow_task.done():
+                if line == "__CTRL_C__":
+                    follow_task.cancel()
+                    await asyncio.gather(follow_task, return_exceptions=True)
+                    follow_task = None
+                    await send("^C\r\n")
+                    await send(f"{os.getcwd()}$ ")
+                continue
+
             # --------------------------
             # Handle Up/Down arrows & Tab
             # --------------------------
             if line == "__UP__":
-                prev_cmd = get_history(session_id, "up")
+                prev_cmd = term.history_step("up")
                 if prev_cmd:
-                    await websocket.send(prev_cmd)
+                    await send(prev_cmd, record=False)
                 continue
             elif line == "__DOWN__":
-                next_cmd = get_history(session_id, "down")
+                next_cmd = term.history_step("down")
                 if next_cmd:
-                    await websocket.send(next_cmd)
+                    await send(next_cmd, record=False)
                 continue
             elif line.startswith("__TAB__"):
                 prefix = line[len("__TAB__"):]
                 suggestion = autocomplete(prefix, session_id)
-                await websocket.send(suggestion)
+                await send(suggestion, record=False)
                 continue
             if line == "__CTRL_C__":
+                transfer.cancel()
                 # If inside editor
                 if session_id in editor_sessions and editor_sessions[session_id]["active"]:
                     editor_sessions[session_id]["active"] = False
-                    await websocket.send("^C\r\n(Edit cancelled)\r\n")
+                    discard_write(session_id)  # nothing typed so far reaches the file
+                    await send("^C\r\n(Edit cancelled)\r\n")
                 else:
-                    await websocket.send("^C\r\n")
-                await websocket.send(f"{os.getcwd()}$ ")
+                    await send("^C\r\n")
+                await send(f"{os.getcwd()}$ ")
                 continue
 
             # --------------------------
@@ -117,29 +193,43 @@ async def ws_handler(websocket):
                 if "append" in session:  # write session
                     result = handle_write_command(session_id, line)
                     if result:
-                        await websocket.send(result + "\n")
+                        await send(result + "\n")
                     if session["active"]:
-                        await websocket.send("(write) > ")
+                        await send("(write) > ")
                     else:
-                        await websocket.send(f"{os.getcwd()}$ ")
+                        await send(f"{os.getcwd()}$ ")
                     continue
                 else:  # edit session
                     result = handle_edit_command(session_id, line)
                     if result:
-                        await websocket.send(result + "\n")
+                        await send(result + "\n")
                     if session["active"]:
-                        await websocket.send("(edit) > ")
+                        await send("(edit) > ")
                     else:
-                        await websocket.send(f"{os.getcwd()}$ ")
+                        await send(f"{os.getcwd()}$ ")
                     continue
 
             # --------------------------
             # Empty input → reprint prompt
             # --------------------------
             if not line:
-                await websocket.send(f"{os.getcwd()}$ ")
+                await send(f"{os.getcwd()}$ ")
                 continue
 
+            # --------------------------
+            # follow <file> / tail -f <file>
+            # --------------------------
+            if line.startswith(("follow", "tail ")):
+                try:
+                    target = follow.parse_follow(line)
+                except ValueError as e:
+                    await send(f"{e}\n{os.getcwd()}$ ")
+                    continue
+                if target:
+                    term.add_history(line)
+                    follow_task = asyncio.create_task(stream_file(*target))
+                    continue
+
             # --------------------------
             # Start edit session
             # --------------------------
@@ -147,7 +237,7 @@ async def ws_handler(websocket):
                 parts = line.split(maxsplit=1)
                 args = parts[1:] if len(parts) > 1 else []
                 result = cmd_edit(args, session_id=session_id)
-                await websocket.send(result + "\n(edit) > ")
+                await send(result + "\n(edit) > ")
                 continue
 
             # --------------------------
@@ -157,37 +247,122 @@ async def ws_handler(websocket):
                 parts = line.split(maxsplit=1)
                 args = parts[1:] if len(parts) > 1 else []
                 result = cmd_write(args, session_id=session_id)
-                await websocket.send(result + "\n(write) > ")
+                await send(result + "\n(write) > ")
                 continue
 
             # --------------------------
             # Normal commands
             # --------------------------
-            output = await asyncio.to_thread(handle_command, line)
-            add_to_history(session_id, line)
+            CURRENT_SESSION.set(session_id)  # copied into the worker thread
+            # run_line records the command's metrics, shell included
+            output, _ = await run_in_executor(run_line, line)
+            term.add_history(line)
 
             if output in ("exit", "quit"):
-                await websocket.send("Bye!\n")
+                await send("Bye!\n")
+                SESSIONS.evict(term, "exit")  # nothing left to resume
                 break
 
             if output:
-                await websocket.send(output + "\n")
+                await send(output + "\n")
 
-            await websocket.send(f"{os.getcwd()}$ ")
+            await send(f"{os.getcwd()}$ ")
 
     except websockets.exceptions.ConnectionClosed:
         print("Client disconnected.")
+    finally:
+        if follow_task is not None:
+            follow_task.cancel()
+        transfer.cancel()  # an unfinished upload keeps its .part file for resuming
+        # running commands are killed after KILL_AFTER seconds unless the
+        # session is resumed; editor state and scrollback stay until it is
+        # resumed or evicted (sessions.py)
+        SESSIONS.detach(term, websocket)
+        metrics.OPEN_CONNECTIONS.dec()
+        metrics.SESSION_BYTES.observe(sent)
 
 # ------------------------------
 # Start WebSocket server
 # ------------------------------
+def install_routes(app):
+    """Admin and session routes next to /metrics (each off unless its token is set)."""
+    from profiler import install_admin_routes
+    install_admin_routes(app)
+    install_session_routes(app)
+
+async def serve(host, port, sock=None, worker=None, ready=None, released=None):
+    """
+    Run the WebSocket server until SIGTERM/SIGINT. With `sock` the server
+    accepts on an already bound socket (multi-worker mode). On shutdown it
+    stops accepting first, closes the metrics and API servers (then sets
+    `released`, so a replacement worker can bind their ports) and lets open
+    sessions finish for up to DRAIN_TIMEOUT seconds, so workers can be
+    restarted one by one.
+    """
+    # fork the spawn helper while this process is lean and single-threaded
+    prewarm()
+    # sessions stay in the worker that made them; a reconnect may reach another
+    if worker is not None:
+        SESSIONS.resumable = False
+
+    http_servers = []
+    metrics_port = int(os.environ.get("METRICS_PORT", port + 1))
+    if metrics_port:
+        metrics_port += worker or 0
+        http_servers.append(metrics.start_metrics_server(METRICS_HOST, metrics_port, setup=install_routes))
+        print(f"Metrics at http://{METRICS_HOST}:{metrics_port}/metrics")
+
+    # the batch API runs commands: its own server, on loopback by default
+    if os.environ.get("PYTERMINAL_API_TOKEN"):
+        from api import API_HOST, API_PORT, install_api_routes
+        api_port = API_PORT + (worker or 0)
+        http_servers.append(metrics.start_metrics_server(API_HOST, api_port, setup=install_api_routes))
+        print(f"Batch API at http://{API_HOST}:{api_port}/api/v1/run")
+
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+        except (NotImplementedError, RuntimeError):  # Windows
+            pass
+
+    # room for a full transfer chunk; the websockets default is 1 MiB
+    if sock is not None:
+        server_cm = websockets.serve(ws_handler, sock=sock, max_size=MAX_MESSAGE)
+    else:
+        server_cm = websockets.serve(ws_handler, host, port, max_size=MAX_MESSAGE)
+    reaper = asyncio.create_task(SESSIONS.reap_forever())
+    async with server_cm as server:
+        name = f"worker {worker} (pid {os.getpid()})" if worker is not None else "server"
+        print(f"WebSocket {name} running at ws://{host}:{port}")
+        if ready is not None:
+            ready.set()
+        await stop
+
+        # Stop accepting, free the HTTP ports, then drain open sessions
+        server.server.close()
+        for http in http_servers:
+            await asyncio.to_thread(http.shutdown)
+            http.server_close()
+        if released is not None:
+            released.set()
+        deadline = loop.time() + DRAIN_TIMEOUT
+        while metrics.OPEN_CONNECTIONS.value() > 0 and loop.time() < deadline:
+            await asyncio.sleep(0.2)
+    reaper.cancel()
+    SESSIONS.close_all()
+
 async def main():
     # async with websockets.serve(ws_handler, "localhost", 8000):
     #     print("WebSocket server running at ws://localhost:8000")
     port = int(os.environ.get("PORT", 8000))
-    async with websockets.serve(ws_handler, "0.0.0.0", port):
-        print(f"WebSocket server running at ws://0.0.0.0:{port}")
-        await asyncio.Future()
+    await serve("0.0.0.0", port)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    workers = int(os.environ.get("WORKERS", 1))
+    if workers > 1:
+        from multiworker import Supervisor
+        Supervisor(workers, "0.0.0.0", int(os.environ.get("PORT", 8000))).run()
+    else:
+        asyncio.run(main())
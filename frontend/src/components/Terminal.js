@@ -25,44 +25,78 @@ const TerminalComponent = () => {
       fitAddon.current.fit();
     }
 
-    const socket = new WebSocket("ws://localhost:8000");
-    socketRef.current = socket;
-
     let currentLine = "";
+    let closing = false;
 
     const prompt = (cwd = "$") => {
       term.current.write(`\r\x1b[1;34m${cwd}$ \x1b[0m`);
     };
 
-    socket.onopen = () => {
-      term.current.writeln("\x1b[1;32mConnected to Python Terminal\x1b[0m");
-      prompt();
+    // Every message goes to the current socket, which changes on reconnect
+    const send = (text) => {
+      const socket = socketRef.current;
+      if (socket && socket.readyState === WebSocket.OPEN) socket.send(text);
     };
 
-    socket.onmessage = (event) => {
-      const data = event.data;
-      if (!data) return;
-
-      // clear current input line
-      for (let i = 0; i < currentLine.length; i++) {
-        term.current.write("\b \b");
-      }
-
-      // write output line by line
-      data.split(/\r?\n/).forEach(line => {
-        if (line.trim() !== "") term.current.writeln(line);
-      });
-
-      currentLine = ""; // reset current input
-      prompt();
+    const connect = () => {
+      const socket = new WebSocket("ws://localhost:8000");
+      socketRef.current = socket;
+
+      socket.onopen = () => {
+        // After a dropped connection, pick the session up where it was
+        const token = sessionStorage.getItem("pyterminal-session");
+        if (token) socket.send("__RESUME__" + token);
+        term.current.writeln("\x1b[1;32mConnected to Python Terminal\x1b[0m");
+        prompt();
+      };
+
+      socket.onclose = (event) => {
+        // 4000: another tab resumed this session
+        if (closing || event.code === 4000) return;
+        term.current.writeln("\r\n\x1b[1;33mConnection lost, reconnecting...\x1b[0m");
+        setTimeout(connect, 1000);
+      };
+
+      socket.onmessage = (event) => {
+        const data = event.data;
+        if (!data) return;
+        // file transfer frames are for transfer clients, not the screen
+        if (typeof data !== "string" || data.startsWith("__XFER__")) return;
+        if (data.startsWith("__SESSION__")) {
+          sessionStorage.setItem("pyterminal-session", data.slice("__SESSION__".length));
+          return;
+        }
+        if (data.startsWith("__RESUMED__")) {
+          // the scrollback replay that follows redraws the screen
+          sessionStorage.setItem("pyterminal-session", data.slice("__RESUMED__".length));
+          term.current.reset();
+          currentLine = "";
+          return;
+        }
+
+        // clear current input line
+        for (let i = 0; i < currentLine.length; i++) {
+          term.current.write("\b \b");
+        }
+
+        // write output line by line
+        data.split(/\r?\n/).forEach(line => {
+          if (line.trim() !== "") term.current.writeln(line);
+        });
+
+        currentLine = ""; // reset current input
+        prompt();
+      };
     };
 
+    connect();
+
     // Handle user input and special keys
     term.current.onKey(({ key, domEvent }) => {
   // Handle Ctrl+C
   if (domEvent.ctrlKey && domEvent.key === "c") {
     // Send special cancel signal to backend
-    socket.send("__CTRL_C__");
+    send("__CTRL_C__");
 
     // Clear current input line
     for (let i = 0; i < currentLine.length; i++) {
@@ -75,7 +109,7 @@ const TerminalComponent = () => {
   }
 
   if (domEvent.key === "Enter") {
-    socket.send(currentLine);
+    send(currentLine);
     currentLine = "";
     term.current.write("\r\n");
   } else if (domEvent.key === "Backspace") {
@@ -84,12 +118,12 @@ const TerminalComponent = () => {
       term.current.write("\b \b");
     }
   } else if (domEvent.key === "ArrowUp") {
-    socket.send("__UP__");
+    send("__UP__");
   } else if (domEvent.key === "ArrowDown") {
-    socket.send("__DOWN__");
+    send("__DOWN__");
   } else if (domEvent.key === "Tab") {
     domEvent.preventDefault();
-    socket.send("__TAB__" + currentLine);
+    send("__TAB__" + currentLine);
   } else {
     currentLine += key;
     term.current.write(key);
@@ -100,7 +134,8 @@ const TerminalComponent = () => {
 
     return () => {
       window.removeEventListener("resize", () => fitAddon.current.fit());
-      socket.close();
+      closing = true;
+      socketRef.current.close();
       term.current.dispose();
     };
   }, []);